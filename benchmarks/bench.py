@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks of py2cbs against the synthetic server (no network access needed).
+
+Every scenario runs in a child process, so its peak memory is measured in
+isolation. Reported per scenario: wall time, throughput (rows per second),
+peak memory growth and, for lookups, the median and 95th percentile latency.
+
+    $ python bench.py --rows 100000 --page-size 10000 --latency 0.01
+    $ python bench.py --scenario resource_load --scenario table_columnar --json
+"""
+
+from collections import OrderedDict
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import server as synthetic
+from py2cbs import Resource, Table, CatalogTree, HTTPTransport
+
+def typed_dataset_url(target):
+    return target['feed_root'] + '/' + target['table']
+
+def scenario_resource_load(target, options):
+    feed = Resource(typed_dataset_url(target), 'TypedDataSet')
+    return {'rows': len(feed.entries)}
+
+def scenario_resource_load_compact(target, options):
+    feed = Resource(typed_dataset_url(target), 'TypedDataSet', transport = HTTPTransport(), compact = True, incremental = True)
+    return {'rows': len(feed.entries)}
+
+def scenario_resource_partitioned(target, options):
+    feed = Resource(typed_dataset_url(target), 'TypedDataSet', transport = HTTPTransport(), compact = True,
+                    partitions = target['page_size'], workers = options.workers)
+    return {'rows': len(feed.entries)}
+
+def scenario_resource_stream(target, options):
+    feed = Resource(typed_dataset_url(target), 'TypedDataSet', stream = True, incremental = True, transport = HTTPTransport())
+    rows = 0
+    for entry in feed.iter_entries():
+        rows += 1
+    return {'rows': rows}
+
+def scenario_table_typed(target, options):
+    table = Table(target['table'], root = target['feed_root'], transport = HTTPTransport(), stream = True)
+    return {'rows': len(table.get_typed_dataset())}
+
+def scenario_table_columnar(target, options):
+    table = Table(target['table'], root = target['feed_root'], transport = HTTPTransport(), stream = True, incremental = True)
+    return {'rows': len(table.get_columnar_dataset())}
+
+def scenario_resource_lookup(target, options):
+    feed = Resource(typed_dataset_url(target), 'TypedDataSet', transport = HTTPTransport(), compact = True)
+    ids = [random.randrange(len(feed.entries)) for _ in range(options.lookups)]
+    regions = list(set(entry['RegioS'] for entry in feed.entries))
+    feed.create_index('RegioS')
+    latencies = []
+    for entry_id in ids:
+        start = time.time()
+        feed.get_entry(entry_id, 'ID')
+        latencies.append(time.time() - start)
+    for region in regions[:options.lookups // 10]:
+        start = time.time()
+        feed.query({'RegioS': region}, ['ID', 'Bevolking_1'])
+        latencies.append(time.time() - start)
+    return {'rows': len(feed.entries), 'latencies': latencies}
+
+def scenario_catalog_tree(target, options):
+    catalog = CatalogTree(url = target['catalog_url'], transport = HTTPTransport())
+    catalog.set_feeds()
+    themes = [entry['ID'] for entry in catalog.get_entries('Themes')]
+    latencies = []
+    for _ in range(options.lookups):
+        theme_id = random.choice(themes)
+        start = time.time()
+        catalog.get_ancestors(theme_id)
+        catalog.get_tables(theme_id)
+        catalog.get_common_ancestor(theme_id, random.choice(themes))
+        latencies.append(time.time() - start)
+    return {'rows': len(themes), 'latencies': latencies}
+
+SCENARIOS = OrderedDict((name[len('scenario_'):], function) for name, function in sorted(globals().items())
+                        if name.startswith('scenario_'))
+
+def max_rss():
+    """Peak resident memory of the process in bytes."""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+def run_child(name, target, options, connection):
+    try:
+        baseline = max_rss()
+        start = time.time()
+        result = SCENARIOS[name](target, options)
+        result['seconds'] = time.time() - start
+        result['peak_memory'] = max_rss() - baseline
+        connection.send(result)
+    except Exception as e:
+        connection.send({'error': repr(e)})
+
+def run(name, server, options):
+    """Run a scenario in a child process.
+
+    Returns:
+        Result {'rows', 'seconds', 'peak_memory', 'latencies' (optional)} or {'error'}
+    """
+    target = {'catalog_url': server.catalog_url, 'feed_root': server.feed_root,
+              'table': server.catalog.tables.keys()[0], 'page_size': server.page_size}
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target = run_child, args = (name, target, options, child))
+    process.start()
+    child.close()
+    try:
+        result = parent.recv()
+    except EOFError:
+        result = {'error': 'scenario process exited with code {0}'.format(process.exitcode)}
+    process.join()
+    return result
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def summarize(name, result):
+    summary = OrderedDict([('scenario', name)])
+    if 'error' in result:
+        summary['error'] = result['error']
+        return summary
+    summary['rows'] = result['rows']
+    summary['seconds'] = round(result['seconds'], 3)
+    summary['rows_per_second'] = int(result['rows'] / result['seconds']) if result['seconds'] > 0 else None
+    summary['peak_memory_mb'] = round(result['peak_memory'] / 1048576.0, 1)
+    if result.get('latencies'):
+        summary['median_latency_us'] = round(percentile(result['latencies'], 0.5) * 1e6, 1)
+        summary['p95_latency_us'] = round(percentile(result['latencies'], 0.95) * 1e6, 1)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Benchmark py2cbs against a synthetic CBS Open Data server')
+    parser.add_argument('--scenario', action = 'append', choices = SCENARIOS.keys(), help = 'scenario to run (default: all)')
+    parser.add_argument('--tables', type = int, default = 10)
+    parser.add_argument('--rows', type = int, default = 50000, help = 'rows per table')
+    parser.add_argument('--themes', type = int, default = 1000)
+    parser.add_argument('--page-size', type = int, default = 10000)
+    parser.add_argument('--latency', type = float, default = 0.0, help = 'seconds every request is delayed')
+    parser.add_argument('--workers', type = int, default = 4, help = 'concurrent requests of partitioned scenarios')
+    parser.add_argument('--lookups', type = int, default = 1000, help = 'lookups per latency scenario')
+    parser.add_argument('--json', action = 'store_true', help = 'print the results as JSON lines')
+    options = parser.parse_args()
+
+    server = synthetic.start(tables = options.tables, rows = options.rows, themes = options.themes,
+                             page_size = options.page_size, latency = options.latency)
+    columns = ['scenario', 'rows', 'seconds', 'rows_per_second', 'peak_memory_mb', 'median_latency_us', 'p95_latency_us']
+    if not options.json:
+        print ' '.join(['{0:>21}'.format(column) for column in columns])
+    for name in options.scenario or SCENARIOS.keys():
+        summary = summarize(name, run(name, server, options))
+        if options.json:
+            print json.dumps(summary)
+        elif 'error' in summary:
+            print '{0:>21} {1}'.format(name, summary['error'])
+        else:
+            print ' '.join(['{0:>21}'.format(summary.get(column, '')) for column in columns])
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Synthetic CBS Open Data server for benchmarks.
+
+Serves the layout of ODataCatalog (Tables, Themes, Tables_Themes) and of
+ODataFeed/odata/<identifier> (TableInfos, DataProperties, dimension feeds,
+TypedDataSet, UntypedDataSet) with generated data, paged with odata.nextLink.
+Supports $format, $filter (comparisons and startswith joined by and/or), $select, $top, $skip,
+$inlinecount=allpages, /$count and gzip compression.
+
+    $ python server.py --port 8000 --rows 100000 --page-size 10000 --latency 0.05
+"""
+
+from collections import OrderedDict
+import BaseHTTPServer
+import SocketServer
+import argparse
+import gzip
+import json
+import re
+import StringIO
+import threading
+import time
+import urllib
+import urlparse
+
+PERIODS = ['{0}JJ00'.format(year) for year in range(1990, 2020)]
+TOPICS = [('Bevolking_1', 'Bevolking', 'Long'), ('Mannen_2', 'Mannen', 'Long'), ('Vrouwen_3', 'Vrouwen', 'Long'),
+          ('Dichtheid_4', 'Bevolkingsdichtheid', 'Double')]
+
+class SyntheticTable(object):
+    """Generated table, a period dimension by a region dimension with numeric topics.
+
+    Attributes:
+        identifier (str): identifier of the table
+        rows (int): number of rows
+        periods ([str]): keys of the period dimension
+        regions ([str]): keys of the region dimension
+    """
+
+    def __init__(self, identifier, rows):
+        self.identifier = identifier
+        self.rows = rows
+        self.periods = PERIODS
+        self.regions = ['GM{0:04d}  '.format(i) for i in range((rows + len(PERIODS) - 1) // len(PERIODS))]
+        self.typed = None
+        self.untyped = None
+        self.lock = threading.RLock()
+
+    def get_typed(self):
+        with self.lock:
+            if self.typed is None:
+                self.typed = [self.typed_row(i) for i in range(self.rows)]
+            return self.typed
+
+    def get_untyped(self):
+        with self.lock:
+            if self.untyped is None:
+                self.untyped = [self.untyped_row(row) for row in self.get_typed()]
+            return self.untyped
+
+    def typed_row(self, i):
+        period = self.periods[i % len(self.periods)]
+        region = self.regions[i // len(self.periods)]
+        total = None if i % 97 == 0 else (i * 7919) % 100000
+        men = None if total is None else total // 2
+        return OrderedDict([('ID', i), ('Perioden', period), ('RegioS', region), ('Bevolking_1', total), ('Mannen_2', men),
+                            ('Vrouwen_3', None if total is None else total - men), ('Dichtheid_4', (i % 1000) / 7.0)])
+
+    def untyped_row(self, row):
+        untyped = OrderedDict()
+        for name, value in row.items():
+            if name in ('ID', 'Perioden', 'RegioS'):
+                untyped[name] = value
+            elif value is None:
+                untyped[name] = '       .'
+            elif isinstance(value, float):
+                untyped[name] = '{0:8.1f}'.format(value)
+            else:
+                untyped[name] = '{0:8d}'.format(value)
+        return untyped
+
+    def get_collection(self, name):
+        if name == 'TableInfos':
+            return [OrderedDict([('ID', 1), ('Title', 'Synthetic table ' + self.identifier), ('Identifier', self.identifier),
+                                 ('Modified', '2016-01-01T00:00:00')])]
+        if name == 'DataProperties':
+            properties = [OrderedDict([('ID', 0), ('Position', 0), ('ParentID', None), ('Type', 'TimeDimension'), ('Key', 'Perioden'),
+                                       ('Title', 'Perioden'), ('Datatype', None), ('Decimals', None)]),
+                          OrderedDict([('ID', 1), ('Position', 1), ('ParentID', None), ('Type', 'GeoDimension'), ('Key', 'RegioS'),
+                                       ('Title', 'Regio\'s'), ('Datatype', None), ('Decimals', None)]),
+                          OrderedDict([('ID', 2), ('Position', 2), ('ParentID', None), ('Type', 'TopicGroup'), ('Key', ''),
+                                       ('Title', 'Bevolking'), ('Datatype', None), ('Decimals', None)])]
+            for i, (key, title, datatype) in enumerate(TOPICS, 3):
+                properties.append(OrderedDict([('ID', i), ('Position', i), ('ParentID', 2), ('Type', 'Topic'), ('Key', key),
+                                               ('Title', title), ('Datatype', datatype), ('Decimals', 1 if datatype == 'Double' else 0)]))
+            return properties
+        if name == 'Perioden':
+            return [OrderedDict([('Key', key), ('Title', key[:4]), ('Description', None)]) for key in self.periods]
+        if name == 'RegioS':
+            return [OrderedDict([('Key', key), ('Title', 'Gemeente ' + key.strip()), ('Description', None)]) for key in self.regions]
+        if name == 'TypedDataSet':
+            return self.get_typed()
+        if name == 'UntypedDataSet':
+            return self.get_untyped()
+        return None
+
+    def get_collections(self):
+        return ['TableInfos', 'DataProperties', 'Perioden', 'RegioS', 'TypedDataSet', 'UntypedDataSet']
+
+class SyntheticCatalog(object):
+    """Generated catalog of synthetic tables under a theme tree.
+
+    Attributes:
+        tables {identifier: SyntheticTable}: tables of the catalog
+        themes (int): number of themes
+    """
+
+    def __init__(self, tables = 10, rows = 10000, themes = 100):
+        self.tables = OrderedDict()
+        for i in range(tables):
+            identifier = '{0:05d}syn'.format(i)
+            self.tables[identifier] = SyntheticTable(identifier, rows)
+        self.themes = themes
+
+    def get_collection(self, name):
+        if name == 'Tables':
+            return [OrderedDict([('ID', i), ('Identifier', table.identifier), ('Title', 'Synthetic table {0}'.format(i)),
+                                 ('ShortDescription', 'Population by region and period {0}'.format(i)), ('Language', 'nl'),
+                                 ('Modified', '2016-01-{0:02d}T00:00:00'.format(1 + i % 28)), ('RecordCount', table.rows)])
+                    for i, table in enumerate(self.tables.values())]
+        if name == 'Themes':
+            return [OrderedDict([('ID', i), ('ParentID', None if i < 5 else (i - 5) // 3), ('Title', 'Theme {0}'.format(i)),
+                                 ('Number', i), ('Language', 'nl')]) for i in range(self.themes)]
+        if name == 'Tables_Themes':
+            return [OrderedDict([('ID', i), ('TableID', i), ('ThemeID', i % self.themes)]) for i in range(len(self.tables))]
+        return None
+
+    def get_collections(self):
+        return ['Tables', 'Themes', 'Tables_Themes']
+
+TOKEN = re.compile(r"\s*(\(|\)|,|'(?:[^']|'')*'|[^\s(),']+)")
+
+OPERATORS = {'eq': lambda a, b: a == b,
+             'ne': lambda a, b: a != b,
+             # ordering comparisons with null are false
+             'gt': lambda a, b: a is not None and b is not None and a > b,
+             'ge': lambda a, b: a is not None and b is not None and a >= b,
+             'lt': lambda a, b: a is not None and b is not None and a < b,
+             'le': lambda a, b: a is not None and b is not None and a <= b}
+
+def parse_literal(literal):
+    if literal.startswith("'"):
+        return literal[1:-1].replace("''", "'")
+    if literal in ('null', 'true', 'false'):
+        return {'null': None, 'true': True, 'false': False}[literal]
+    try:
+        return json.loads(literal)
+    except ValueError:
+        raise ValueError('Unsupported literal: {0}'.format(literal))
+
+class FilterParser(object):
+    """Parser of OData $filter expressions: comparisons (eq, ne, gt, ge, lt, le) and startswith, joined by
+    and/or with parentheses, the expressions emitted by py2cbs.predicates."""
+
+    def __init__(self, expression):
+        self.tokens = []
+        position = 0
+        expression = expression.strip()
+        while position < len(expression):
+            match = TOKEN.match(expression, position)
+            if match is None:
+                raise ValueError('Invalid $filter: {0}'.format(expression))
+            self.tokens.append(match.group(1))
+            position = match.end()
+        self.position = 0
+
+    def next(self, expected = None):
+        if self.position >= len(self.tokens):
+            raise ValueError('Unexpected end of $filter')
+        token = self.tokens[self.position]
+        if expected is not None and token != expected:
+            raise ValueError('Expected {0} in $filter, got {1}'.format(expected, token))
+        self.position += 1
+        return token
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def parse(self):
+        test = self.parse_or()
+        if self.peek() is not None:
+            raise ValueError('Unexpected {0} in $filter'.format(self.peek()))
+        return test
+
+    def parse_or(self):
+        tests = [self.parse_and()]
+        while self.peek() == 'or':
+            self.next()
+            tests.append(self.parse_and())
+        return tests[0] if len(tests) == 1 else lambda entry: any(test(entry) for test in tests)
+
+    def parse_and(self):
+        tests = [self.parse_primary()]
+        while self.peek() == 'and':
+            self.next()
+            tests.append(self.parse_primary())
+        return tests[0] if len(tests) == 1 else lambda entry: all(test(entry) for test in tests)
+
+    def parse_primary(self):
+        token = self.next()
+        if token == '(':
+            test = self.parse_or()
+            self.next(')')
+            return test
+        if token == 'startswith':
+            self.next('(')
+            name = self.next()
+            self.next(',')
+            prefix = parse_literal(self.next())
+            self.next(')')
+            if not isinstance(prefix, basestring):
+                raise ValueError('startswith requires a string')
+            return lambda entry: isinstance(entry.get(name), basestring) and entry[name].startswith(prefix)
+        name, operator = token, self.next()
+        if operator not in OPERATORS:
+            raise ValueError('Unsupported operator: {0}'.format(operator))
+        compare, value = OPERATORS[operator], parse_literal(self.next())
+        return lambda entry: compare(entry.get(name), value)
+
+def filter_entries(entries, expression):
+    """Apply an OData $filter, see FilterParser.
+
+    Raises:
+        ValueError: if the expression is not supported
+    """
+    test = FilterParser(expression).parse()
+    return [entry for entry in entries if test(entry)]
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        parts = urlparse.urlsplit(self.path)
+        options = dict((name, values[0]) for name, values in urlparse.parse_qs(parts.query).items())
+        path = parts.path.rstrip('/')
+        count = path.endswith('/$count')
+        if count:
+            path = path[:-len('/$count')]
+        service, collection = self.resolve(path)
+        if service is None:
+            return self.send_body(404, '')
+        base = 'http://{0}:{1}{2}'.format(server.server_address[0], server.server_address[1], path)
+        if collection is None:
+            document = OrderedDict([('odata.metadata', base + '/$metadata'),
+                                    ('value', [OrderedDict([('name', name), ('url', name)]) for name in service.get_collections()])])
+            return self.send_body(200, json.dumps(document))
+        entries = service.get_collection(collection)
+        if entries is None:
+            return self.send_body(404, '')
+        if '$filter' in options:
+            try:
+                entries = filter_entries(entries, options['$filter'])
+            except ValueError:
+                return self.send_body(400, '')
+        if count:
+            return self.send_body(200, str(len(entries)))
+        skip = int(options.get('$skip', 0))
+        end = len(entries) if '$top' not in options else min(len(entries), skip + int(options['$top']))
+        page_end = min(end, skip + server.page_size)
+        page = entries[skip:page_end]
+        if '$select' in options:
+            names = options['$select'].split(',')
+            page = [OrderedDict((name, entry[name]) for name in names) for entry in page]
+        document = OrderedDict([('odata.metadata', base + '/$metadata')])
+        if options.get('$inlinecount') == 'allpages':
+            document['odata.count'] = str(len(entries))
+        document['value'] = page
+        if page_end < end:
+            next_options = dict(options)
+            next_options['$skip'] = str(page_end)
+            if '$top' in options:
+                next_options['$top'] = str(end - page_end)
+            document['odata.nextLink'] = base + '?' + urllib.urlencode(next_options)
+        self.send_body(200, json.dumps(document))
+
+    def resolve(self, path):
+        catalog = self.server.catalog
+        if path.startswith('/ODataCatalog'):
+            names = path[len('/ODataCatalog'):].strip('/')
+            return catalog, names or None
+        match = re.match(r'^/ODataFeed/odata/([^/]+)(?:/([^/]+))?$', path)
+        if match is None or match.group(1) not in catalog.tables:
+            return None, None
+        return catalog.tables[match.group(1)], match.group(2)
+
+    def send_body(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;odata=minimalmetadata')
+        if 'gzip' in self.headers.get('Accept-Encoding', '') and len(body) > 0:
+            buffer = StringIO.StringIO()
+            with gzip.GzipFile(fileobj = buffer, mode = 'wb', compresslevel = 1) as f:
+                f.write(body)
+            body = buffer.getvalue()
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class SyntheticServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """Threaded HTTP server serving a SyntheticCatalog.
+
+    Attributes:
+        catalog (SyntheticCatalog): catalog and tables served
+        page_size (int): maximum number of entries per page
+        latency (float): seconds every request is delayed
+        url (str): root url of the server
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port = 0, catalog = None, page_size = 10000, latency = 0.0):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', port), Handler)
+        self.catalog = catalog or SyntheticCatalog()
+        self.page_size = page_size
+        self.latency = latency
+        self.url = 'http://127.0.0.1:{0}'.format(self.server_address[1])
+
+    @property
+    def catalog_url(self):
+        return self.url + '/ODataCatalog'
+
+    @property
+    def feed_root(self):
+        return self.url + '/ODataFeed/odata'
+
+def start(port = 0, tables = 10, rows = 10000, themes = 100, page_size = 10000, latency = 0.0):
+    """Start a synthetic server in a background thread.
+
+    Args:
+        port (int): port to listen on (default = 0, any free port)
+        tables (int): number of tables (default = 10)
+        rows (int): number of rows per table (default = 10000)
+        themes (int): number of themes (default = 100)
+        page_size (int): maximum number of entries per page (default = 10000)
+        latency (float): seconds every request is delayed (default = 0.0)
+
+    Returns:
+        SyntheticServer
+    """
+    server = SyntheticServer(port, SyntheticCatalog(tables, rows, themes), page_size, latency)
+    thread = threading.Thread(target = server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Synthetic CBS Open Data server')
+    parser.add_argument('--port', type = int, default = 8000)
+    parser.add_argument('--tables', type = int, default = 10)
+    parser.add_argument('--rows', type = int, default = 10000)
+    parser.add_argument('--themes', type = int, default = 100)
+    parser.add_argument('--page-size', type = int, default = 10000)
+    parser.add_argument('--latency', type = float, default = 0.0)
+    args = parser.parse_args()
+    server = SyntheticServer(args.port, SyntheticCatalog(args.tables, args.rows, args.themes), args.page_size, args.latency)
+    print 'Catalog: {0}'.format(server.catalog_url)
+    print 'Tables:  {0}/<identifier>, e.g. {0}/{1}'.format(server.feed_root, server.catalog.tables.keys()[0])
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
@@ -25,6 +25,24 @@ __version__ = '0.1'
 PRODUCT = ('py2cbs', __version__)
 
 from odata import Resource
-from cbs import DataService, Catalog, CatalogTree, Table
+from transport import Transport, HTTPTransport, HTTPError, Retry
+from checkpoint import Checkpoint
+from metrics import Metrics
+from cache import ResponseCache, CachingTransport, CacheMiss
+from tree import Tree
+from columnar import ColumnarDataset
+from snapshot import Snapshot
+from cube import Cube
+from search import SearchIndex
+from predicates import Predicate, Eq, In, Range, Prefix, And, Or
+from scheduler import Scheduler, RateBudget
+from cbs import DataService, Catalog, CatalogTree, Table, FeedError
+from sync import Sync, SyncError
+from concurrency import Executor, Future
+from asynchronous import AsyncResource, AsyncDataService, AsyncCatalog, AsyncTable
 
-__all__ = ['Resource', 'DataService', 'Catalog', 'CatalogTree', 'Table']
+__all__ = ['Resource', 'DataService', 'Catalog', 'CatalogTree', 'Table', 'FeedError',
+           'Transport', 'HTTPTransport', 'HTTPError', 'Retry', 'Checkpoint', 'Metrics', 'ResponseCache', 'CachingTransport', 'CacheMiss',
+           'Tree', 'ColumnarDataset', 'Cube', 'Snapshot', 'SearchIndex', 'Sync', 'SyncError',
+           'Predicate', 'Eq', 'In', 'Range', 'Prefix', 'And', 'Or', 'Scheduler', 'RateBudget',
+           'Executor', 'Future', 'AsyncResource', 'AsyncDataService', 'AsyncCatalog', 'AsyncTable']
@@ -0,0 +1,440 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from odata import Resource
+from cbs import DataService, Catalog, Table, FeedError
+from concurrency import Future, chain, gather, get_default_executor
+from collections import OrderedDict
+import threading
+
+def iter_pages(resource, executor, window = 2):
+    """Iterate over the pages of the resource while the next pages are requested in the background.
+
+    Nothing is waited for up front: the first page is chained to the resource
+    and, with a partition size, to its partition urls. A page linked by
+    odata.nextLink is requested as soon as the page linking it arrives; with a
+    partition size at most window pages are requested ahead. Asking for the
+    next future waits until the previous page has arrived.
+
+    Args:
+        resource (Resource or Future of a Resource): resource (streaming, or loaded: a single page)
+        executor (Executor): executor requesting the pages
+        window (int): maximum number of pages requested ahead of the consumer, for a partition size (default = 2)
+
+    Yields:
+        Future of a list of entries, in page order
+    """
+    if not isinstance(resource, Future):
+        future = Future()
+        future.set_result(resource)
+        resource = future
+    state = {}
+
+    def start(resource):
+        state['resource'] = resource
+        if resource.entries is not None:
+            page = Future()
+            page.set_result(resource.entries)
+            return page
+        if isinstance(resource.partitions, (int, long)):
+            return chain(executor.submit(resource.get_partition_urls), start_partitions)
+        return read_link(resource.url)
+
+    def start_partitions(urls):
+        state['urls'] = urls
+        state['futures'] = [executor.submit(state['resource'].read_entries, url) for url in urls[:window + 1]]
+        return state['futures'][0]
+
+    def read_link(url):
+        def done(value):
+            entries, next_link = value
+            state['following'] = read_link(next_link) if next_link is not None else None
+            return entries
+        return executor.submit(state['resource'].read_page, url).then(done)
+
+    page = chain(resource, start)
+    yield page
+    if page.exception() is not None:
+        return
+    if 'urls' in state:
+        urls, futures = state['urls'], state['futures']
+        for i in range(1, len(urls)):
+            if i + window < len(urls):
+                futures.append(executor.submit(state['resource'].read_entries, urls[i + window]))
+            futures[i - 1] = None
+            yield futures[i]
+        return
+    page = state.get('following')
+    while page is not None:
+        yield page
+        if page.exception() is not None:
+            return
+        page = state['following']
+
+class AsyncResource(object):
+    """Non-blocking counterpart of Resource: every request runs on an executor and returns a Future.
+
+    Constructing does not send any request. Queries and lookups have the
+    semantics of Resource: a loaded resource is queried in memory, otherwise
+    its pages are read.
+
+    Attributes:
+        resource (Resource): resource doing the requests, in streaming mode until loaded
+        executor (Executor): executor running the requests
+        window (int): maximum number of pages requested ahead of the consumer
+    """
+
+    def __init__(self, service_root, resource_path = None, query_options = None, executor = None, window = 2, **kwargs):
+        """Initialize asynchronous resource.
+
+        Args:
+            service_root (str): url identifying the service document
+            resource_path (str): path pointing to the resource (collection/feed)
+            query_options (str): parameters applied to the query the resource
+            executor (Executor): executor running the requests (default = None, the default executor, see
+                concurrency.get_default_executor)
+            window (int): maximum number of pages requested ahead of the consumer (default = 2)
+            kwargs: keyword arguments passed on to Resource (except stream); with partitions set to a
+                partition size, the pages are requested concurrently by iter_pages and load
+        """
+        kwargs.pop('stream', None)
+        self.resource = Resource(service_root, resource_path = resource_path, query_options = query_options, stream = True, **kwargs)
+        if executor is None:
+            executor = get_default_executor()
+        self.executor = executor
+        self.window = window
+        self.lock = threading.Lock()
+
+    @property
+    def entries(self):
+        """Loaded entries (None until loaded)."""
+        return self.resource.entries
+
+    def load(self):
+        """Load the entries of the resource.
+
+        Returns:
+            Future of the resource, once loaded
+        """
+        return self.executor.submit(self._load)
+
+    def _load(self):
+        with self.lock:
+            if self.resource.entries is None:
+                self.resource.set_entries()
+                self.resource.set_property_names()
+        return self
+
+    def iter_pages(self):
+        """Iterate over the pages of the resource while the next pages are requested in the background, see iter_pages.
+
+        Yields:
+            Future of a list of entries, in page order
+        """
+        return iter_pages(self.resource, self.executor, self.window)
+
+    def iter_entries(self):
+        """Iterate over the entries of the resource, reading the next page while the current one is consumed.
+
+        Yields:
+            Entry, an ordered dictionary of (property name, property value) pairs
+        """
+        for page in self.iter_pages():
+            for entry in page.result():
+                yield entry
+
+    def get_count(self):
+        """Get the number of entries of the resource from the service.
+
+        Returns:
+            Future of the number of entries
+        """
+        return self.executor.submit(self.resource.get_count)
+
+    def query(self, search_properties = {}, return_property_names = []):
+        """Query the resource, see Resource.query.
+
+        Returns:
+            Future of the list of entries
+        """
+        return self.executor.submit(self.resource.query, search_properties, return_property_names)
+
+    def get_entry(self, entry_id, primary_key):
+        """Get a single entry, see Resource.get_entry.
+
+        Returns:
+            Future of the entry (None if not found)
+        """
+        return self.executor.submit(self.resource.get_entry, entry_id, primary_key)
+
+    def get_property(self, entry_id, primary_key, property_name):
+        """Get a property, see Resource.get_property.
+
+        Returns:
+            Future of the property value
+        """
+        return self.executor.submit(self.resource.get_property, entry_id, primary_key, property_name)
+
+class AsyncDataService(object):
+    """Non-blocking counterpart of DataService: every request runs on an executor and returns a Future.
+
+    Constructing does not send any request: the service document and the
+    feeds are loaded by load, or on first use by the other methods. The
+    executor bounds the number of concurrent requests across all feeds and
+    pages.
+
+    Attributes:
+        service (DataService): lazy data service doing the requests
+        executor (Executor): executor running the requests
+    """
+
+    def __init__(self, url, collections = [], query_options = {}, executor = None, workers = 4, **kwargs):
+        """Initialize asynchronous data service.
+
+        Args:
+            url (str): url identifying the service document of the data service
+            collections (optional [str]): subset of collections exposed by the data service, default [] = all collections
+            query_options (optional {collection:filter}): collection specific query_options
+            executor (Executor): executor running the requests (default = None, the default executor with workers
+                workers, shared by everything constructed without an executor, see concurrency.get_default_executor)
+            workers (int): number of concurrent requests of the default executor (default = 4)
+            kwargs: keyword arguments passed on to DataService (except lazy)
+        """
+        self.set_executor(executor, workers)
+        kwargs.pop('lazy', None)
+        self.service = DataService(url, collections = collections, query_options = query_options, lazy = True, **kwargs)
+
+    def set_executor(self, executor, workers):
+        if executor is None:
+            executor = get_default_executor(workers)
+        self.executor = executor
+
+    @property
+    def feeds(self):
+        """Feeds loaded so far {collection: Resource}."""
+        return self.service.feeds
+
+    def get_collections(self):
+        """Get the (names of the) collections exposed by the data service.
+
+        Returns:
+            Future of the list of collections
+        """
+        return self.executor.submit(lambda: self.service.collections)
+
+    def load(self, collections = None):
+        """Load the service document and the feeds not loaded yet, the feeds concurrently.
+
+        As DataService.prefetch, the feeds are added in the order of the
+        collections once all of them have been requested, feeds that loaded are
+        kept when others fail.
+
+        Args:
+            collections (optional [str]): collections to load (default = None, all selected collections)
+
+        Returns:
+            Future of the data service, once loaded; fails with FeedError when feeds failed to load
+        """
+        loaded = Future()
+
+        def load_feeds(future):
+            if future.error is not None:
+                loaded.set_exception(future.error)
+                return
+            names = future.value if collections is None else collections
+            names = [collection for collection in names if collection not in self.service.feeds]
+            feeds = [self.executor.submit(self.service.feeds.load, collection) for collection in names]
+            gather(feeds).add_done_callback(lambda outcomes: finish(names, outcomes.value))
+
+        def finish(names, outcomes):
+            errors = OrderedDict()
+            for collection, (feed, error) in zip(names, outcomes):
+                if error is not None:
+                    errors[collection] = error
+                else:
+                    self.service.feeds.add(collection)
+            if len(errors) > 0:
+                loaded.set_exception(FeedError(errors))
+            else:
+                loaded.set_result(self)
+
+        self.get_collections().add_done_callback(load_feeds)
+        return loaded
+
+    def get_feed(self, collection):
+        """Get a feed, loading it on first use.
+
+        Args:
+            collection (str): name of the feed
+
+        Returns:
+            Future of the feed (Resource)
+        """
+        return self.executor.submit(self.service.feeds.__getitem__, collection)
+
+    def get_entries(self, collection):
+        """Get the entries exposed by a feed/collection, see DataService.get_entries.
+
+        Returns:
+            Future of the list of entries
+        """
+        return self.executor.submit(self.service.get_entries, collection)
+
+    def iter_pages(self, collection):
+        """Iterate over the pages of a feed/collection, requesting the next pages in the background.
+
+        A feed that has been loaded is a single page. Otherwise the feed is not
+        loaded: its pages are streamed as by iter_pages, see DataService.stream_feed,
+        so only the pages not consumed yet are hold.
+
+        Args:
+            collection (str): name of the feed
+
+        Yields:
+            Future of a list of entries, in page order
+        """
+        if collection in self.service.feeds:
+            return iter_pages(self.service.feeds[collection], self.executor)
+        return iter_pages(self.service.stream_feed(collection), self.executor)
+
+    def iter_entries(self, collection):
+        """Iterate over the entries of a feed/collection, reading the next page while the current one is consumed.
+
+        Args:
+            collection (str): name of the feed
+
+        Yields:
+            Entry, an ordered dictionary of (property name, property value) pairs
+        """
+        for page in self.iter_pages(collection):
+            for entry in page.result():
+                yield entry
+
+    def query(self, collection, search_properties = {}, return_property_names = [], top = None, orderby = None):
+        """Query a collection/feed, see DataService.query.
+
+        Returns:
+            Future of the list of entries
+        """
+        return self.executor.submit(self.service.query, collection, search_properties, return_property_names, top, orderby)
+
+    def get_entry(self, collection, entry_id, primary_key):
+        """Get a single entry from a feed/collection, see DataService.get_entry.
+
+        Returns:
+            Future of the entry (None if not found)
+        """
+        return self.executor.submit(self.service.get_entry, collection, entry_id, primary_key)
+
+    def get_property(self, collection, entry_id, primary_key, property_name):
+        """Get a property from an entry, see DataService.get_property.
+
+        Returns:
+            Future of the property value
+        """
+        return self.executor.submit(self.service.get_property, collection, entry_id, primary_key, property_name)
+
+class AsyncCatalog(AsyncDataService):
+    """Non-blocking counterpart of Catalog.
+
+    Attributes:
+        language (str): language catalog ('nl' = dutch, 'en' = english, default = None)
+    """
+
+    def __init__(self, collections = [], language = None, executor = None, workers = 4, **kwargs):
+        """Initialize asynchronous CBS Open Data Catalog data service.
+
+        Args:
+            collections (Optional[str]): subset of collections exposed by the data service, default [] = all collections
+            language (str): language catalog ('nl' = dutch, 'en' = english, default = None)
+            executor (Executor): executor running the requests (default = None, the default executor with workers
+                workers, shared by everything constructed without an executor, see concurrency.get_default_executor)
+            workers (int): number of concurrent requests of the default executor (default = 4)
+            kwargs: keyword arguments passed on to Catalog (except lazy)
+        """
+        self.set_executor(executor, workers)
+        self.language = language
+        kwargs.pop('lazy', None)
+        self.service = Catalog(collections = collections, language = language, lazy = True, **kwargs)
+
+class AsyncTable(AsyncDataService):
+    """Non-blocking counterpart of Table.
+
+    Attributes:
+        identifier (str): unique identifier of a table
+    """
+
+    def __init__(self, identifier, collections = [], query_options = {}, executor = None, workers = 4, **kwargs):
+        """Initialize asynchronous CBS Open Data Api/Feed data service.
+
+        Args:
+            identifier (str): unique identifier of a table
+            collections (optional [str]): subset of collections exposed by the data service, default [] = all collections
+            query_options (optional {collection:filter}): collection specific query_options
+            executor (Executor): executor running the requests (default = None, the default executor with workers
+                workers, shared by everything constructed without an executor, see concurrency.get_default_executor)
+            workers (int): number of concurrent requests of the default executor (default = 4)
+            kwargs: keyword arguments passed on to Table (except lazy)
+        """
+        self.set_executor(executor, workers)
+        self.identifier = identifier
+        kwargs.pop('lazy', None)
+        self.service = Table(identifier, collections = collections, query_options = query_options, lazy = True, **kwargs)
+
+    def get_dimensions_dataset(self):
+        """Get the dimensions in the dataset, see Table.get_dimensions_dataset.
+
+        Returns:
+            Future of {dimension: {key: title}}
+        """
+        return self.executor.submit(self.service.get_dimensions_dataset)
+
+    def get_variables_dataset(self):
+        """Get the variables in the dataset, see Table.get_variables_dataset.
+
+        Returns:
+            Future of {variable name: variable label}
+        """
+        return self.executor.submit(self.service.get_variables_dataset)
+
+    def get_typed_dataset(self):
+        """Get the typed data in the dataset, see Table.get_typed_dataset.
+
+        Returns:
+            Future of the list of datarows
+        """
+        return self.executor.submit(self.service.get_typed_dataset)
+
+    def get_untyped_dataset(self):
+        """Get the untyped data in the dataset, see Table.get_untyped_dataset.
+
+        Returns:
+            Future of the list of datarows
+        """
+        return self.executor.submit(self.service.get_untyped_dataset)
+
+    def get_columnar_dataset(self, untyped = False, search_properties = None):
+        """Get the data in the dataset as NumPy arrays, see Table.get_columnar_dataset.
+
+        Args:
+            untyped (bool): decode UntypedDataSet (default = False)
+            search_properties (Predicate or {property_name:property_value}): rows selected (default = None, all rows)
+
+        Returns:
+            Future of the ColumnarDataset
+        """
+        return self.executor.submit(self.service.get_columnar_dataset, untyped, search_properties)
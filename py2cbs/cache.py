@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from transport import Transport, Response
+
+class CacheMiss(IOError):
+    """Raised by an offline cache when a url has not been cached."""
+    retryable = False
+
+    def __init__(self, url):
+        self.url = url
+        super(CacheMiss, self).__init__('Not in cache: {0}'.format(url))
+
+class ResponseCache(object):
+    """On-disk cache of response bodies keyed by url.
+
+    Every url is stored as a body file and a metadata file (time stored, ETag,
+    Last-Modified). The access time of the body file orders the entries for
+    least recently used eviction.
+
+    Attributes:
+        directory (str): directory holding the cache
+        ttl (float): seconds a cached response is used without revalidation
+        max_size (int): maximum total size of the cached bodies in bytes (None = unbounded)
+        offline (bool): only answer from the cache, never contact the server
+    """
+
+    def __init__(self, directory, ttl = 0, max_size = None, offline = False):
+        """Initialize cache.
+
+        Args:
+            directory (str): directory holding the cache, created when missing
+            ttl (float): seconds a cached response is used without revalidation (default = 0, always revalidate)
+            max_size (int): maximum total size of the cached bodies in bytes (default = None, unbounded)
+            offline (bool): only answer from the cache (default = False)
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self.offline = offline
+        self.lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def paths(self, url):
+        """Get the paths of the body and metadata file of a url.
+
+        Args:
+            url (str): url of the response
+
+        Returns:
+            (body path, metadata path) pair
+        """
+        if isinstance(url, unicode):
+            url = url.encode('utf-8')
+        key = hashlib.sha1(url).hexdigest()
+        path = os.path.join(self.directory, key)
+        return path + '.body', path + '.json'
+
+    def lookup(self, url):
+        """Look up the metadata of a cached url.
+
+        Args:
+            url (str): url of the response
+
+        Returns:
+            Metadata dictionary (None if the url is not cached)
+        """
+        body_path, meta_path = self.paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if not os.path.exists(body_path):
+            return None
+        return meta
+
+    def is_fresh(self, meta):
+        """Check whether a cached response can be used without revalidation."""
+        return time.time() - meta['stored'] < self.ttl
+
+    def open(self, url):
+        """Open the cached body of a url and mark it as recently used.
+
+        Args:
+            url (str): url of the response
+
+        Returns:
+            File object holding the body
+        """
+        body_path, meta_path = self.paths(url)
+        body = open(body_path, 'rb')
+        try:
+            os.utime(body_path, None)
+        except OSError:
+            pass
+        return body
+
+    def store(self, url, headers, body_path):
+        """Store a downloaded body under a url.
+
+        Args:
+            url (str): url of the response
+            headers ({name: value}): response headers (lowercase names)
+            body_path (str): temporary file holding the body, moved into the cache
+        """
+        final_body_path, meta_path = self.paths(url)
+        meta = {'url': url,
+                'stored': time.time(),
+                'etag': headers.get('etag'),
+                'last_modified': headers.get('last-modified'),
+                'content_type': headers.get('content-type')}
+        os.rename(body_path, final_body_path)
+        self.write_meta(meta_path, meta)
+        if self.max_size is not None:
+            self.evict()
+
+    def refresh(self, url, meta):
+        """Mark a cached response as revalidated now.
+
+        Args:
+            url (str): url of the response
+            meta (dict): metadata of the cached response
+        """
+        meta['stored'] = time.time()
+        self.write_meta(self.paths(url)[1], meta)
+
+    def write_meta(self, meta_path, meta):
+        handle, tmp_path = tempfile.mkstemp(dir = self.directory, suffix = '.tmp')
+        with os.fdopen(handle, 'w') as f:
+            json.dump(meta, f)
+        os.rename(tmp_path, meta_path)
+
+    def temporary_file(self):
+        """Create a temporary file in the cache directory.
+
+        Returns:
+            (file object, path) pair
+        """
+        handle, path = tempfile.mkstemp(dir = self.directory, suffix = '.tmp')
+        return os.fdopen(handle, 'wb'), path
+
+    def size(self):
+        """Get the total size of the cached bodies in bytes."""
+        return sum([size for path, size, atime in self.list_bodies()])
+
+    def list_bodies(self):
+        bodies = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.body'):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                bodies.append((path, stat.st_size, stat.st_mtime))
+        return bodies
+
+    def evict(self):
+        """Remove least recently used responses until the cache fits max_size."""
+        with self.lock:
+            bodies = sorted(self.list_bodies(), key = lambda body: body[2])
+            total = sum([size for path, size, atime in bodies])
+            for path, size, atime in bodies:
+                if total <= self.max_size:
+                    break
+                for remove_path in (path, path[:-len('.body')] + '.json'):
+                    try:
+                        os.remove(remove_path)
+                    except OSError:
+                        pass
+                total -= size
+
+    def clear(self):
+        """Remove all cached responses."""
+        for name in os.listdir(self.directory):
+            if name.endswith('.body') or name.endswith('.json') or name.endswith('.tmp'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+class CachingTransport(Transport):
+    """Transport answering requests from a ResponseCache, revalidating stale responses with the server.
+
+    Attributes:
+        transport (Transport): transport used for requests that miss the cache
+        cache (ResponseCache): cache of responses
+    """
+
+    def __init__(self, cache, transport = None):
+        """Initialize caching transport.
+
+        Args:
+            cache (ResponseCache): cache of responses
+            transport (Transport): transport used for requests that miss the cache (default = None, Transport())
+        """
+        if transport is None:
+            transport = Transport()
+        super(CachingTransport, self).__init__(timeout = transport.timeout)
+        self.cache = cache
+        self.transport = transport
+
+    def open(self, url, headers = {}):
+        """Request a url, answering from the cache when possible.
+
+        Args:
+            url (str): url to request
+            headers ({name: value}): additional request headers
+
+        Returns:
+            Response
+        """
+        meta = self.cache.lookup(url)
+        if meta is not None and (self.cache.offline or self.cache.is_fresh(meta)):
+            return self.cached_response(url, meta)
+        if self.cache.offline:
+            raise CacheMiss(url)
+        request_headers = dict(headers)
+        if meta is not None:
+            if meta.get('etag'):
+                request_headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                request_headers['If-Modified-Since'] = meta['last_modified']
+        response = self.transport.open(url, request_headers)
+        if response.status == 304 and meta is not None:
+            response.close()
+            self.cache.refresh(url, meta)
+            return self.cached_response(url, meta)
+        f, tmp_path = self.cache.temporary_file()
+        body = TeeReader(response, f, lambda: self.cache.store(url, response.headers, tmp_path), tmp_path)
+        return Response(response.url, response.status, response.headers, body, body.close)
+
+    def cached_response(self, url, meta):
+        headers = {}
+        if meta.get('content_type'):
+            headers['content-type'] = meta['content_type']
+        return Response(url, 200, headers, self.cache.open(url))
+
+    def close(self):
+        """Close the underlying transport."""
+        self.transport.close()
+
+class TeeReader(object):
+    """File-like object copying a response to a file while it is read, committing the copy once read completely."""
+
+    def __init__(self, response, f, commit, path):
+        self.response = response
+        self.f = f
+        self.commit = commit
+        self.path = path
+        self.complete = False
+
+    def read(self, size = -1):
+        data = self.response.read(size)
+        if data:
+            self.f.write(data)
+        if not data or size is None or size < 0:
+            self.complete = True
+        return data
+
+    def close(self):
+        self.response.close()
+        if self.f.closed:
+            return
+        self.f.close()
+        if self.complete:
+            self.commit()
+        else:
+            os.remove(self.path)
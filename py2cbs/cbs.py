@@ -15,9 +15,108 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from odata import Resource
+from odata import Resource, merge_query_options
+from predicates import as_predicate, split_filter, format_literal
+from concurrency import map_threaded
+from transport import Transport
+from tree import Tree
+from columnar import ColumnarBuilder, UntypedColumnarBuilder, column_types
+from snapshot import Snapshot, write_snapshot
+from cube import Cube
+from join import join_tables
+from search import SearchIndex
+from checkpoint import Checkpoint
 from collections import OrderedDict 
+from itertools import islice
+import hashlib
 import json
+import os
+import threading
+import time
+
+CATALOG_URL = 'http://opendata.cbs.nl/ODataCatalog'
+FEED_ROOT = 'http://opendata.cbs.nl/ODataFeed/odata'
+# number of queried entries collected before they are added to a columnar dataset (the page size of CBS)
+PAGE_SIZE = 10000
+
+class FeedError(Exception):
+    """Raised when one or more feeds of a data service could not be loaded.
+
+    Attributes:
+        errors {collection: exception}: error per collection that failed to load
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        message = ', '.join(['{0} ({1!r})'.format(collection, error) for collection, error in errors.items()])
+        super(FeedError, self).__init__('Failed to load feeds: ' + message)
+
+class Feeds(OrderedDict):
+    """Feeds of a data service, each loaded on first access.
+
+    A feed is loaded once, also when it is accessed by several threads or
+    prefetched meanwhile: loading holds a lock per collection.
+
+    Attributes:
+        service (DataService): data service loading the feeds
+    """
+
+    def __init__(self, service):
+        """Initialize feeds.
+
+        Args:
+            service (DataService): data service loading the feeds
+        """
+        OrderedDict.__init__(self)
+        self.service = service
+        self.lock = threading.Lock()
+        self.locks = {}
+        # feeds loaded by load, not added yet
+        self.loaded = {}
+
+    def get_lock(self, collection):
+        with self.lock:
+            return self.locks.setdefault(collection, threading.Lock())
+
+    def __missing__(self, collection):
+        if collection not in self.service.collections:
+            raise KeyError(collection)
+        with self.get_lock(collection):
+            if collection not in self:
+                if collection in self.loaded:
+                    self[collection] = self.loaded.pop(collection)
+                else:
+                    self[collection] = self.service.load_feed(collection)
+        return self[collection]
+
+    def load(self, collection):
+        """Load a feed without adding it, so feeds loaded concurrently can be added in order by add.
+
+        A feed accessed before it is added is added on access.
+
+        Args:
+            collection (str): name of the feed
+
+        Returns:
+            Resource holding the entries of the feed
+        """
+        with self.get_lock(collection):
+            if collection in self:
+                return self[collection]
+            if collection not in self.loaded:
+                self.loaded[collection] = self.service.load_feed(collection)
+            return self.loaded[collection]
+
+    def add(self, collection):
+        """Add a feed loaded by load, unless it was added on access meanwhile.
+
+        Args:
+            collection (str): name of the feed
+        """
+        with self.get_lock(collection):
+            feed = self.loaded.pop(collection, None)
+            if collection not in self and feed is not None:
+                self[collection] = feed
 
 class DataService(object):
     """Class respresenting a data service provided by CBS.
@@ -26,20 +125,79 @@ class DataService(object):
         url (str): url identifying the service document of the data service
         collections ([str]): selection of (names of) collections exposed by the data service, default [] = all collections 
         feeds {collection, feed}: feeds (which consist of entries) exposed by the data service
+        lazy (bool): the service document and the feeds are loaded on first access
+        stream (bool): feeds read their entries page by page on iteration instead of on loading
+        workers (int): number of feeds loaded concurrently
+        errors {collection: exception}: collections that failed to load in the last call to set_feeds
+        transport (Transport): transport shared by the service document and all feeds
+        indexes {collection: [property_name]}: properties indexed per feed after loading
+        compact (bool): feeds store their entries as compact rows
+        incremental (bool): feeds parse their pages while they are received
+        partitions {collection: partitions}: feeds loaded in partitions requested concurrently, see Resource
+        retry (Retry): policy retrying failed page requests of the feeds
+        checkpoints (str): directory holding a checkpoint per feed, so failed loads resume where they stopped;
+            data services can share it
+        metrics (Metrics): metrics recording requests, pages, loads and lookups of the service and its feeds
+        scheduler (Scheduler): scheduler of the requests of the service and its feeds
     """
 
-    def __init__(self, url, collections = [], query_options = {}):
+    def __init__(self, url, collections = [], query_options = {}, stream = False, workers = 1, transport = None, indexes = {},
+                 compact = False, incremental = False, lazy = True, partitions = {}, retry = None, checkpoints = None,
+                 metrics = None, scheduler = None):
         """Initialize CBS Open Data data service.
 
         Args:
             url (str): url that points to the service document of the data service
             collections (Optional[str]): subset of collections exposed by the data service, default [] = all collections
             query_options (optional{resource_path:filter}): collection specific query_options
+            stream (bool): stream the entries of the feeds instead of loading them up front (default = False)
+            workers (int): number of feeds loaded concurrently by set_feeds (default = 1)
+            transport (Transport): transport shared by all feeds, e.g. an HTTPTransport (default = None, a new connection per request)
+            indexes (optional {collection: [property_name]}): collection specific properties to index after loading
+            compact (bool): store entries as compact rows sharing their property names, see rows.Row (default = False)
+            incremental (bool): parse pages incrementally while they are received (default = False)
+            lazy (bool): load the service document and every feed on first access instead of in the constructor
+                and set_feeds only (default = True)
+            partitions (optional {collection: partitions}): collection specific partition size or list of partition
+                filters, the partitions of a feed are loaded by workers concurrent requests
+            retry (Retry): retry failed page requests with exponential backoff (default = None, no retries)
+            checkpoints (str): directory holding a checkpoint per feed (default = None, no checkpoints)
+            metrics (Metrics): record timings of requests, pages, loads and lookups (default = None, not recorded)
+            scheduler (Scheduler): schedule the requests and size the pages adaptively; share one scheduler between
+                data services to share its limits (default = None, not scheduled)
         """
         self.url = url
-        self.set_collection(collections)
+        self.stream = stream
+        self.workers = workers
+        self.errors = OrderedDict()
+        if transport is None:
+            transport = Transport()
+        self.transport = transport
+        self.indexes = indexes
+        self.compact = compact
+        self.incremental = incremental
+        self.lazy = lazy
+        self.partitions = dict(partitions)
+        self.retry = retry
+        self.checkpoints = checkpoints
+        self.metrics = metrics
+        self.scheduler = scheduler
+        self._collections = None
+        if collections != [] or not lazy:
+            self.set_collection(collections)
         self.query_options = query_options
-        self.feeds = {}
+        self.feeds = self.new_feeds()
+
+    @property
+    def collections(self):
+        """Names of the selected collections, read from the service document on first access."""
+        if self._collections is None:
+            self.set_collection([])
+        return self._collections
+
+    @collections.setter
+    def collections(self, collections):
+        self._collections = collections
 
     def set_collection(self, collections):
         """Set collections as hold by the service document (default) or as specified by the user.
@@ -48,23 +206,95 @@ class DataService(object):
             collections (Optional[str]): subset of collections exposed by the data service, default [] = all collections
         """
         if collections == []: 
-            service_document = Resource(service_root = self.url)
+            service_document = Resource(service_root = self.url, transport = self.transport, metrics = self.metrics,
+                                        scheduler = self.scheduler)
             
             self.collections = [entry['name'] for entry in service_document.entries]
         else:
             self.collections = collections
 
 
+    def new_feeds(self):
+        """Create an empty mapping of feeds, loading feeds on first access when lazy."""
+        if self.lazy:
+            return Feeds(self)
+        return OrderedDict()
+
     def set_feeds(self):
-        """Set feeds (load data) for the selected collections."""
-        self.feeds = {}
-        for collection in self.collections:
-            if collection in self.query_options:
-                qo = self.query_options[collection]
+        """Set feeds (load data) for all selected collections, discarding feeds loaded before."""
+        self.feeds = self.new_feeds()
+        self.prefetch()
+
+    def prefetch(self, collections = None):
+        """Load feeds up front that have not been loaded yet.
+
+        With more than one worker the feeds are loaded concurrently. The feeds keep
+        the order of the collections; feeds that loaded are kept when others fail,
+        the failures are collected in errors and reported with a FeedError.
+
+        Args:
+            collections (Optional[str]): collections to load (default = None, all selected collections)
+        """
+        if collections is None:
+            collections = self.collections
+        collections = [collection for collection in collections if collection not in self.feeds]
+        self.errors = OrderedDict()
+        started = time.time()
+        if isinstance(self.feeds, Feeds):
+            # load under the locks of the feeds, so a feed accessed meanwhile is loaded once
+            outcomes = map_threaded(self.feeds.load, collections, self.workers)
+        else:
+            outcomes = map_threaded(self.load_feed, collections, self.workers)
+        for collection, (feed, error) in zip(collections, outcomes):
+            if error is not None:
+                self.errors[collection] = error
+            elif isinstance(self.feeds, Feeds):
+                self.feeds.add(collection)
             else:
-                qo = None                
-            feed = Resource(service_root = self.url, resource_path = collection, query_options = qo)
-            self.feeds[collection] = feed
+                self.feeds[collection] = feed
+        if self.metrics is not None:
+            self.metrics.record('service', url = self.url, feeds = len(collections), seconds = time.time() - started)
+        if len(self.errors) > 0:
+            raise FeedError(self.errors)
+
+    def load_feed(self, collection):
+        """Load a single feed/collection.
+
+        Args:
+            collection (str): name of the feed
+
+        Returns:
+            Resource holding the entries of the feed
+        """
+        if collection in self.query_options:
+            qo = self.query_options[collection]
+        else:
+            qo = None                
+        return Resource(service_root = self.url, resource_path = collection, query_options = qo, stream = self.stream, transport = self.transport,
+                        indexes = self.indexes.get(collection, []), compact = self.compact, incremental = self.incremental,
+                        partitions = self.partitions.get(collection), workers = self.workers, retry = self.retry,
+                        checkpoint = self.get_checkpoint(collection), metrics = self.metrics, scheduler = self.scheduler)
+
+    def get_checkpoint(self, collection):
+        """Get the checkpoint of a feed/collection.
+
+        The checkpoint is named after the collection and a hash of the url of the
+        feed and its query options, so data services can share a checkpoints
+        directory.
+
+        Args:
+            collection (str): name of the feed
+
+        Returns:
+            Checkpoint (None without checkpoints directory)
+        """
+        if self.checkpoints is None:
+            return None
+        url = self.url + '/' + collection
+        if self.query_options.get(collection):
+            url += '?' + self.query_options[collection]
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+        return Checkpoint(os.path.join(self.checkpoints, '{0}-{1}'.format(collection, key)))
 
     def get_entries(self, collection):
         """Get the entries exposed by a feed/collection
@@ -75,8 +305,35 @@ class DataService(object):
         Returns:
             List of entries, each containing an ordered dictionary of (property name, property value) pairs
         """
-        return self.feeds[collection].entries
+        feed = self.feeds[collection]
+        if feed.entries is None:
+            return list(feed.iter_entries())
+        return feed.entries
+
+    def iter_entries(self, collection):
+        """Iterate over the entries exposed by a feed/collection without materializing a streaming feed.
+
+        Args:
+            collection (str): name of the feed
+
+        Returns:
+            Iterator over entries, each an ordered dictionary of (property name, property value) pairs
+        """
+        return self.feeds[collection].iter_entries()
+
+    def iter_pages(self, collection):
+        """Iterate over the pages of a feed/collection; a loaded feed is a single page.
+
+        Args:
+            collection (str): name of the feed
 
+        Returns:
+            Iterator over lists of entries
+        """
+        feed = self.feeds[collection]
+        if feed.entries is not None:
+            return iter([feed.entries])
+        return feed.iter_pages()
 
     def get_entry(self, collection, entry_id, primary_key):
         """Get a single entry from a feed/collection.
@@ -105,17 +362,80 @@ class DataService(object):
         """
         return self.feeds[collection].get_property(entry_id, primary_key,  property_name)
 
-    def query(self, collection, search_properties = {}, return_property_names = []):
-        """Generic search function to query a collection/feed.
+    def iter_query(self, collection, search_properties = {}, return_property_names = [], top = None, orderby = None, copy = False):
+        """Lazily query a collection/feed.
+
+        A loaded feed is queried in memory, its entries are shared unless copied,
+        see Resource.iter_query. Otherwise the predicate and return property names
+        are sent to the service as $filter and $select, so only the selected
+        entries are downloaded; conditions that cannot be expressed in OData are
+        evaluated client-side.
 
         Args:
             collection (str): name of the feed
-            search_properties ({property_name:property_value}): name:value pairs to select  
+            search_properties (Predicate or {property_name:property_value}): predicate (see predicates), or
+                name:value pairs that must all match (default = {}, all entries)
             return_property_names ([property_name]): list of property_names returned from selected entries (default = all)
+            top (int): maximum number of entries returned (default = None, all)
+            orderby (str): OData ordering of the entries, e.g. 'Title desc' (default = None, order of the service)
+            copy (bool): return copies of the entries of a loaded feed (default = False)
 
         Returns:
-            List of entries, each containing an ordered dictionary of (property name, property value) pairs
+            Iterator over entries, see Resource.iter_query
+        """
+        feed = self.feeds.get(collection)
+        if feed is not None and feed.entries is not None and orderby is None:
+            result = feed.iter_query(search_properties = search_properties, return_property_names = return_property_names, copy = copy)
+            return result if top is None else islice(result, top)
+
+        expression, client_predicate = split_filter(as_predicate(search_properties))
+        options = OrderedDict()
+        if expression is not None:
+            options['$filter'] = expression
+        if len(return_property_names) > 0:
+            select = list(return_property_names)
+            if client_predicate is not None:
+                select += [name for name in client_predicate.property_names() if name not in select]
+            options['$select'] = ','.join(select)
+        if orderby is not None:
+            options['$orderby'] = orderby
+        if top is not None and client_predicate is None:
+            options['$top'] = str(top)
+        resource = self.stream_feed(collection, options)
+        result = resource.iter_query(search_properties = client_predicate, return_property_names = return_property_names)
+        return result if top is None else islice(result, top)
+
+    def stream_feed(self, collection, options = {}):
+        """Get a feed/collection read page by page on iteration, without loading or keeping its entries.
+
+        Args:
+            collection (str): name of the feed
+            options ({option name: option value}): query options added to those of the collection, e.g. {'$top': '10'}
+
+        Returns:
+            Streaming Resource
+        """
+        qo = merge_query_options(self.query_options.get(collection), options)
+        return Resource(service_root = self.url, resource_path = collection, query_options = qo, stream = True, transport = self.transport,
+                        compact = self.compact, incremental = self.incremental, retry = self.retry, metrics = self.metrics,
+                        scheduler = self.scheduler)
+
+    def query(self, collection, search_properties = {}, return_property_names = [], top = None, orderby = None):
+        """Generic search function to query a collection/feed, see iter_query.
+
+        Args:
+            collection (str): name of the feed
+            search_properties (Predicate or {property_name:property_value}): predicate, or name:value pairs to select
+            return_property_names ([property_name]): list of property_names returned from selected entries (default = all)
+            top (int): maximum number of entries returned (default = None, all)
+            orderby (str): OData ordering of the entries, e.g. 'Title desc' (default = None, order of the service)
+
+        Returns:
+            List of entries, each containing an ordered dictionary of (property name, property value) pairs,
+            copies of the entries of a loaded feed
         """
+        return list(self.iter_query(collection, search_properties, return_property_names, top, orderby, copy = True))
+
 
 class Catalog(DataService):
     """Class respresenting CBS Open Data Catalog data service.
@@ -124,22 +444,38 @@ class Catalog(DataService):
         language (str): language catalog ('nl' = dutch, 'en' = english, default = None)
     """
 
-    def __init__(self, collections = [], language = None): 
+    def __init__(self, collections = [], language = None, url = CATALOG_URL, **kwargs): 
         """Initialize CBS Open Data Catalog data service.
 
         Args:
             collections (Optional[str]): subset of collections exposed by the data service, default [] = all collections
             language (str): language catalog ('nl' = dutch, 'en' = english, default = None)
+            url (str): url of the catalog service document (default = CATALOG_URL)
+            kwargs: keyword arguments passed on to DataService
         """
 
-        url = 'http://opendata.cbs.nl/ODataCatalog'
         self.language = language
         if language is not None:
             qo_filter =  "$filter=Language eq '{0}'".format(language)
             query_options = {'Tables':qo_filter, 'Themes':qo_filter}
         else:
             query_options = {}
-        super(Catalog, self).__init__(url = url, collections = collections, query_options = query_options)
+        super(Catalog, self).__init__(url = url, collections = collections, query_options = query_options, **kwargs)
+
+    def get_search_index(self, index = None):
+        """Get a full-text index over the tables and themes of the catalog.
+
+        Args:
+            index (SearchIndex): index to bring up to date, reindexing only new and changed entries
+                (default = None, build a new index)
+
+        Returns:
+            SearchIndex
+        """
+        if index is None:
+            index = SearchIndex()
+        index.update(self)
+        return index
 
 
 class CatalogTree(Catalog):
@@ -147,18 +483,49 @@ class CatalogTree(Catalog):
 
     Attributes:
         language (str): language catalog ('nl' = dutch, 'en' = english, default = None)
+        tree (Tree): theme tree, built from Themes on first use
+        theme_tables {theme_id: [table_id]}: tables directly under a theme, built from Tables_Themes on first use
     """
 
-    def __init__(self, language = None):
+    def __init__(self, language = None, **kwargs):
         """Initialize navigation tree CBS Open Data Catalog data service.
 
         Args:
             language (str): language catalog ('nl' = dutch, 'en' = english, default = None)
+            kwargs: keyword arguments passed on to DataService
         """
 
         self.language = language 
         collections = ['Tables', 'Themes', 'Tables_Themes']
-        super(CatalogTree, self).__init__(collections = collections, language = language)
+        indexes = {'Tables':['ID'], 'Themes':['ID', 'ParentID'], 'Tables_Themes':['ThemeID']}
+        indexes.update(kwargs.pop('indexes', {}))
+        super(CatalogTree, self).__init__(collections = collections, language = language, indexes = indexes, **kwargs)
+        self.tree = None
+        self.theme_tables = None
+
+    def set_feeds(self):
+        """Set feeds (load data) and discard the theme tree built from the previous feeds."""
+        self.tree = None
+        self.theme_tables = None
+        super(CatalogTree, self).set_feeds()
+
+    def set_tree(self):
+        """Set the theme tree and the tables per theme."""
+        self.tree = Tree((entry['ID'], entry['ParentID']) for entry in self.iter_entries('Themes'))
+        theme_tables = {}
+        for entry in self.iter_entries('Tables_Themes'):
+            theme_tables.setdefault(entry['ThemeID'], []).append(entry['TableID'])
+        self.theme_tables = theme_tables
+
+    def get_tree(self):
+        """Get the theme tree, building it on first use.
+
+        Returns:
+            Tree of theme id's
+        """
+        if self.tree is None:
+            self.set_tree()
+        return self.tree
 
     def get_parents(self, theme_id):
         """Get the parents of a theme.
@@ -169,13 +536,61 @@ class CatalogTree(Catalog):
         Returns:
             List of theme id's (parentnodes)
         """
-        ids = [theme_id]
-        parent_id = self.get_property('Themes', theme_id, 'ID', 'ParentID')
-        while not (parent_id is None):
-            ids.append(parent_id)
-            parent_id = self.get_property('Themes', parent_id, 'ID', 'ParentID')
-        ids.reverse()
-        return ids
+        return self.get_tree().get_path(theme_id)
+
+    def get_ancestors(self, theme_id):
+        """Get the ancestors of a theme, nearest first.
+
+        Args:
+            theme_id (int): unique identifier of a theme
+
+        Returns:
+            List of theme id's
+        """
+        return self.get_tree().get_ancestors(theme_id)
+
+    def get_descendants(self, theme_id):
+        """Get all themes under a theme, in navigation (depth-first) order.
+
+        Args:
+            theme_id (int): unique identifier of a theme
+
+        Returns:
+            List of theme id's
+        """
+        return self.get_tree().get_descendants(theme_id)
+
+    def get_tables(self, theme_id, recursive = True):
+        """Get the tables under a theme.
+
+        Args:
+            theme_id (int): unique identifier of a theme
+            recursive (bool): include the tables of all descendant themes (default = True)
+
+        Returns:
+            List of table id's, in navigation (depth-first) order
+        """
+        tree = self.get_tree()
+        if recursive:
+            theme_ids = tree.get_subtree(theme_id)
+        else:
+            theme_ids = [theme_id]
+        table_ids = []
+        for tid in theme_ids:
+            table_ids += self.theme_tables.get(tid, [])
+        return table_ids
+
+    def get_common_ancestor(self, theme_id, other_theme_id):
+        """Get the lowest common ancestor of two themes.
+
+        Args:
+            theme_id (int): unique identifier of a theme
+            other_theme_id (int): unique identifier of another theme
+
+        Returns:
+            Theme id (None if the themes share no ancestor)
+        """
+        return self.get_tree().get_lowest_common_ancestor(theme_id, other_theme_id)
 
     def get_children(self, theme_id):
         """Get the direct children of a theme.
@@ -199,31 +614,45 @@ class Table(DataService):
         identifier (str): unique identifier of a table
     """
 
-    def __init__(self, identifier, collections = [], query_options = {}):
+    def __init__(self, identifier, collections = [], query_options = {}, root = FEED_ROOT, **kwargs):
         """Initialize CBS Open Data Api/Feed data service.
 
         Args:
             collections (optional [str]): subset of collections exposed by the data service, default [] = all collections
             query_options (optional {collection:filter}): collection specific query_options
+            root (str): url the identifier is appended to (default = FEED_ROOT)
+            kwargs: keyword arguments passed on to DataService
 
         """
-        url = 'http://opendata.cbs.nl/ODataFeed/odata/' + identifier
+        url = root + '/' + identifier
         self.identifier = identifier
-        super(Table, self).__init__(url = url, collections = collections, query_options = query_options)
+        super(Table, self).__init__(url = url, collections = collections, query_options = query_options, **kwargs)
+
+    def partition_by(self, dimension, collection = 'TypedDataSet'):
+        """Load a collection in partitions, one per key of a dimension, requested concurrently.
+
+        Args:
+            dimension (str): name of the dimension, e.g. 'Perioden'
+            collection (str): name of the feed (default = 'TypedDataSet')
+        """
+        keys = [entry['Key'] for entry in self.iter_entries(dimension)]
+        self.partitions[collection] = ['{0} eq {1}'.format(dimension, format_literal(key)) for key in keys]
+        if collection in self.feeds:
+            del self.feeds[collection]
 
     def get_dimensions_dataset(self):
         """Get the dimensions in the dataset.
 
         Returns:
-            Dictionary of dimensions each containing an ordered dictionary of (value, label) pairs
+            Ordered dictionary of dimensions, in the order of DataProperties, each containing an ordered
+            dictionary of (value, label) pairs
         """
-        dimensions = {}
+        dimensions = OrderedDict()
         if 'DataProperties' in self.collections:
-            entries = self.get_entries('DataProperties')
-            for entry in entries:
+            for entry in self.iter_entries('DataProperties'):
                 if 'Dimension' in entry['Type']:
                     dimensions[entry['Key']] = OrderedDict()
-                    for dimension_entry in self.get_entries(entry['Key']):
+                    for dimension_entry in self.iter_entries(entry['Key']):
                         dimensions[entry['Key']][dimension_entry['Key']]=dimension_entry['Title']
         return dimensions
 
@@ -236,8 +665,7 @@ class Table(DataService):
         variables = OrderedDict()
         if 'DataProperties' in self.collections:
             variables['ID']='ID'
-            entries = self.feeds['DataProperties'].entries
-            for entry in entries:
+            for entry in self.iter_entries('DataProperties'):
                 if entry['Type'] != 'TopicGroup':
                     variables[entry['Key']] = entry['Title']
         return variables
@@ -248,14 +676,115 @@ class Table(DataService):
         Returns:
             List of datarows
         """
-        dataset = [entry.values() for entry in self.get_entries('TypedDataSet')]
+        dataset = list(self.iter_typed_dataset())
         return dataset
 
+    def iter_typed_dataset(self):
+        """Iterate over the typed data in the dataset, page by page when streaming.
+
+        Yields:
+            Datarow
+        """
+        for entry in self.iter_entries('TypedDataSet'):
+            yield entry.values()
+
+    def get_columnar_dataset(self, untyped = False, search_properties = None):
+        """Get the data in the dataset as one NumPy array per variable (requires numpy).
+
+        The arrays are built while the pages of TypedDataSet are read, dimensions
+        are integer coded in the order of get_dimensions_dataset. A feed that is
+        not loaded yet is streamed, so its entries are never hold as a whole,
+        whether or not the table streams its feeds. With untyped,
+        the pages of UntypedDataSet are decoded instead, see UntypedColumnarBuilder.
+
+        Args:
+            untyped (bool): decode UntypedDataSet, with a missing-value mask per numeric variable (default = False)
+            search_properties (Predicate or {property_name:property_value}): rows selected, sent to the service
+                with the request of the dataset when possible, see DataService.iter_query (default = None, all rows)
+
+        Returns:
+            ColumnarDataset
+        """
+        collection = 'UntypedDataSet' if untyped else 'TypedDataSet'
+        builder_class = UntypedColumnarBuilder if untyped else ColumnarBuilder
+        builder = builder_class(column_types(self.iter_entries('DataProperties')), self.get_dimensions_dataset())
+        if not search_properties:
+            if self.feeds.get(collection) is not None:
+                pages = self.iter_pages(collection)
+            else:
+                pages = self.stream_feed(collection).iter_pages()
+            for page in pages:
+                builder.add_page(page)
+            return builder.build()
+        page = []
+        for entry in self.iter_query(collection, search_properties):
+            page.append(entry)
+            if len(page) == PAGE_SIZE:
+                builder.add_page(page)
+                page = []
+        builder.add_page(page)
+        return builder.build()
+
+    def join(self, *tables, **kwargs):
+        """Join the dataset with the datasets of other tables on their shared dimensions (requires numpy).
+
+        Args:
+            tables (Table): tables to join with
+            kwargs: keyword arguments passed on to join.join_tables, e.g. filters = {'Perioden': ['2015JJ00', '2016JJ00']}
+
+        Returns:
+            ColumnarDataset, columns are prefixed with the table identifiers
+        """
+        return join_tables([self] + list(tables), **kwargs)
+
+    def get_cube(self, measures = None, dense = None):
+        """Get the typed data in the dataset as a cube with an axis per dimension (requires numpy).
+
+        Args:
+            measures (optional [str]): topics used as measures (default = None, all numeric topics)
+            dense (bool): store the cells densely (default = None, dense when at least half of the cells are occupied)
+
+        Returns:
+            Cube
+        """
+        return Cube.from_dataset(self.get_columnar_dataset(), measures = measures, dense = dense)
+
+    def save_snapshot(self, path):
+        """Save the typed data in the dataset, its dimensions and variables to a snapshot file (requires numpy).
+
+        Args:
+            path (str): path of the snapshot file
+        """
+        metadata = OrderedDict([('identifier', self.identifier), ('variables', self.get_variables_dataset())])
+        write_snapshot(path, self.get_columnar_dataset(), metadata)
+
+    @staticmethod
+    def open_snapshot(path):
+        """Open a snapshot file saved by save_snapshot through a memory map (requires numpy).
+
+        Args:
+            path (str): path of the snapshot file
+
+        Returns:
+            Snapshot, holding the ColumnarDataset and metadata {'identifier': identifier, 'variables': variables}
+        """
+        return Snapshot(path)
+
     def get_untyped_dataset(self):
         """Get the untyped data in the dataset.
 
         Returns:
             List of datarows
         """
-        dataset = [entry.values() for entry in self.get_entries('UntypedDataSet')]
-        return dataset  
\ No newline at end of file
+        dataset = list(self.iter_untyped_dataset())
+        return dataset
+
+    def iter_untyped_dataset(self):
+        """Iterate over the untyped data in the dataset, page by page when streaming.
+
+        Yields:
+            Datarow
+        """
+        for entry in self.iter_entries('UntypedDataSet'):
+            yield entry.values()
+  
\ No newline at end of file
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+
+class Checkpoint(object):
+    """Directory persisting the completed pages of a paginated download and the link to the next page.
+
+    A download that fails can be restarted: the stored pages are read back and
+    the download continues at the next link. The state and the pages are
+    written atomically, so an interrupted write never corrupts the checkpoint.
+
+    Attributes:
+        directory (str): directory holding the checkpoint
+        keep (bool): keep the checkpoint once the download has completed
+    """
+
+    def __init__(self, directory, keep = False):
+        """Initialize checkpoint.
+
+        Args:
+            directory (str): directory holding the checkpoint, created when missing
+            keep (bool): keep the checkpoint once the download has completed, a next download then reads
+                the stored pages only (default = False, remove it)
+        """
+        self.directory = directory
+        self.keep = keep
+        self.state = None
+
+    def get_partition(self, number):
+        """Get the checkpoint of a partition of the download.
+
+        Partition checkpoints are kept until the checkpoint of the whole download finishes.
+
+        Args:
+            number (int): number of the partition
+
+        Returns:
+            Checkpoint
+        """
+        return Checkpoint(os.path.join(self.directory, 'partition-{0:06d}'.format(number)), keep = True)
+
+    def page_path(self, number):
+        return os.path.join(self.directory, 'page-{0:06d}.json'.format(number))
+
+    def write(self, path, data):
+        handle, tmp_path = tempfile.mkstemp(dir = self.directory, suffix = '.tmp')
+        with os.fdopen(handle, 'w') as f:
+            json.dump(data, f)
+        os.rename(tmp_path, path)
+
+    def start(self, url):
+        """Start (or resume) the download of a url.
+
+        A checkpoint of another url is discarded.
+
+        Args:
+            url (str): url of the first page
+
+        Returns:
+            State {url, next_link, pages}, next_link is None once the download has completed
+        """
+        state = None
+        try:
+            with open(os.path.join(self.directory, 'state.json')) as f:
+                state = json.load(f)
+        except (IOError, OSError, ValueError):
+            pass
+        if state is None or state.get('url') != url:
+            self.clear()
+            os.makedirs(self.directory)
+            state = {'url':url, 'next_link':url, 'pages':0}
+            self.write(os.path.join(self.directory, 'state.json'), state)
+        self.state = state
+        return state
+
+    def iter_pages(self, object_pairs_hook = OrderedDict):
+        """Iterate over the stored pages.
+
+        Args:
+            object_pairs_hook (callable): hook turning JSON objects into entries (default = OrderedDict)
+
+        Yields:
+            List of entries hold by a single page
+        """
+        for number in range(self.state['pages']):
+            with open(self.page_path(number)) as f:
+                yield json.load(f, object_pairs_hook = object_pairs_hook)
+
+    def add_page(self, entries, next_link):
+        """Store a completed page and the link to the next page.
+
+        Args:
+            entries ([entry]): entries of the page
+            next_link (str): link to the next page (None if this was the last page)
+        """
+        number = self.state['pages']
+        self.write(self.page_path(number), [OrderedDict(entry.items()) for entry in entries])
+        self.state = {'url':self.state['url'], 'next_link':next_link, 'pages':number + 1}
+        self.write(os.path.join(self.directory, 'state.json'), self.state)
+
+    def finish(self):
+        """Mark the download as completed, removing the checkpoint unless it is kept."""
+        if not self.keep:
+            self.clear()
+
+    def clear(self):
+        """Remove the checkpoint."""
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
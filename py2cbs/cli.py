@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Command line export of CBS Open Data tables.
+
+Tables, given by identifier or as the tables under a theme of the catalog, are
+downloaded by a pool of worker processes. Every collection of a table is
+streamed page by page to a CSV or JSON lines file, so a table is never held in
+memory as a whole.
+
+    $ py2cbs 37296ned 82235NED --output data --format csv
+    $ py2cbs --theme 1234 --language en --workers 8
+"""
+
+from cbs import CatalogTree, Table, CATALOG_URL, FEED_ROOT
+from collections import OrderedDict
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+FORMATS = ('csv', 'jsonl')
+
+def encode(value):
+    if value is None:
+        return ''
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+def write_csv(f, entries):
+    """Write entries to a CSV file, with a header of the property names of the first entry.
+
+    Returns:
+        Number of entries written
+    """
+    writer = csv.writer(f)
+    rows = 0
+    for entry in entries:
+        if rows == 0:
+            writer.writerow([encode(name) for name in entry.keys()])
+        writer.writerow([encode(value) for value in entry.values()])
+        rows += 1
+    return rows
+
+def write_jsonl(f, entries):
+    """Write entries to a JSON lines file.
+
+    Returns:
+        Number of entries written
+    """
+    rows = 0
+    for entry in entries:
+        f.write(json.dumps(OrderedDict(entry.items())))
+        f.write('\n')
+        rows += 1
+    return rows
+
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl}
+
+def export_table(identifier, directory, file_format = 'csv', collections = ['TypedDataSet'], root = FEED_ROOT):
+    """Stream collections of a table to files named <identifier>/<collection>.<format>.
+
+    Every file is written to a temporary file first and renamed when complete.
+
+    Args:
+        identifier (str): identifier of the table
+        directory (str): output directory
+        file_format (str): 'csv' or 'jsonl' (default = 'csv')
+        collections ([str]): collections exported (default = ['TypedDataSet'])
+        root (str): url of the OData feeds (default = FEED_ROOT)
+
+    Returns:
+        Ordered dictionary {identifier, rows, bytes, seconds}
+    """
+    started = time.time()
+    table = Table(identifier, collections = collections, root = root, stream = True, incremental = True)
+    path = os.path.join(directory, identifier)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    rows = 0
+    size = 0
+    for collection in table.collections:
+        file_path = os.path.join(path, '{0}.{1}'.format(collection, file_format))
+        handle, tmp_path = tempfile.mkstemp(dir = path, suffix = '.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as f:
+                rows += WRITERS[file_format](f, table.iter_entries(collection))
+            os.rename(tmp_path, file_path)
+        except:
+            os.remove(tmp_path)
+            if len(os.listdir(path)) == 0:
+                os.rmdir(path)
+            raise
+        size += os.path.getsize(file_path)
+    return OrderedDict([('identifier', identifier), ('rows', rows), ('bytes', size), ('seconds', time.time() - started)])
+
+def export_task(task):
+    """Run export_table in a worker process, returning (result, error message) instead of raising."""
+    identifier, args = task
+    try:
+        return export_table(identifier, *args), None
+    except KeyboardInterrupt:
+        raise
+    except Exception as e:
+        return OrderedDict([('identifier', identifier)]), '{0}: {1}'.format(type(e).__name__, e)
+
+def get_theme_tables(theme_id, language = None, url = CATALOG_URL):
+    """Get the identifiers of the tables under a theme and its descendants.
+
+    Args:
+        theme_id (int): unique identifier of a theme
+        language (str): language catalog ('nl' = dutch, 'en' = english, default = None)
+        url (str): url of the catalog service document (default = CATALOG_URL)
+
+    Returns:
+        List of table identifiers, in navigation order
+    """
+    catalog = CatalogTree(language = language, url = url)
+    identifiers = []
+    for table_id in catalog.get_tables(theme_id):
+        identifier = catalog.get_property('Tables', table_id, 'ID', 'Identifier')
+        if identifier is not None and identifier not in identifiers:
+            identifiers.append(identifier)
+    return identifiers
+
+def format_result(result):
+    rate = result['rows'] / result['seconds'] if result['seconds'] > 0 else 0.0
+    return '{0}: {1} rows, {2:.1f} KiB in {3:.2f}s ({4:.0f} rows/s)'.format(
+           result['identifier'], result['rows'], result['bytes'] / 1024.0, result['seconds'], rate)
+
+def main(argv = None):
+    """Run the command line export.
+
+    Args:
+        argv ([str]): command line arguments (default = None, sys.argv)
+
+    Returns:
+        Exit status: 0 if every table was exported, 1 otherwise
+    """
+    parser = argparse.ArgumentParser(prog = 'py2cbs', description = 'Export CBS (Netherlands Statistics) Open Data tables to CSV or JSON lines files')
+    parser.add_argument('identifiers', nargs = '*', metavar = 'identifier', help = 'table identifier, e.g. 37296ned')
+    parser.add_argument('--theme', type = int, action = 'append', default = [], help = 'export the tables under a theme of the catalog')
+    parser.add_argument('--language', choices = ['nl', 'en'], help = 'language of the catalog tables under a theme')
+    parser.add_argument('-o', '--output', default = '.', help = 'output directory (default: current directory)')
+    parser.add_argument('-f', '--format', choices = FORMATS, default = 'csv', help = 'file format (default: csv)')
+    parser.add_argument('-c', '--collection', action = 'append', help = 'collection to export (default: TypedDataSet)')
+    parser.add_argument('-w', '--workers', type = int, default = 4, help = 'number of worker processes (default: 4)')
+    parser.add_argument('--root', default = FEED_ROOT, help = 'url of the OData feeds')
+    parser.add_argument('--catalog', default = CATALOG_URL, help = 'url of the catalog')
+    options = parser.parse_args(argv)
+
+    identifiers = list(options.identifiers)
+    for theme_id in options.theme:
+        identifiers += [identifier for identifier in get_theme_tables(theme_id, options.language, options.catalog) if identifier not in identifiers]
+    if len(identifiers) == 0:
+        parser.error('no tables to export, give table identifiers or --theme')
+
+    args = (options.output, options.format, options.collection or ['TypedDataSet'], options.root)
+    tasks = [(identifier, args) for identifier in identifiers]
+    started = time.time()
+    rows = 0
+    size = 0
+    failed = []
+    pool = multiprocessing.Pool(max(1, min(options.workers, len(tasks))))
+    try:
+        for result, error in pool.imap_unordered(export_task, tasks):
+            if error is not None:
+                failed.append(result['identifier'])
+                print('{0}: failed, {1}'.format(result['identifier'], error))
+            else:
+                rows += result['rows']
+                size += result['bytes']
+                print(format_result(result))
+            sys.stdout.flush()
+        pool.close()
+    except BaseException:
+        # interrupted or failed: stop the workers, joining a pool that is still running fails
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    summary = OrderedDict([('identifier', '{0} of {1} tables exported'.format(len(tasks) - len(failed), len(tasks))),
+                           ('rows', rows), ('bytes', size), ('seconds', time.time() - started)])
+    print(format_result(summary))
+    if len(failed) > 0:
+        print('Failed: {0}'.format(', '.join(failed)))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
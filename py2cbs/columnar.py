@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from array import array
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+NAN = float('nan')
+
+# type codes: 'd' = float, 'l' = integer, 'category' = integer coded dimension, 'object' = any
+NUMERIC_TYPES = {'Double':'d', 'Float':'d', 'Decimal':'d', 'Long':'l', 'Integer':'l', 'Short':'l', 'Byte':'l'}
+# CBS symbols in untyped values for figures that are unknown, confidential, nil or not applicable
+PLACEHOLDERS = ('', '.', 'x', 'X', '?', '-')
+
+def require_numpy():
+    if numpy is None:
+        raise ImportError('Columnar datasets require numpy')
+
+def column_types(data_properties):
+    """Get the type code per column of a dataset from its DataProperties.
+
+    Args:
+        data_properties ([entry]): entries of the DataProperties feed
+
+    Returns:
+        Ordered dictionary of (column name, type code) pairs
+    """
+    types = OrderedDict([('ID', 'l')])
+    for entry in data_properties:
+        if 'Dimension' in entry['Type']:
+            types[entry['Key']] = 'category'
+        elif entry['Type'] != 'TopicGroup':
+            kind = NUMERIC_TYPES.get(entry.get('Datatype'), 'object')
+            if kind == 'l' and entry.get('Decimals'):
+                kind = 'd'
+            types[entry['Key']] = kind
+    return types
+
+def decode_values(values, kind):
+    """Decode untyped values (padded strings) into a numeric array.
+
+    Args:
+        values ([str]): untyped values, e.g. '    1234', '     .' or None
+        kind (str): type code, 'd' or 'l'
+
+    Returns:
+        (numpy.ndarray of values, boolean numpy.ndarray marking missing values) pair; missing values are
+        NaN in a float array and 0 in an integer array. Values of an 'l' column that are not integers
+        (e.g. '12.5') are decoded into a float array, as for 'd'.
+    """
+    raw = numpy.array([value or u'' for value in values], dtype = unicode)
+    stripped = numpy.char.strip(raw)
+    missing = numpy.in1d(stripped, numpy.array(PLACEHOLDERS, dtype = unicode))
+    present = ~missing
+    try:
+        numbers = stripped[present].astype(float)
+    except ValueError:
+        # other symbols: decode value by value
+        numbers = []
+        for position in numpy.flatnonzero(present):
+            try:
+                numbers.append(float(stripped[position]))
+            except ValueError:
+                missing[position] = True
+        present = ~missing
+        numbers = numpy.array(numbers, dtype = float)
+    if kind == 'l' and numpy.all(numpy.floor(numbers) == numbers) and numpy.all(numpy.abs(numbers) < 2.0 ** 63):
+        decoded = numpy.zeros(len(raw), dtype = numpy.int64)
+    else:
+        decoded = numpy.full(len(raw), numpy.nan)
+    decoded[present] = numbers
+    return decoded, missing
+
+class ColumnarDataset(object):
+    """Class representing a dataset as one typed NumPy array per column.
+
+    Dimension columns hold integer codes, indexing the keys in categories.
+
+    Attributes:
+        columns {name: numpy.ndarray}: column arrays, in dataset order
+        types {name: type code}: type code per column
+        categories {dimension: [key]}: dimension keys per integer code
+        labels {dimension: [title]}: dimension titles per integer code
+        masks {name: numpy.ndarray}: boolean arrays marking the missing values of decoded columns
+    """
+
+    def __init__(self, columns, types, categories, labels, masks = None):
+        """Initialize columnar dataset.
+
+        Args:
+            columns ({name: numpy.ndarray}): column arrays of equal length
+            types ({name: type code}): type code per column
+            categories ({dimension: [key]}): dimension keys per integer code
+            labels ({dimension: [title]}): dimension titles per integer code
+            masks ({name: numpy.ndarray}): boolean arrays marking missing values per column (default = None, none)
+        """
+        self.columns = columns
+        self.types = types
+        self.categories = categories
+        self.labels = labels
+        self.masks = masks if masks is not None else OrderedDict()
+        self.lookup = dict((name, dict((key, code) for code, key in enumerate(keys))) for name, keys in categories.items())
+
+    def __len__(self):
+        if len(self.columns) == 0:
+            return 0
+        return len(self.columns.values()[0])
+
+    def column(self, name):
+        """Get a column (integer codes for a dimension).
+
+        Args:
+            name (str): name of the column
+
+        Returns:
+            numpy.ndarray
+        """
+        return self.columns[name]
+
+    def keys(self, name):
+        """Get the keys of a dimension column.
+
+        Args:
+            name (str): name of the dimension
+
+        Returns:
+            numpy.ndarray of keys
+        """
+        return numpy.array(self.categories[name], dtype = object)[self.columns[name]]
+
+    def code(self, name, key):
+        """Get the integer code of a dimension key.
+
+        Args:
+            name (str): name of the dimension
+            key (str): key of the dimension entry
+
+        Returns:
+            Integer code (-1 if the key does not occur)
+        """
+        return self.lookup[name].get(key, -1)
+
+    def mask(self, **conditions):
+        """Select rows by value, dimensions by key.
+
+        Args:
+            conditions ({name: value or [value]}): value(s) selected per column
+
+        Returns:
+            Boolean numpy.ndarray
+        """
+        selected = numpy.ones(len(self), dtype = bool)
+        for name, values in conditions.items():
+            if not isinstance(values, (list, tuple, set)):
+                values = [values]
+            if name in self.lookup:
+                values = [self.code(name, value) for value in values]
+            selected &= numpy.in1d(self.columns[name], list(values))
+        return selected
+
+    def filter(self, mask = None, **conditions):
+        """Get the rows selected by a mask and/or conditions.
+
+        Args:
+            mask (numpy.ndarray): boolean mask or row positions (default = None, all rows)
+            conditions ({name: value or [value]}): value(s) selected per column
+
+        Returns:
+            ColumnarDataset
+        """
+        if mask is None:
+            mask = self.mask(**conditions)
+        elif len(conditions) > 0:
+            mask = mask & self.mask(**conditions)
+        columns = OrderedDict((name, column[mask]) for name, column in self.columns.items())
+        masks = OrderedDict((name, missing[mask]) for name, missing in self.masks.items())
+        return ColumnarDataset(columns, self.types, self.categories, self.labels, masks)
+
+    def sum(self, name, mask = None):
+        """Sum a numeric column, ignoring missing values.
+
+        Args:
+            name (str): name of the column
+            mask (numpy.ndarray): boolean mask of the rows summed (default = None, all rows)
+
+        Returns:
+            Sum
+        """
+        column = self.columns[name]
+        if name in self.masks:
+            column = numpy.where(self.masks[name], numpy.nan, column)
+        if mask is not None:
+            column = column[mask]
+        return numpy.nansum(column)
+
+class ColumnarBuilder(object):
+    """Class building a ColumnarDataset page by page.
+
+    Values are appended to compact array.array buffers while the pages arrive,
+    and the buffers are handed to NumPy without copying when the dataset is built.
+    An integer column holding missing values is converted to float (NaN).
+
+    Attributes:
+        types {name: type code}: type code per column
+        categories {dimension: [key]}: dimension keys per integer code
+        labels {dimension: [title]}: dimension titles per integer code
+        buffers {name: array or list}: values per column
+    """
+
+    def __init__(self, types, dimensions):
+        """Initialize builder.
+
+        Args:
+            types ({name: type code}): type code per column, see column_types
+            dimensions ({dimension: {key: title}}): dimension entries, see Table.get_dimensions_dataset
+        """
+        require_numpy()
+        self.types = OrderedDict(types)
+        self.categories = OrderedDict((name, list(entries.keys())) for name, entries in dimensions.items())
+        self.labels = OrderedDict((name, list(entries.values())) for name, entries in dimensions.items())
+        self.codes = dict((name, dict((key, code) for code, key in enumerate(keys))) for name, keys in self.categories.items())
+        self.buffers = None
+
+    def new_buffer(self, name):
+        kind = self.types.get(name, 'object')
+        if kind == 'category':
+            self.categories.setdefault(name, [])
+            self.labels.setdefault(name, [])
+            self.codes.setdefault(name, {})
+            return array('i')
+        if kind in ('d', 'l'):
+            return array(kind)
+        self.types[name] = 'object'
+        return []
+
+    def encode(self, name, key):
+        codes = self.codes[name]
+        if key not in codes:
+            codes[key] = len(self.categories[name])
+            self.categories[name].append(key)
+            self.labels[name].append(key)
+        return codes[key]
+
+    def add_page(self, entries):
+        """Append the entries of a page.
+
+        Args:
+            entries ([entry]): entries, each a mapping of (property name, property value) pairs
+        """
+        if len(entries) == 0:
+            return
+        if self.buffers is None:
+            self.buffers = OrderedDict((name, self.new_buffer(name)) for name in entries[0].keys())
+        for name, buffer in self.buffers.items():
+            values = [entry[name] for entry in entries]
+            kind = self.types[name]
+            if kind == 'category':
+                codes = self.codes[name]
+                buffer.extend([codes[value] if value in codes else self.encode(name, value) for value in values])
+            elif kind == 'd':
+                buffer.extend([NAN if value is None else value for value in values])
+            elif kind == 'l':
+                length = len(buffer)
+                try:
+                    buffer.extend(values)
+                except (TypeError, OverflowError):
+                    del buffer[length:]
+                    buffer = array('d', buffer)
+                    buffer.extend([NAN if value is None else value for value in values])
+                    self.buffers[name] = buffer
+                    self.types[name] = 'd'
+            else:
+                buffer.extend(values)
+
+    def build(self):
+        """Build the dataset.
+
+        Returns:
+            ColumnarDataset
+        """
+        columns = OrderedDict()
+        for name, buffer in (self.buffers or {}).items():
+            if isinstance(buffer, array):
+                dtype = numpy.dtype('{0}{1}'.format('f' if buffer.typecode == 'd' else 'i', buffer.itemsize))
+                columns[name] = numpy.frombuffer(buffer, dtype = dtype)
+            else:
+                column = numpy.empty(len(buffer), dtype = object)
+                column[:] = buffer
+                columns[name] = column
+        types = OrderedDict((name, self.types[name]) for name in columns)
+        return ColumnarDataset(columns, types, self.categories, self.labels)
+
+class UntypedColumnarBuilder(ColumnarBuilder):
+    """Class building a ColumnarDataset page by page from UntypedDataSet entries.
+
+    The numeric columns of every page are decoded in bulk into NumPy arrays
+    according to the types and decimals declared in DataProperties: padding is
+    stripped, and CBS placeholder symbols ('.', 'x', '-', ...) as well as other
+    non-numeric values are marked in a missing-value mask per column. Integer
+    columns stay integer, holding 0 where the mask is set, unless they hold
+    decimals: these become float columns. Dimension and other
+    columns are built as by ColumnarBuilder.
+
+    Attributes:
+        names ([str]): names of the columns, in dataset order
+        chunks {name: [numpy.ndarray]}: decoded values per numeric column, one array per page
+        missing {name: [numpy.ndarray]}: missing-value masks per numeric column, one array per page
+    """
+
+    def __init__(self, types, dimensions):
+        """Initialize builder.
+
+        Args:
+            types ({name: type code}): type code per column, see column_types
+            dimensions ({dimension: {key: title}}): dimension entries, see Table.get_dimensions_dataset
+        """
+        super(UntypedColumnarBuilder, self).__init__(types, dimensions)
+        self.names = None
+        self.chunks = OrderedDict()
+        self.missing = OrderedDict()
+
+    def add_page(self, entries):
+        """Decode and append the entries of a page.
+
+        Args:
+            entries ([entry]): entries, each a mapping of (property name, property value) pairs
+        """
+        if len(entries) == 0:
+            return
+        if self.names is None:
+            self.names = list(entries[0].keys())
+            self.buffers = OrderedDict()
+            for name in self.names:
+                if name != 'ID' and self.types.get(name) in ('d', 'l'):
+                    self.chunks[name] = []
+                    self.missing[name] = []
+                else:
+                    self.buffers[name] = self.new_buffer(name)
+        super(UntypedColumnarBuilder, self).add_page(entries)
+        for name, chunks in self.chunks.items():
+            values, missing = decode_values([entry[name] for entry in entries], self.types[name])
+            if self.types[name] == 'l' and values.dtype.kind == 'f':
+                # decimals in an integer column: the column becomes a float column
+                for i in range(len(chunks)):
+                    chunks[i] = chunks[i].astype(float)
+                    chunks[i][self.missing[name][i]] = numpy.nan
+                self.types[name] = 'd'
+            chunks.append(values)
+            self.missing[name].append(missing)
+
+    def build(self):
+        """Build the dataset.
+
+        Returns:
+            ColumnarDataset, with a missing-value mask per numeric column
+        """
+        dataset = super(UntypedColumnarBuilder, self).build()
+        columns = OrderedDict()
+        masks = OrderedDict()
+        for name in self.names or []:
+            if name in self.chunks:
+                columns[name] = numpy.concatenate(self.chunks[name])
+                masks[name] = numpy.concatenate(self.missing[name])
+            else:
+                columns[name] = dataset.columns[name]
+        types = OrderedDict((name, self.types[name]) for name in columns)
+        return ColumnarDataset(columns, types, self.categories, self.labels, masks)
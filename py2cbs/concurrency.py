@@ -0,0 +1,379 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+from Queue import Queue, Empty
+
+logger = logging.getLogger(__name__)
+
+# executor of the worker running in the current thread, see Executor.wait
+current = threading.local()
+
+def map_threaded(function, items, workers = 1):
+    """Apply a function to every item using a pool of worker threads.
+
+    Args:
+        function (callable): function applied to a single item
+        items ([item]): items to process
+        workers (int): number of worker threads (default = 1, process the items in the calling thread)
+
+    Returns:
+        List of (result, exception) pairs in the order of the items, exception is None on success
+    """
+    items = list(items)
+    outcomes = [None] * len(items)
+
+    def run(i):
+        try:
+            outcomes[i] = (function(items[i]), None)
+        except Exception as e:
+            outcomes[i] = (None, e)
+
+    if workers <= 1 or len(items) <= 1:
+        for i in range(len(items)):
+            run(i)
+        return outcomes
+
+    queue = Queue()
+    for i in range(len(items)):
+        queue.put(i)
+
+    def worker():
+        while True:
+            try:
+                i = queue.get_nowait()
+            except Empty:
+                return
+            run(i)
+
+    threads = [threading.Thread(target = worker) for _ in range(min(workers, len(items)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+class Future(object):
+    """Result of a call running in the background."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.finished = False
+        self.value = None
+        self.error = None
+        self.callbacks = []
+
+    def done(self):
+        """Check whether the call has finished."""
+        with self.condition:
+            return self.finished
+
+    def wait(self, timeout = None):
+        """Wait until the call has finished.
+
+        A worker of an executor runs the calls queued on its executor while it
+        waits, see Executor.wait.
+
+        Args:
+            timeout (float): maximum number of seconds to wait (default = None, no limit)
+
+        Returns:
+            True if the call has finished
+        """
+        executor = getattr(current, 'executor', None)
+        if executor is not None:
+            return executor.wait(self, timeout)
+        return self.block(timeout)
+
+    def block(self, timeout = None):
+        """Wait until the call has finished without running other calls, see wait."""
+        with self.condition:
+            if not self.finished:
+                self.condition.wait(timeout)
+            return self.finished
+
+    def result(self, timeout = None):
+        """Wait for and return the result of the call, raising its exception if it failed.
+
+        Args:
+            timeout (float): maximum number of seconds to wait (default = None, no limit)
+
+        Returns:
+            Result of the call
+        """
+        if not self.wait(timeout):
+            raise RuntimeError('Timed out waiting for result')
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+    def exception(self, timeout = None):
+        """Wait for the call and return its exception (None if it succeeded).
+
+        Args:
+            timeout (float): maximum number of seconds to wait (default = None, no limit)
+        """
+        if not self.wait(timeout):
+            raise RuntimeError('Timed out waiting for result')
+        return self.error
+
+    def add_done_callback(self, callback):
+        """Call a function with the future once it is done, immediately if it is done already.
+
+        Args:
+            callback (callable): function called with the future
+        """
+        with self.condition:
+            if not self.finished:
+                self.callbacks.append(callback)
+                return
+        self.call(callback)
+
+    def set_result(self, value):
+        self.finish(value, None)
+
+    def set_exception(self, error):
+        self.finish(None, error)
+
+    def finish(self, value, error):
+        with self.condition:
+            self.value = value
+            self.error = error
+            self.finished = True
+            callbacks, self.callbacks = self.callbacks, []
+            self.condition.notify_all()
+        for callback in callbacks:
+            self.call(callback)
+
+    def call(self, callback):
+        # a failing callback is logged, it must not keep the other callbacks or the worker from running
+        try:
+            callback(self)
+        except Exception:
+            logger.exception('Exception in done callback of %r', self)
+
+    def then(self, function):
+        """Chain a function applied to the result of the call.
+
+        Args:
+            function (callable): function applied to the result
+
+        Returns:
+            Future of the result of the function, failing with the exception of the call
+        """
+        chained = Future()
+
+        def done(future):
+            if future.error is not None:
+                chained.set_exception(future.error)
+                return
+            try:
+                value = function(future.value)
+            except Exception as e:
+                chained.set_exception(e)
+            else:
+                chained.set_result(value)
+
+        self.add_done_callback(done)
+        return chained
+
+def chain(future, function):
+    """Chain a function returning a future, e.g. a call submitted to an executor, to a future.
+
+    Args:
+        future (Future): future
+        function (callable): function applied to the result of the future, returning a Future
+
+    Returns:
+        Future of the result of the future returned by the function, failing with the exception of either
+    """
+    chained = Future()
+
+    def done(future):
+        if future.error is not None:
+            chained.set_exception(future.error)
+            return
+        try:
+            following = function(future.value)
+        except Exception as e:
+            chained.set_exception(e)
+        else:
+            following.add_done_callback(lambda following: chained.finish(following.value, following.error))
+
+    future.add_done_callback(done)
+    return chained
+
+def gather(futures):
+    """Combine futures into a single future.
+
+    Args:
+        futures ([Future]): futures to combine
+
+    Returns:
+        Future of the list of (result, exception) pairs in the order of the futures
+    """
+    futures = list(futures)
+    combined = Future()
+    outcomes = [None] * len(futures)
+    remaining = [len(futures)]
+    lock = threading.Lock()
+    if len(futures) == 0:
+        combined.set_result(outcomes)
+
+    def done(i, future):
+        outcomes[i] = (future.value, future.error)
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            combined.set_result(outcomes)
+
+    for i, future in enumerate(futures):
+        future.add_done_callback(lambda future, i = i: done(i, future))
+    return combined
+
+class Executor(object):
+    """Pool of worker threads running calls in the background.
+
+    The number of workers bounds the number of concurrent calls, and thereby
+    the number of concurrent requests of everything sharing the executor. A
+    call waiting for the result of another call on the same executor runs the
+    queued calls meanwhile, so it cannot deadlock the executor.
+
+    Attributes:
+        workers (int): number of worker threads
+    """
+
+    def __init__(self, workers = 4):
+        """Initialize executor.
+
+        Args:
+            workers (int): number of worker threads (default = 4)
+        """
+        self.workers = workers
+        self.queue = Queue()
+        self.threads = []
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def submit(self, function, *args, **kwargs):
+        """Run a function in the background.
+
+        Args:
+            function (callable): function to call
+            args, kwargs: arguments of the function
+
+        Returns:
+            Future of the result of the function
+        """
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError('Executor has been shut down')
+            self.queue.put((future, function, args, kwargs))
+            # replace workers that died
+            self.threads = [thread for thread in self.threads if thread.is_alive()]
+            if len(self.threads) < self.workers:
+                thread = threading.Thread(target = self.work)
+                thread.daemon = True
+                thread.start()
+                self.threads.append(thread)
+        return future
+
+    def work(self):
+        current.executor = self
+        while True:
+            task = self.queue.get()
+            if task is None:
+                return
+            try:
+                self.run(task)
+            except Exception:
+                logger.exception('Exception in worker of %r', self)
+
+    def run(self, task):
+        future, function, args, kwargs = task
+        try:
+            value = function(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(value)
+
+    def wait(self, future, timeout = None):
+        """Wait in a worker until a future is done, running the queued calls meanwhile.
+
+        Args:
+            future (Future): future waited for
+            timeout (float): maximum number of seconds to wait (default = None, no limit)
+
+        Returns:
+            True if the future is done
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while not future.done():
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                return False
+            try:
+                task = self.queue.get_nowait()
+            except Empty:
+                # poll, a call may be queued while waiting
+                future.block(0.01 if remaining is None else min(0.01, remaining))
+                continue
+            if task is None:
+                # shutting down, leave the stop signal to the workers
+                self.queue.put(None)
+                return future.block(remaining)
+            self.run(task)
+        return True
+
+    def shutdown(self, wait = True):
+        """Stop the workers once the submitted calls have finished.
+
+        Args:
+            wait (bool): wait for the workers to stop (default = True)
+        """
+        with self.lock:
+            self.closed = True
+            threads = list(self.threads)
+        for _ in threads:
+            self.queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+# executors shared by the asynchronous classes constructed without an executor, per number of workers
+default_executors = {}
+default_lock = threading.Lock()
+
+def get_default_executor(workers = 4):
+    """Get the executor shared by everything constructed without an executor.
+
+    Args:
+        workers (int): number of worker threads (default = 4)
+
+    Returns:
+        Executor, one per number of workers for the lifetime of the process
+    """
+    with default_lock:
+        if workers not in default_executors:
+            default_executors[workers] = Executor(workers)
+        return default_executors[workers]
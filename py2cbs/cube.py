@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from columnar import require_numpy, numpy
+from collections import OrderedDict
+
+AGGREGATES = ('sum', 'count', 'mean', 'min', 'max')
+
+class Cube(object):
+    """Multidimensional view of a dataset: one integer axis per dimension, one array of cells per measure.
+
+    A dense cube holds every measure as an array with one axis per dimension
+    (NaN for missing cells); a sparse cube holds the integer codes of the
+    occupied cells per dimension and one value array per measure.
+
+    Attributes:
+        dimensions ([str]): names of the dimensions, in axis order
+        categories {dimension: [key]}: dimension keys per integer code
+        labels {dimension: [title]}: dimension titles per integer code
+        measures {name: numpy.ndarray}: cells per measure
+        codes {dimension: numpy.ndarray}: codes of the occupied cells per dimension (None for a dense cube)
+    """
+
+    def __init__(self, dimensions, categories, labels, measures, codes = None):
+        """Initialize cube.
+
+        Args:
+            dimensions ([str]): names of the dimensions, in axis order
+            categories ({dimension: [key]}): dimension keys per integer code
+            labels ({dimension: [title]}): dimension titles per integer code
+            measures ({name: numpy.ndarray}): cells per measure, arrays shaped by the dimensions when dense
+            codes ({dimension: numpy.ndarray}): codes of the occupied cells per dimension (default = None, dense)
+        """
+        require_numpy()
+        self.dimensions = list(dimensions)
+        self.categories = OrderedDict((name, list(categories[name])) for name in self.dimensions)
+        self.labels = OrderedDict((name, list(labels[name])) for name in self.dimensions)
+        self.measures = OrderedDict(measures)
+        self.codes = codes
+        self.lookup = dict((name, dict((key, code) for code, key in enumerate(keys))) for name, keys in self.categories.items())
+
+    @classmethod
+    def from_dataset(cls, dataset, measures = None, dense = None):
+        """Build a cube from a columnar dataset, dimension columns becoming axes.
+
+        Every combination of dimension keys is expected to occur once, as in CBS datasets.
+
+        Args:
+            dataset (ColumnarDataset): dataset, see Table.get_columnar_dataset
+            measures (optional [str]): numeric columns used as measures (default = None, all numeric columns but ID)
+            dense (bool): store the cells densely (default = None, dense when at least half of the cells are occupied)
+
+        Returns:
+            Cube
+        """
+        dimensions = [name for name, kind in dataset.types.items() if kind == 'category']
+        if measures is None:
+            measures = [name for name, kind in dataset.types.items() if kind in ('d', 'l') and name != 'ID']
+        codes = OrderedDict((name, numpy.asarray(dataset.columns[name], dtype = numpy.intp)) for name in dimensions)
+        values = OrderedDict()
+        for name in measures:
+            values[name] = numpy.asarray(dataset.columns[name], dtype = float)
+            if name in dataset.masks:
+                values[name] = numpy.where(dataset.masks[name], numpy.nan, values[name])
+        cube = cls(dimensions, dataset.categories, dataset.labels, values, codes)
+        if dense is None:
+            dense = cube.size() <= max(1024, 2 * len(dataset))
+        if dense:
+            cube = cube.to_dense()
+        return cube
+
+    @property
+    def shape(self):
+        """Number of keys per dimension."""
+        return tuple(len(self.categories[name]) for name in self.dimensions)
+
+    def size(self):
+        """Number of cells of the cube, occupied or not."""
+        size = 1
+        for length in self.shape:
+            size *= length
+        return size
+
+    def is_dense(self):
+        return self.codes is None
+
+    def to_dense(self):
+        """Get the cube with dense cells.
+
+        Returns:
+            Cube
+        """
+        if self.is_dense():
+            return self
+        index = tuple(self.codes[name] for name in self.dimensions)
+        measures = OrderedDict()
+        for name, values in self.measures.items():
+            cells = numpy.full(self.shape, numpy.nan)
+            cells[index] = values
+            measures[name] = cells
+        return Cube(self.dimensions, self.categories, self.labels, measures)
+
+    def to_sparse(self):
+        """Get the cube with sparse cells, holding the cells where any measure has a value.
+
+        Returns:
+            Cube
+        """
+        if not self.is_dense():
+            return self
+        occupied = numpy.zeros(self.shape, dtype = bool)
+        for cells in self.measures.values():
+            occupied |= ~numpy.isnan(cells)
+        positions = numpy.nonzero(occupied)
+        codes = OrderedDict((name, positions[axis]) for axis, name in enumerate(self.dimensions))
+        measures = OrderedDict((name, cells[positions]) for name, cells in self.measures.items())
+        return Cube(self.dimensions, self.categories, self.labels, measures, codes)
+
+    def code(self, dimension, key):
+        """Get the integer code of a dimension key.
+
+        Raises:
+            KeyError: the key does not occur in the dimension
+        """
+        return self.lookup[dimension][key]
+
+    def value(self, measure, **keys):
+        """Get a single cell.
+
+        Args:
+            measure (str): name of the measure
+            keys ({dimension: key}): key of every dimension
+
+        Returns:
+            Value of the cell (NaN if missing)
+        """
+        position = tuple(self.code(name, keys[name]) for name in self.dimensions)
+        if self.is_dense():
+            return self.measures[measure][position]
+        selected = numpy.ones(len(self.measures[measure]), dtype = bool)
+        for name, code in zip(self.dimensions, position):
+            selected &= self.codes[name] == code
+        values = self.measures[measure][selected]
+        return values[0] if len(values) > 0 else numpy.nan
+
+    def slice(self, **selection):
+        """Select keys of dimensions.
+
+        Args:
+            selection ({dimension: key or [key]}): a single key removes the dimension, a list of keys keeps
+                the dimension with only those keys
+
+        Returns:
+            Cube
+        """
+        dimensions = []
+        categories = OrderedDict()
+        labels = OrderedDict()
+        selected_codes = OrderedDict()
+        for name in self.dimensions:
+            if name not in selection:
+                dimensions.append(name)
+                categories[name] = self.categories[name]
+                labels[name] = self.labels[name]
+                continue
+            keys = selection[name]
+            if isinstance(keys, (list, tuple)):
+                codes = [self.code(name, key) for key in keys]
+                dimensions.append(name)
+                categories[name] = [self.categories[name][code] for code in codes]
+                labels[name] = [self.labels[name][code] for code in codes]
+                selected_codes[name] = numpy.array(codes, dtype = numpy.intp)
+            else:
+                selected_codes[name] = self.code(name, keys)
+        if self.is_dense():
+            measures = OrderedDict()
+            for measure, cells in self.measures.items():
+                # taking the last axes first keeps the numbers of the other axes
+                for axis in reversed(range(len(self.dimensions))):
+                    if self.dimensions[axis] in selected_codes:
+                        cells = numpy.take(cells, selected_codes[self.dimensions[axis]], axis = axis)
+                measures[measure] = cells
+            return Cube(dimensions, categories, labels, measures)
+        mask = numpy.ones(len(self.measures.values()[0]) if self.measures else 0, dtype = bool)
+        for name, codes in selected_codes.items():
+            mask &= numpy.in1d(self.codes[name], numpy.atleast_1d(codes))
+        codes = OrderedDict()
+        for name in dimensions:
+            column = self.codes[name][mask]
+            if name in selected_codes:
+                remap = numpy.full(len(self.categories[name]), -1, dtype = numpy.intp)
+                remap[selected_codes[name]] = numpy.arange(len(selected_codes[name]))
+                column = remap[column]
+            codes[name] = column
+        measures = OrderedDict((name, values[mask]) for name, values in self.measures.items())
+        return Cube(dimensions, categories, labels, measures, codes)
+
+    def rollup(self, dimensions = [], aggregate = 'sum'):
+        """Aggregate the cells over all dimensions but the given ones (group by the given dimensions).
+
+        Missing cells are ignored; a group without values is NaN (0 for count).
+
+        Args:
+            dimensions ([str]): dimensions kept, in axis order of the result (default = [], aggregate all cells)
+            aggregate (str): 'sum', 'count', 'mean', 'min' or 'max' (default = 'sum')
+
+        Returns:
+            Cube, dense when its cells fit
+        """
+        if aggregate not in AGGREGATES:
+            raise ValueError('Unknown aggregate: {0}'.format(aggregate))
+        dimensions = list(dimensions)
+        sparse = self.to_sparse()
+        shape = tuple(len(self.categories[name]) for name in dimensions)
+        if len(dimensions) > 0:
+            groups = numpy.ravel_multi_index(tuple(sparse.codes[name] for name in dimensions), shape)
+        else:
+            groups = numpy.zeros(len(sparse.measures.values()[0]) if sparse.measures else 0, dtype = numpy.intp)
+        size = int(numpy.prod(shape))
+        dense = size <= max(1024, 2 * len(groups))
+        if dense:
+            occupied = numpy.arange(size)
+            inverse = groups
+        else:
+            occupied, inverse = numpy.unique(groups, return_inverse = True)
+        measures = OrderedDict()
+        for name, values in sparse.measures.items():
+            measures[name] = aggregate_groups(values, inverse, len(occupied), aggregate)
+        categories = OrderedDict((name, self.categories[name]) for name in dimensions)
+        labels = OrderedDict((name, self.labels[name]) for name in dimensions)
+        if dense:
+            measures = OrderedDict((name, cells.reshape(shape)) for name, cells in measures.items())
+            return Cube(dimensions, categories, labels, measures)
+        positions = numpy.unravel_index(occupied, shape)
+        codes = OrderedDict((name, positions[axis]) for axis, name in enumerate(dimensions))
+        return Cube(dimensions, categories, labels, measures, codes)
+
+    def pivot(self, rows, columns, measure, aggregate = 'sum', labels = True):
+        """Pivot a measure to a table with the keys of one dimension as rows and of another as columns.
+
+        The other dimensions are aggregated.
+
+        Args:
+            rows (str): dimension of the rows
+            columns (str): dimension of the columns
+            measure (str): name of the measure
+            aggregate (str): aggregate over the other dimensions, see rollup (default = 'sum')
+            labels (bool): use dimension titles instead of keys (default = True)
+
+        Returns:
+            (row labels, column labels, 2-dimensional numpy.ndarray) tuple
+        """
+        cube = self.rollup([rows, columns], aggregate).to_dense()
+        names = cube.labels if labels else cube.categories
+        return list(names[rows]), list(names[columns]), cube.measures[measure]
+
+    def iter_cells(self, measure, labels = False):
+        """Iterate over the cells of a measure holding a value.
+
+        Args:
+            measure (str): name of the measure
+            labels (bool): use dimension titles instead of keys (default = False)
+
+        Yields:
+            ((key per dimension), value) pair
+        """
+        names = self.labels if labels else self.categories
+        sparse = self.to_sparse()
+        values = sparse.measures[measure]
+        for position in range(len(values)):
+            if not numpy.isnan(values[position]):
+                yield tuple(names[name][sparse.codes[name][position]] for name in self.dimensions), values[position]
+
+def aggregate_groups(values, groups, size, aggregate):
+    """Aggregate values per group, ignoring NaN.
+
+    Args:
+        values (numpy.ndarray): values
+        groups (numpy.ndarray): group number of every value
+        size (int): number of groups
+        aggregate (str): 'sum', 'count', 'mean', 'min' or 'max'
+
+    Returns:
+        numpy.ndarray of an aggregate per group, NaN for a group without values (0 for count)
+    """
+    present = ~numpy.isnan(values)
+    values = values[present]
+    groups = groups[present]
+    counts = numpy.bincount(groups, minlength = size).astype(float)
+    if aggregate == 'count':
+        return counts
+    if aggregate in ('sum', 'mean'):
+        result = numpy.bincount(groups, weights = values, minlength = size)
+        if aggregate == 'mean':
+            with numpy.errstate(invalid = 'ignore', divide = 'ignore'):
+                result = result / counts
+    else:
+        result = numpy.full(size, numpy.inf if aggregate == 'min' else -numpy.inf)
+        (numpy.minimum if aggregate == 'min' else numpy.maximum).at(result, groups, values)
+    result[counts == 0] = numpy.nan
+    return result
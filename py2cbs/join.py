@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from columnar import ColumnarDataset, require_numpy, numpy
+from predicates import Eq, In, And
+from collections import OrderedDict
+
+HOWS = ('inner', 'left')
+METHODS = ('merge', 'hash')
+
+def dimension_filter(filters, dimensions):
+    """Get the predicate selecting dimension keys, for the dimensions a table has.
+
+    Args:
+        filters ({dimension: key or [key]}): key(s) selected per dimension
+        dimensions ({dimension: {key: title}}): dimensions of the table
+
+    Returns:
+        Predicate, None if no filter applies
+    """
+    predicates = []
+    for name, keys in filters.items():
+        if name not in dimensions:
+            continue
+        if isinstance(keys, (list, tuple, set)):
+            predicates.append(In(name, keys))
+        else:
+            predicates.append(Eq(name, keys))
+    if len(predicates) == 0:
+        return None
+    if len(predicates) == 1:
+        return predicates[0]
+    return And(*predicates)
+
+def merge_join(left, right, how = 'inner'):
+    """Match the rows of two integer key arrays by sorting the right keys and searching the left keys in them.
+
+    Args:
+        left (numpy.ndarray): keys of the left rows
+        right (numpy.ndarray): keys of the right rows
+        how (str): 'inner' or 'left' (keep left rows without a match) (default = 'inner')
+
+    Returns:
+        (left positions, right positions) pair of numpy.ndarray, in the order of the left rows;
+        a right position is -1 for a left row without a match
+    """
+    order = numpy.argsort(right, kind = 'mergesort')
+    ordered = right[order]
+    starts = numpy.searchsorted(ordered, left, 'left')
+    counts = numpy.searchsorted(ordered, left, 'right') - starts
+    repeats = numpy.maximum(counts, 1) if how == 'left' else counts
+    left_positions = numpy.repeat(numpy.arange(len(left)), repeats)
+    offsets = numpy.arange(len(left_positions)) - numpy.repeat(numpy.cumsum(repeats) - repeats, repeats)
+    right_positions = numpy.repeat(starts, repeats) + offsets
+    if len(order) > 0:
+        right_positions = order[numpy.minimum(right_positions, len(order) - 1)]
+    if how == 'left':
+        right_positions[numpy.repeat(counts == 0, repeats)] = -1
+    return left_positions, right_positions
+
+def hash_join(left, right, how = 'inner'):
+    """Match the rows of two integer key arrays through a hash table of the right keys.
+
+    Args:
+        left (numpy.ndarray): keys of the left rows
+        right (numpy.ndarray): keys of the right rows
+        how (str): 'inner' or 'left' (keep left rows without a match) (default = 'inner')
+
+    Returns:
+        (left positions, right positions) pair of numpy.ndarray, see merge_join
+    """
+    buckets = {}
+    for position, key in enumerate(right.tolist()):
+        buckets.setdefault(key, []).append(position)
+    left_positions = []
+    right_positions = []
+    for position, key in enumerate(left.tolist()):
+        matches = buckets.get(key)
+        if matches is not None:
+            left_positions.extend([position] * len(matches))
+            right_positions.extend(matches)
+        elif how == 'left':
+            left_positions.append(position)
+            right_positions.append(-1)
+    return numpy.array(left_positions, dtype = numpy.intp), numpy.array(right_positions, dtype = numpy.intp)
+
+JOINS = {'merge': merge_join, 'hash': hash_join}
+
+def take(column, positions, kind):
+    """Take the values at positions of a column, missing where the position is -1.
+
+    Returns:
+        (numpy.ndarray, type code) pair; an integer column holding missing values becomes float (NaN)
+    """
+    missing = positions < 0
+    values = column[numpy.where(missing, 0, positions)] if len(column) > 0 else numpy.zeros(len(positions), dtype = column.dtype)
+    if not missing.any():
+        return values, kind
+    if kind == 'category':
+        values[missing] = -1
+    elif kind in ('d', 'l'):
+        values = values.astype(float)
+        values[missing] = numpy.nan
+        kind = 'd'
+    else:
+        values[missing] = None
+    return values, kind
+
+def join_datasets(datasets, on, how = 'inner', method = 'merge'):
+    """Join columnar datasets on shared dimensions.
+
+    The keys of every shared dimension are coded in one code space for all
+    datasets, and the codes of a row combined into a single integer key, so the
+    rows are matched on integers only. The datasets are joined left to right.
+
+    Args:
+        datasets ({name: ColumnarDataset}): datasets, the name prefixes their columns in the result
+        on ([str]): dimensions shared by all datasets
+        how (str): 'inner' or 'left' (keep every row of the first dataset) (default = 'inner')
+        method (str): 'merge' (sort-merge) or 'hash' (default = 'merge')
+
+    Returns:
+        ColumnarDataset holding the dimensions on, followed by the other columns of every dataset
+        named '<name>.<column>' (ID columns are left out); numeric values of rows without a match
+        are NaN and marked in the masks
+    """
+    require_numpy()
+    if how not in HOWS:
+        raise ValueError('Unknown join: {0}'.format(how))
+    if method not in METHODS:
+        raise ValueError('Unknown join method: {0}'.format(method))
+    categories = OrderedDict((dimension, []) for dimension in on)
+    labels = OrderedDict((dimension, []) for dimension in on)
+    codes = dict((dimension, {}) for dimension in on)
+    for dataset in datasets.values():
+        for dimension in on:
+            for key, label in zip(dataset.categories[dimension], dataset.labels[dimension]):
+                if key not in codes[dimension]:
+                    codes[dimension][key] = len(categories[dimension])
+                    categories[dimension].append(key)
+                    labels[dimension].append(label)
+    shape = tuple(max(1, len(categories[dimension])) for dimension in on)
+
+    def get_codes(dataset):
+        recoded = []
+        for dimension in on:
+            remap = numpy.array([codes[dimension][key] for key in dataset.categories[dimension]], dtype = numpy.intp)
+            # a dataset without rows has no columns
+            column = dataset.columns.get(dimension, numpy.zeros(0, dtype = numpy.intp))
+            recoded.append(remap[column] if len(column) > 0 else numpy.zeros(0, dtype = numpy.intp))
+        return recoded
+
+    def get_keys(recoded):
+        if len(recoded[0]) == 0:
+            return numpy.zeros(0, dtype = numpy.int64)
+        return numpy.ravel_multi_index(tuple(recoded), shape).astype(numpy.int64)
+
+    columns = OrderedDict()
+    types = OrderedDict()
+    masks = OrderedDict()
+    result_categories = OrderedDict(categories)
+    result_labels = OrderedDict(labels)
+    keys = None
+    for name, dataset in datasets.items():
+        recoded = get_codes(dataset)
+        dataset_keys = get_keys(recoded)
+        if keys is None:
+            right_positions = numpy.arange(len(dataset_keys))
+            keys = dataset_keys
+            for dimension, column in zip(on, recoded):
+                columns[dimension] = column
+                types[dimension] = 'category'
+        else:
+            left_positions, right_positions = JOINS[method](keys, dataset_keys, how)
+            keys = keys[left_positions]
+            for column_name in columns.keys():
+                columns[column_name] = columns[column_name][left_positions]
+            for column_name in masks.keys():
+                masks[column_name] = masks[column_name][left_positions]
+        for column_name, column in dataset.columns.items():
+            if column_name in on or column_name == 'ID':
+                continue
+            result_name = '{0}.{1}'.format(name, column_name)
+            columns[result_name], types[result_name] = take(column, right_positions, dataset.types[column_name])
+            if column_name in dataset.masks:
+                missing = dataset.masks[column_name]
+                masks[result_name] = missing[numpy.maximum(right_positions, 0)] if len(missing) > 0 else numpy.zeros(len(right_positions), dtype = bool)
+                masks[result_name][right_positions < 0] = True
+            elif types[result_name] in ('d', 'l') and (right_positions < 0).any():
+                masks[result_name] = right_positions < 0
+            if dataset.types[column_name] == 'category':
+                result_categories[result_name] = dataset.categories[column_name]
+                result_labels[result_name] = dataset.labels[column_name]
+    return ColumnarDataset(columns, types, result_categories, result_labels, masks)
+
+def join_tables(tables, on = None, filters = {}, how = 'inner', method = 'merge', untyped = False):
+    """Join the datasets of tables on their shared dimensions, e.g. RegioS and Perioden.
+
+    The dimension filters are sent with the dataset request of every table
+    having the dimension, so only the selected rows are downloaded.
+
+    Args:
+        tables ([Table]): tables to join
+        on (optional [str]): dimensions to join on (default = None, the dimensions all tables share, in the order
+            of the first table)
+        filters ({dimension: key or [key]}): dimension key(s) selected (default = {}, all)
+        how (str): 'inner' or 'left' (keep every row of the first table) (default = 'inner')
+        method (str): 'merge' (sort-merge) or 'hash' (default = 'merge')
+        untyped (bool): decode UntypedDataSet instead of reading TypedDataSet, see Table.get_columnar_dataset (default = False)
+
+    Returns:
+        ColumnarDataset, see join_datasets; columns are prefixed with the table identifiers
+    """
+    require_numpy()
+    dimensions = [table.get_dimensions_dataset() for table in tables]
+    if on is None:
+        on = [name for name in dimensions[0] if all(name in table_dimensions for table_dimensions in dimensions)]
+    if len(on) == 0:
+        raise ValueError('The tables share no dimension to join on')
+    for table, table_dimensions in zip(tables, dimensions):
+        missing = [name for name in on if name not in table_dimensions]
+        if len(missing) > 0:
+            raise ValueError('Table {0} has no dimension {1}'.format(table.identifier, ', '.join(missing)))
+    datasets = OrderedDict()
+    for table, table_dimensions in zip(tables, dimensions):
+        predicate = dimension_filter(filters, table_dimensions)
+        datasets[table.identifier] = table.get_columnar_dataset(untyped = untyped, search_properties = predicate)
+    return join_datasets(datasets, on, how, method)
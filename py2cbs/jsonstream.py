@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import codecs
+import json
+from collections import OrderedDict
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = u' \t\r\n'
+NUMBER_CHARACTERS = frozenset(u'0123456789+-.eE')
+
+class PageReader(object):
+    """Incremental parser of an OData JSON page, yielding the entries of its value array while the bytes arrive.
+
+    Only the entry being parsed and one chunk of the response are hold in memory.
+    The other members of the page (odata.metadata, odata.nextLink, ...) are
+    available in properties once the entries have been iterated.
+
+    Attributes:
+        properties {name: value}: members of the page other than value
+    """
+
+    def __init__(self, stream, object_pairs_hook = OrderedDict, chunk_size = CHUNK_SIZE):
+        """Initialize page reader.
+
+        Args:
+            stream: file-like object holding the UTF-8 encoded page
+            object_pairs_hook (callable): hook turning JSON objects into entries (default = OrderedDict)
+            chunk_size (int): number of bytes read at a time (default = 64 KiB)
+        """
+        self.stream = stream
+        self.decoder = json.JSONDecoder(object_pairs_hook = object_pairs_hook)
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.chunk_size = chunk_size
+        self.buffer = u''
+        self.position = 0
+        self.eof = False
+        self.properties = OrderedDict()
+
+    def fill(self):
+        """Read the next chunk, dropping the part of the buffer already parsed."""
+        chunk = self.stream.read(self.chunk_size)
+        if chunk:
+            text = self.text_decoder.decode(chunk)
+        else:
+            text = self.text_decoder.decode('', final = True)
+            self.eof = True
+        self.buffer = self.buffer[self.position:] + text
+        self.position = 0
+
+    def peek(self):
+        """Skip whitespace and return the next character ('' at the end of the stream)."""
+        while True:
+            buffer = self.buffer
+            position = self.position
+            while position < len(buffer) and buffer[position] in WHITESPACE:
+                position += 1
+            self.position = position
+            if position < len(buffer):
+                return buffer[position]
+            if self.eof:
+                return u''
+            self.fill()
+
+    def expect(self, characters):
+        """Consume the next character, which must be one of characters."""
+        character = self.peek()
+        if character == u'' or character not in characters:
+            raise ValueError('Expected {0!r} at {1!r} in OData page'.format(characters, character))
+        self.position += 1
+        return character
+
+    def decode_value(self):
+        """Decode the next JSON value, reading more chunks until it is complete."""
+        while True:
+            if self.position >= len(self.buffer) or self.buffer[self.position] in WHITESPACE:
+                self.peek()
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except ValueError:
+                if self.eof:
+                    raise
+            else:
+                # a number followed by nothing but number characters (e.g. '-0.' or '1e') may continue in the next chunk
+                rest = end
+                while rest < len(self.buffer) and self.buffer[rest] in NUMBER_CHARACTERS:
+                    rest += 1
+                if rest < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            self.fill()
+
+    def __iter__(self):
+        self.expect(u'{')
+        if self.peek() == u'}':
+            self.position += 1
+            return
+        while True:
+            name = self.decode_value()
+            self.expect(u':')
+            if name == u'value' and self.peek() == u'[':
+                self.position += 1
+                if self.peek() == u']':
+                    self.position += 1
+                else:
+                    while True:
+                        yield self.decode_value()
+                        position = self.position
+                        if position < len(self.buffer) and self.buffer[position] == u',':
+                            self.position = position + 1
+                        elif self.expect(u',]') == u']':
+                            break
+            else:
+                self.properties[name] = self.decode_value()
+            if self.expect(u',}') == u'}':
+                break
+
+    def close(self):
+        """Close the underlying stream."""
+        self.stream.close()
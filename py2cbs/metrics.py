@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import OrderedDict
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class Metrics(object):
+    """Collector of timings of requests, pages, feed loads and lookups.
+
+    Every measurement is an event passed to the callbacks as (name, data) and
+    added to the totals of summary. Events:
+
+    - request {url, status, bytes, connect, latency, transfer, parse}: a page or
+      document requested; connect is the time to set up a new connection (0 for
+      a reused connection), latency the time until the response headers arrived
+      (including connect), transfer the time spent reading the body and parse the
+      time spent decoding it (None when the entries are consumed while read)
+    - page {feed, rows, seconds}: a page of entries read from the service, seconds
+      from requesting the page until its last entry was read
+    - feed {feed, rows, seconds}: a feed loaded, its pages are page events as well
+    - service {url, feeds, seconds}: feeds of a data service loaded by set_feeds/prefetch
+    - lookup {feed, kind, rows, seconds, remote}: a query or get_entry, remote
+      when it was answered by the service instead of loaded entries
+
+    Feed totals count the rows and seconds of the pages, streamed or loaded,
+    and the loads separately. A callback that raises is logged, it does not
+    fail the request measured.
+
+    Attributes:
+        callbacks ([callable]): functions called with (event name, data) for every event
+    """
+
+    def __init__(self, callbacks = []):
+        """Initialize metrics.
+
+        Args:
+            callbacks ([callable]): functions called with (event name, data) for every event (default = [])
+        """
+        self.callbacks = list(callbacks)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Discard the totals collected so far."""
+        with self.lock:
+            self.requests = OrderedDict([('count', 0), ('bytes', 0), ('connect', 0.0), ('latency', 0.0), ('transfer', 0.0), ('parse', 0.0)])
+            self.feeds = OrderedDict()
+            self.lookups = OrderedDict()
+            self.services = OrderedDict([('count', 0), ('seconds', 0.0)])
+
+    def add_callback(self, callback):
+        """Call a function with (event name, data) for every event.
+
+        Args:
+            callback (callable): function to call
+        """
+        self.callbacks.append(callback)
+
+    def record(self, event, **data):
+        """Record an event, see Metrics.
+
+        Args:
+            event (str): name of the event
+            data: properties of the event
+        """
+        with self.lock:
+            if event == 'request':
+                totals = self.requests
+                totals['count'] += 1
+                for name in ('bytes', 'connect', 'latency', 'transfer', 'parse'):
+                    totals[name] += data.get(name) or 0
+            elif event in ('page', 'feed'):
+                totals = self.feeds.setdefault(data['feed'], OrderedDict([('pages', 0), ('rows', 0), ('seconds', 0.0),
+                                                                          ('loads', 0), ('load_seconds', 0.0)]))
+                if event == 'page':
+                    totals['pages'] += 1
+                    totals['rows'] += data['rows']
+                    totals['seconds'] += data.get('seconds') or 0.0
+                else:
+                    # the rows of a load are counted by its page events
+                    totals['loads'] += 1
+                    totals['load_seconds'] += data['seconds']
+            elif event == 'lookup':
+                key = '{0} ({1})'.format(data['kind'], 'remote' if data.get('remote') else 'local')
+                totals = self.lookups.setdefault(key, OrderedDict([('count', 0), ('rows', 0), ('seconds', 0.0)]))
+                totals['count'] += 1
+                totals['rows'] += data['rows']
+                totals['seconds'] += data['seconds']
+            elif event == 'service':
+                self.services['count'] += 1
+                self.services['seconds'] += data['seconds']
+        for callback in self.callbacks:
+            try:
+                callback(event, data)
+            except Exception:
+                logger.exception('Exception in metrics callback %r', callback)
+
+    def summary(self):
+        """Get the totals of the events recorded so far.
+
+        Returns:
+            Dictionary {'requests': totals, 'feeds': {feed: totals}, 'lookups': {kind: totals}, 'services': totals};
+            feed totals include rows_per_second, the rows per second spent reading pages
+        """
+        with self.lock:
+            feeds = OrderedDict()
+            for feed, totals in self.feeds.items():
+                totals = OrderedDict(totals)
+                totals['rows_per_second'] = totals['rows'] / totals['seconds'] if totals['seconds'] > 0 else None
+                feeds[feed] = totals
+            return OrderedDict([('requests', OrderedDict(self.requests)), ('feeds', feeds),
+                                ('lookups', OrderedDict((kind, OrderedDict(totals)) for kind, totals in self.lookups.items())),
+                                ('services', OrderedDict(self.services))])
+
+    def report(self):
+        """Describe the totals of the events recorded so far.
+
+        Returns:
+            Report (str)
+        """
+        summary = self.summary()
+        requests = summary['requests']
+        lines = ['Requests: {0} ({1:.1f} KiB), connect {2:.3f}s, latency {3:.3f}s, transfer {4:.3f}s, parse {5:.3f}s'.format(
+                 requests['count'], requests['bytes'] / 1024.0, requests['connect'], requests['latency'], requests['transfer'], requests['parse'])]
+        if summary['services']['count'] > 0:
+            lines.append('Data services loaded: {0} in {1:.3f}s'.format(summary['services']['count'], summary['services']['seconds']))
+        for feed, totals in summary['feeds'].items():
+            rate = '-' if totals['rows_per_second'] is None else '{0:.0f}'.format(totals['rows_per_second'])
+            line = 'Feed {0}: {1} pages, {2} rows read in {3:.3f}s ({4} rows/s)'.format(
+                   feed, totals['pages'], totals['rows'], totals['seconds'], rate)
+            if totals['loads'] > 0:
+                line += ', {0} loads in {1:.3f}s'.format(totals['loads'], totals['load_seconds'])
+            lines.append(line)
+        for kind, totals in summary['lookups'].items():
+            lines.append('Lookups {0}: {1}, {2} rows, {3:.6f}s per lookup'.format(
+                         kind, totals['count'], totals['rows'], totals['seconds'] / totals['count']))
+        return '\n'.join(lines)
+
+class MeteredResponse(object):
+    """File-like response measuring the bytes read and the time spent reading, recording a request event on close.
+
+    Attributes:
+        response (Response): response read
+        bytes (int): number of bytes read
+        transfer (float): seconds spent reading
+    """
+
+    def __init__(self, response, metrics, url, started, parsed = True):
+        """Initialize metered response.
+
+        Args:
+            response (Response): response returned by a transport
+            metrics (Metrics): metrics recording the request
+            url (str): url of the request
+            started (float): time the request was sent
+            parsed (bool): the body is parsed as a whole between opening and closing, so the remaining time is parse time
+        """
+        self.response = response
+        self.metrics = metrics
+        self.url = url
+        self.started = started
+        self.opened = time.time()
+        self.parsed = parsed
+        self.bytes = 0
+        self.transfer = 0.0
+        self.closed = False
+
+    def read(self, size = -1):
+        """Read (at most size bytes of) the response body."""
+        started = time.time()
+        data = self.response.read(size)
+        self.transfer += time.time() - started
+        self.bytes += len(data)
+        return data
+
+    def fail(self, error):
+        """Mark the request as failed on the response read, see scheduler.ScheduledResponse.fail."""
+        fail = getattr(self.response, 'fail', None)
+        if fail is not None:
+            fail(error)
+
+    def close(self):
+        """Close the response and record the request."""
+        if self.closed:
+            return
+        self.closed = True
+        closed = time.time()
+        self.response.close()
+        parse = max(0.0, closed - self.opened - self.transfer) if self.parsed else None
+        self.metrics.record('request', url = self.url, status = self.response.status, bytes = self.bytes,
+                            connect = getattr(self.response, 'connect', 0.0), latency = self.opened - self.started,
+                            transfer = self.transfer, parse = parse)
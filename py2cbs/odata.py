@@ -15,29 +15,135 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import urllib
 import json
+import time
 from collections import OrderedDict
+from transport import Transport
+from rows import RowFactory, get_row_type
+from jsonstream import PageReader
+from concurrency import map_threaded
+from metrics import MeteredResponse
+from predicates import as_predicate, format_literal
+
+def parse_query_options(query_options):
+    """Split query options into (name, value) pairs.
+
+    Args:
+        query_options (str): query options, e.g. "$filter=Language eq 'en'&$top=10"
+
+    Returns:
+        Ordered dictionary of (option name, option value) pairs
+    """
+    options = OrderedDict()
+    if query_options:
+        for option in query_options.lstrip('?').split('&'):
+            if option:
+                name, _, value = option.partition('=')
+                options[name] = value
+    return options
+
+def fail_response(response, error):
+    """Mark a response as failed, so a scheduled request is released as failed (see scheduler.ScheduledResponse).
+
+    Args:
+        response (Response): response that could not be read or parsed
+        error (Exception): error
+    """
+    fail = getattr(response, 'fail', None)
+    if fail is not None:
+        fail(error)
+
+def merge_query_options(query_options, options):
+    """Merge query options, combining filters with 'and'.
+
+    Args:
+        query_options (str): query options, e.g. "$filter=Language eq 'en'"
+        options ({option name: option value}): options to add, e.g. {'$top': '10'}
+
+    Returns:
+        Query options (str), None if there are no options
+    """
+    merged = parse_query_options(query_options)
+    for name, value in options.items():
+        if name == '$filter' and merged.get('$filter'):
+            merged[name] = '({0}) and ({1})'.format(merged[name], value)
+        else:
+            merged[name] = value
+    if len(merged) == 0:
+        return None
+    return '&'.join(['{0}={1}'.format(name, value) for name, value in merged.items()])
 
 class Resource(object):
     """Class representing an OData resource exposed by a web service.
     
     Attributes:
         url : url identifying the resource
-        entries [{name: value}]: data hold by the resource    
+        resource_path (str): path pointing to the resource (None for a service document)
+        entries [{name: value}]: data hold by the resource (None when streaming)
+        stream (bool): entries are read page by page on iteration instead of on instantiation
+        transport (Transport): transport used to request the pages of the resource
+        indexes {property_name: {property_value: position(s)}}: hash indexes on the loaded entries
+        index_names ([property_name]): properties indexed whenever the entries are (re)loaded
+        compact (bool): entries are compact rows sharing their property names instead of ordered dictionaries
+        incremental (bool): pages are parsed incrementally, entry by entry, while they are received
+        partitions (int or [str]): partition size, or filter expression per partition, for loading with concurrent requests
+        workers (int): number of partitions loaded concurrently
+        retry (Retry): policy retrying failed page requests
+        checkpoint (Checkpoint): checkpoint persisting the loaded pages, so a failed load resumes where it stopped
+        metrics (Metrics): metrics recording requests, pages, loads and lookups
+        scheduler (Scheduler): scheduler limiting the requests in flight and sizing the pages
     """
     
-    def __init__(self, service_root, resource_path = None, query_options = None):
+    def __init__(self, service_root, resource_path = None, query_options = None, stream = False, transport = None, indexes = [], compact = False,
+                 incremental = False, partitions = None, workers = 1, retry = None, checkpoint = None, metrics = None,
+                 scheduler = None):
         """Instantiate a new ODdata Resource object.
 
         Args:
             service_root (str): url identifying the service document
             resource_path (str): path pointing to the resource (collection/feed)
             query_options (str): parameters applied to the query the resource
+            stream (bool): do not load the entries up front, read them page by page on iteration (default = False)
+            transport (Transport): transport used to request the pages (default = None, a new connection per request)
+            indexes ([property_name]): properties to index after loading, e.g. a primary key (default = [], ignored when streaming)
+            compact (bool): store entries as compact rows with interned strings, see rows.Row (default = False)
+            incremental (bool): parse pages while they are received instead of after reading them completely (default = False)
+            partitions (int or [str]): load the entries in partitions requested concurrently (default = None, follow odata.nextLink only)
+                - int: number of entries per partition, partitions are $skip/$top ranges of the count of the resource
+                - [str]: $filter expression per partition, e.g. ["Perioden eq '2015JJ00'", ...]
+            workers (int): number of partitions loaded concurrently (default = 1)
+            retry (Retry): retry failed page requests with exponential backoff (default = None, no retries)
+            checkpoint (Checkpoint): persist the pages read and resume from them; a streaming resource yields the
+                stored pages again and continues at the next link (default = None)
+            metrics (Metrics): record timings of requests, pages, loads and lookups (default = None, not recorded)
+            scheduler (Scheduler): schedule the requests and size the pages adaptively (default = None, not scheduled)
         """
+        self.stream = stream
+        self.partitions = partitions
+        self.workers = workers
+        self.retry = retry
+        self.checkpoint = checkpoint
+        self.metrics = metrics
+        self.scheduler = scheduler
+        self.compact = compact
+        self.incremental = incremental
+        if compact:
+            self.object_pairs_hook = RowFactory()
+        else:
+            self.object_pairs_hook = OrderedDict
+        self.index_names = list(indexes)
+        self.indexes = {}
+        self.unique_indexes = set()
+        if transport is None:
+            transport = Transport()
+        self.transport = transport
         self.set_url(service_root = service_root, resource_path = resource_path, query_options = query_options)
-        self.set_entries()
-        self.set_property_names()
+        if stream:
+            self.entries = None
+            self.property_names = []
+        else:
+            self.set_entries()
+            self.set_property_names()
 
     def set_url(self, service_root, resource_path, query_options):
         """Compose url out of service_root, resource_path and query_options.
@@ -50,10 +156,27 @@ class Resource(object):
         url = service_root
         if resource_path is not None:
             url += '/' + resource_path
+        self.resource_path = resource_path
+        self.resource_url = url
+        self.query_options = query_options
         if query_options is not None:
             url += '?' + query_options
         self.url = url
 
+    def get_option_url(self, options):
+        """Compose the url of the resource with additional query options.
+
+        Args:
+            options ({option name: option value}): options to add, filters are combined with 'and'
+
+        Returns:
+            Url
+        """
+        query_options = merge_query_options(self.query_options, options)
+        if query_options is None:
+            return self.resource_url
+        return self.resource_url + '?' + query_options
+
     def read_json_data(self, url):
         """Read JSON data hold by the resource.
 
@@ -63,29 +186,358 @@ class Resource(object):
         Returns:
             An ordered dictionary contaning the data hold by the resource
         """
-        # force the resource output into JSON-format
+        response = self.open_json(url)
+        try:
+            data =  json.load(response, object_pairs_hook=self.object_pairs_hook)
+        except Exception as e:
+            fail_response(response, e)
+            raise
+        finally:
+            response.close()
+        return data
+
+    def read_json_stream(self, url, parsed = True):
+        """Open JSON data hold by the resource for incremental parsing.
+
+        Args:
+            url (str): url identifying the resource
+            parsed (bool): the page is parsed as a whole before closing, see open_json (default = True)
+
+        Returns:
+            PageReader yielding the entries of the page, to be closed after use
+        """
+        response = self.open_json(url, parsed)
+        return PageReader(response, object_pairs_hook = self.object_pairs_hook)
+
+    def open_json(self, url, parsed = True):
+        """Request JSON data hold by the resource, measuring the request when metrics are recorded.
+
+        Args:
+            url (str): url identifying the resource
+            parsed (bool): the response is parsed as a whole before closing, so the time between
+                reading and closing counts as parse time (default = True)
+
+        Returns:
+            Response, to be closed after use
+        """
+        started = time.time()
+        if self.scheduler is None:
+            response = self.transport.open(self.json_url(url))
+        else:
+            response = self.scheduler.open(self.transport, self.json_url(url), hold = parsed)
+        if self.metrics is None:
+            return response
+        return MeteredResponse(response, self.metrics, url, started, parsed)
+
+    def json_url(self, url):
+        """Force the resource output into JSON-format.
+
+        Args:
+            url (str): url identifying the resource
+
+        Returns:
+            Url including $format=json
+        """
         if '$format=json' not in url: 
             if '?' in url:
                 url += '&$format=json'
             else:
                 url += '?$format=json'
+        return url
 
-        response = urllib.urlopen(url)
-        data =  json.load(response, object_pairs_hook=OrderedDict)
-        return data
+    def iter_pages(self, url = None):
+        """Iterate over the pages of the resource, following odata.nextLink.
 
-    def set_entries(self):
-        """Set entries."""
+        Pages of the resource are stored in its checkpoint, see iter_checkpoint_pages.
+
+        Args:
+            url (str): url of the first page (default = None, url of the resource)
+
+        Yields:
+            List of entries hold by a single page
+        """
+        if url is None and self.checkpoint is not None:
+            for page in self.iter_checkpoint_pages(self.checkpoint):
+                yield page
+            self.checkpoint.finish()
+            return
+        if url is None and self.get_page_size() is not None:
+            skip = 0
+            while True:
+                top = self.get_page_size()
+                page, next_link = self.read_page(self.get_page_url(skip, top))
+                yield page
+                skip += len(page)
+                if len(page) == 0 or (len(page) < top and next_link is None):
+                    break
+            return
+        next_link = url or self.url
+        while next_link is not None:
+            page, next_link = self.read_page(next_link)
+            yield page
+
+    def get_page_size(self):
+        """Get the page size set by the scheduler.
+
+        A service document (no resource path) is not paged.
+
+        Returns:
+            Number of entries per page, None when paging follows odata.nextLink
+        """
+        if self.scheduler is None or self.scheduler.page_size is None or self.resource_path is None:
+            return None
+        options = parse_query_options(self.query_options)
+        if '$top' in options or '$skip' in options:
+            return None
+        return self.scheduler.page_size
+
+    def get_page_url(self, skip, top):
+        return self.get_option_url(OrderedDict([('$skip', str(skip)), ('$top', str(top))]))
+
+    def record_page(self, rows, started):
+        if self.metrics is not None:
+            self.metrics.record('page', feed = self.resource_url, rows = rows, seconds = time.time() - started)
+
+    def read_page(self, url):
+        """Read a single page, retrying failed requests according to the retry policy.
+
+        Args:
+            url (str): url of the page
+
+        Returns:
+            (entries, next link) pair, next link is None for the last page
+        """
+        if self.retry is not None:
+            return self.retry.call(self._read_page, url)
+        return self._read_page(url)
+
+    def _read_page(self, url):
+        started = time.time()
+        if self.incremental:
+            reader = self.read_json_stream(url)
+            try:
+                entries = list(reader)
+            except Exception as e:
+                fail_response(reader.stream, e)
+                raise
+            finally:
+                reader.close()
+            self.record_page(len(entries), started)
+            return entries, reader.properties.get('odata.nextLink')
+        data = self.read_json_data(url)
+        self.record_page(len(data['value']), started)
+        return data['value'], data.get('odata.nextLink')
+
+    def iter_entries(self):
+        """Iterate over the entries of the resource.
+
+        Loaded entries are iterated in memory, a streaming resource reads its
+        entries page by page so only one page is hold at a time. With a
+        checkpoint, a streaming resource stores every page read and an iteration
+        that failed resumes at the page after the last stored one.
+
+        Returns:
+            Iterator over entries, each an ordered dictionary of (property name, property value) pairs
+        """
+        if self.entries is not None:
+            return iter(self.entries)
+        return self._stream_entries()
+
+    def _stream_entries(self):
+        # pages stored in a checkpoint are read whole
+        if self.incremental and self.checkpoint is None:
+            top = self.get_page_size()
+            skip = 0
+            next_link = self.url if top is None else self.get_page_url(skip, top)
+            while next_link is not None:
+                # a failed page is read again, skipping the entries already yielded
+                yielded = 0
+                attempt = 0
+                started = time.time()
+                while True:
+                    try:
+                        reader = self.read_json_stream(next_link, parsed = False)
+                        try:
+                            for position, entry in enumerate(reader):
+                                if position < yielded:
+                                    continue
+                                if not self.property_names:
+                                    self.property_names = entry.keys()
+                                yielded += 1
+                                yield entry
+                        finally:
+                            reader.close()
+                        self.record_page(yielded, started)
+                        break
+                    except Exception as e:
+                        if self.retry is None or not self.retry.should_retry(e, attempt):
+                            raise
+                        time.sleep(self.retry.get_delay(e, attempt))
+                        attempt += 1
+                next_link = reader.properties.get('odata.nextLink')
+                if top is not None:
+                    skip += yielded
+                    if yielded == 0 or (yielded < top and next_link is None):
+                        break
+                    top = self.get_page_size()
+                    next_link = self.get_page_url(skip, top)
+            return
+        for page in self.iter_pages():
+            if not self.property_names and len(page) > 0:
+                self.property_names = page[0].keys()
+            for entry in page:
+                yield entry
+
+    def get_count(self):
+        """Get the number of entries of the resource as counted by the service.
+
+        Returns:
+            Number of entries
+        """
+        data = self.read_json_data(self.get_option_url(OrderedDict([('$inlinecount', 'allpages'), ('$top', '0')])))
+        return int(data['odata.count'])
+
+    def get_partition_urls(self):
+        """Get the url of every partition of the resource.
+
+        Returns:
+            List of urls, in the order of the entries
+        """
+        if isinstance(self.partitions, (int, long)):
+            options = parse_query_options(self.query_options)
+            if '$top' in options or '$skip' in options:
+                return [self.url]
+            count = self.get_count()
+            urls = [self.get_option_url(OrderedDict([('$skip', str(skip)), ('$top', str(self.partitions))]))
+                    for skip in range(0, count, self.partitions)]
+            return urls or [self.url]
+        return [self.get_option_url({'$filter':expression}) for expression in self.partitions]
+
+    def read_entries(self, url = None, checkpoint = None):
+        """Read all entries starting at a url, following odata.nextLink.
+
+        Args:
+            url (str): url of the first page (default = None, url of the resource)
+            checkpoint (Checkpoint): checkpoint to resume from and to store the pages in (default = None)
+
+        Returns:
+            List of entries
+        """
         entries = []
-        next_link = self.url
-        while True:
-            entries_iteration = self.read_json_data(next_link)
-            entries += entries_iteration['value']
-            if 'odata.nextLink' in entries_iteration.keys():
-                next_link = entries_iteration['odata.nextLink']
+        pages = self.iter_pages(url) if checkpoint is None else self.iter_checkpoint_pages(checkpoint, url)
+        for page in pages:
+            entries += page
+        return entries
+
+    def iter_checkpoint_pages(self, checkpoint, url = None):
+        """Iterate over the pages starting at a url, following odata.nextLink, the stored pages of a checkpoint first.
+
+        Every page read is stored in the checkpoint before it is yielded.
+
+        Args:
+            checkpoint (Checkpoint): checkpoint to resume from and to store the pages in
+            url (str): url of the first page (default = None, url of the resource)
+
+        Yields:
+            List of entries hold by a single page
+        """
+        next_link = checkpoint.start(url or self.url)['next_link']
+        for page in checkpoint.iter_pages(self.object_pairs_hook):
+            yield page
+        while next_link is not None:
+            page, next_link = self.read_page(next_link)
+            checkpoint.add_page(page, next_link)
+            yield page
+
+    def set_entries(self):
+        """Set entries, loading partitions concurrently when the resource is partitioned.
+
+        Partitions are reassembled in order; entries of filter partitions are
+        merged on their ID property when they have one.
+        """
+        started = time.time()
+        if self.partitions is None:
+            entries = self.read_entries(checkpoint = self.checkpoint)
+        else:
+            urls = self.get_partition_urls()
+            if self.checkpoint is None:
+                read_partition = lambda number: self.read_entries(urls[number])
             else:
-                break
+                read_partition = lambda number: self.read_entries(urls[number], self.checkpoint.get_partition(number))
+            entries = []
+            # with a scheduler, the scheduler limits the partitions read concurrently
+            workers = self.workers if self.scheduler is None else max(self.workers, self.scheduler.max_concurrency)
+            for partition, error in map_threaded(read_partition, range(len(urls)), workers):
+                if error is not None:
+                    raise error
+                entries += partition
+            if not isinstance(self.partitions, (int, long)) and len(entries) > 0 and 'ID' in entries[0]:
+                entries.sort(key = lambda entry: entry['ID'])
+        if self.checkpoint is not None:
+            self.checkpoint.finish()
         self.entries = entries
+        if self.metrics is not None:
+            self.metrics.record('feed', feed = self.resource_url, rows = len(entries), seconds = time.time() - started)
+        self.indexes = {}
+        self.unique_indexes = set()
+        for property_name in self.index_names:
+            self.create_index(property_name)
+
+    def create_index(self, property_name, unique = False):
+        """Create a hash index on a property of the loaded entries.
+
+        Args:
+            property_name (str): name of the property
+            unique (bool): every property value identifies a single entry (default = False)
+        """
+        if self.entries is None:
+            raise ValueError('Cannot index the entries of a streaming resource')
+        index = {}
+        if unique:
+            for position, entry in enumerate(self.entries):
+                value = entry[property_name]
+                if value in index:
+                    raise ValueError('Duplicate value {0!r} for unique index on {1}'.format(value, property_name))
+                index[value] = position
+            self.unique_indexes.add(property_name)
+        else:
+            for position, entry in enumerate(self.entries):
+                index.setdefault(entry[property_name], []).append(position)
+            self.unique_indexes.discard(property_name)
+        self.indexes[property_name] = index
+
+    def lookup_index(self, property_name, property_value):
+        """Look up the positions of the entries holding a property value in an index.
+
+        Args:
+            property_name (str): name of an indexed property
+            property_value: value of the property
+
+        Returns:
+            List of positions in entries
+        """
+        index = self.indexes[property_name]
+        if property_name in self.unique_indexes:
+            if property_value in index:
+                return [index[property_value]]
+            return []
+        return index.get(property_value, [])
+
+    def iter_candidates(self, predicate):
+        """Iterate over the entries that may match a predicate, narrowed down by an index when available.
+
+        Args:
+            predicate (Predicate): predicate, None if anything matches
+
+        Returns:
+            Iterator over entries
+        """
+        if self.entries is not None and predicate is not None:
+            positions = predicate.candidates(self)
+            if positions is not None:
+                entries = self.entries
+                return (entries[position] for position in positions)
+        return self.iter_entries()
 
     def set_property_names(self):
         """Set property names"""  
@@ -94,32 +546,56 @@ class Resource(object):
         else:
             self.property_names = []
 
-    def query(self, search_properties = {}, return_property_names = []):
-        """Generic search function to query a resource.
+    def iter_query(self, search_properties = {}, return_property_names = [], copy = False):
+        """Lazily query a resource.
+
+        The predicate is compiled once and narrowed down by the indexes of the
+        loaded entries. Without return property names and copy, the matching
+        loaded entries themselves are returned: they are shared with the
+        resource and its indexes, and must not be modified.
 
         Args:
-            search_properties ({property_name:property_value}): name:value pairs to select  
+            search_properties (Predicate or {property_name:property_value}): predicate (see predicates), or
+                name:value pairs that must all match (default = {}, all entries)
             return_property_names ([property_name]): list of property_names returned from selected entries (default = all)
+            copy (bool): return copies of the loaded entries (default = False)
 
         Returns:
-            List of entries, each containing an ordered dictionary of (property name, property value) pairs
+            Iterator over entries; projected entries are ordered dictionaries, or rows when compact
         """
-        if return_property_names == []:
-            return_property_names = self.property_names
-        result = []
-        for entry in self.entries:
-            if search_properties == {}:
-                tmp_entry = OrderedDict()
-                for return_property_name in return_property_names:
-                    tmp_entry[return_property_name] = entry[return_property_name]
-                    result.append(tmp_entry)
+        started = time.time()
+        predicate = as_predicate(search_properties)
+        test = predicate.compile() if predicate is not None else None
+        project = None
+        if len(return_property_names) > 0:
+            names = tuple(return_property_names)
+            if self.compact:
+                row_type = get_row_type(names)
+                project = lambda entry: row_type([entry[name] for name in names])
             else:
-                if all( [ entry[search_property_name] == search_properties[search_property_name] for search_property_name in search_properties.keys()]):
-                    tmp_entry = OrderedDict()
-                    for return_property_name in return_property_names:
-                        tmp_entry[return_property_name] = entry[return_property_name]
-                    result.append(tmp_entry)
-        return result
+                project = lambda entry: OrderedDict([(name, entry[name]) for name in names])
+        elif copy and self.entries is not None and not self.compact:
+            # compact rows are immutable and need no copy
+            project = OrderedDict
+        rows = 0
+        for entry in self.iter_candidates(predicate):
+            if test is None or test(entry):
+                rows += 1
+                yield entry if project is None else project(entry)
+        self.record_lookup('query', started, rows)
+
+    def query(self, search_properties = {}, return_property_names = []):
+        """Generic search function to query a resource, see iter_query.
+
+        Args:
+            search_properties (Predicate or {property_name:property_value}): predicate, or name:value pairs to select
+            return_property_names ([property_name]): list of property_names returned from selected entries (default = all)
+
+        Returns:
+            List of entries, each containing an ordered dictionary of (property name, property value) pairs,
+            copies of the loaded entries
+        """
+        return list(self.iter_query(search_properties, return_property_names, copy = True))
 
     def get_entry(self, entry_id, primary_key):
         """Get a single entry.
@@ -129,9 +605,32 @@ class Resource(object):
             primary_key (str): property name unique identifier
 
         Returns:
-            Entry, ordered dictionary of (property name, property value) pairs
+            Entry, ordered dictionary of (property name, property value) pairs (None if not found),
+            a copy of a loaded entry like the entries returned by query
         """
-        return self.query(search_properties = {primary_key:entry_id})[0]
+        started = time.time()
+        result = None
+        if self.entries is not None:
+            if primary_key not in self.indexes:
+                self.create_index(primary_key)
+            positions = self.lookup_index(primary_key, entry_id)
+            if len(positions) > 0:
+                result = self.entries[positions[0]]
+                if not self.compact:
+                    # compact rows are immutable and need no copy
+                    result = OrderedDict(result)
+        else:
+            for entry in self.iter_entries():
+                if entry[primary_key] == entry_id:
+                    result = entry
+                    break
+        self.record_lookup('get_entry', started, 0 if result is None else 1)
+        return result
+
+    def record_lookup(self, kind, started, rows):
+        if self.metrics is not None:
+            self.metrics.record('lookup', feed = self.resource_url, kind = kind, rows = rows, seconds = time.time() - started,
+                                remote = self.entries is None)
 
     def get_property(self, entry_id, primary_key,  property_name):
         """Get a property.
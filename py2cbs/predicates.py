@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+def format_literal(value):
+    """Format a Python value as an OData literal.
+
+    Args:
+        value: property value (None, bool, number or string)
+
+    Returns:
+        Literal (None if the value cannot be expressed as an OData literal)
+    """
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, long)):
+        return str(value)
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, basestring):
+        return "'" + value.replace("'", "''") + "'"
+    return None
+
+class Predicate(object):
+    """Condition on the properties of an entry.
+
+    A predicate is compiled once into a plain function testing an entry, can
+    narrow down the loaded entries of a resource through its indexes and can be
+    expressed as an OData $filter, so it is evaluated by the service instead.
+    Predicates combine with & (And) and | (Or).
+    """
+
+    def compile(self):
+        """Get a function testing an entry.
+
+        Returns:
+            Function entry -> bool
+        """
+        raise NotImplementedError
+
+    def candidates(self, resource):
+        """Get the positions of the loaded entries of a resource that may match, using its indexes.
+
+        Args:
+            resource (Resource): resource with loaded entries
+
+        Returns:
+            Ascending list of positions in entries, None if no index applies
+        """
+        return None
+
+    def to_filter(self):
+        """Express the predicate as an OData $filter expression.
+
+        Returns:
+            Filter expression (str), None if it cannot be expressed
+        """
+        return None
+
+    def property_names(self):
+        """Get the names of the properties tested.
+
+        Returns:
+            List of property names
+        """
+        raise NotImplementedError
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+class Eq(Predicate):
+    """Property equals a value."""
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+    def compile(self):
+        name, value = self.name, self.value
+        return lambda entry: entry[name] == value
+
+    def candidates(self, resource):
+        if self.name not in resource.indexes:
+            return None
+        return resource.lookup_index(self.name, self.value)
+
+    def to_filter(self):
+        literal = format_literal(self.value)
+        if literal is None:
+            return None
+        return '{0} eq {1}'.format(self.name, literal)
+
+    def property_names(self):
+        return [self.name]
+
+    def __repr__(self):
+        return 'Eq({0!r}, {1!r})'.format(self.name, self.value)
+
+class In(Predicate):
+    """Property equals one of a set of values."""
+
+    def __init__(self, name, values):
+        self.name = name
+        self.values = list(values)
+
+    def compile(self):
+        name, values = self.name, frozenset(self.values)
+        return lambda entry: entry[name] in values
+
+    def candidates(self, resource):
+        if self.name not in resource.indexes:
+            return None
+        positions = set()
+        for value in set(self.values):
+            positions.update(resource.lookup_index(self.name, value))
+        return sorted(positions)
+
+    def to_filter(self):
+        literals = [format_literal(value) for value in self.values]
+        if len(literals) == 0 or None in literals:
+            return None
+        return '({0})'.format(' or '.join(['{0} eq {1}'.format(self.name, literal) for literal in literals]))
+
+    def property_names(self):
+        return [self.name]
+
+    def __repr__(self):
+        return 'In({0!r}, {1!r})'.format(self.name, self.values)
+
+class Range(Predicate):
+    """Property lies between bounds (inclusive); entries without a value (None) never match."""
+
+    def __init__(self, name, low = None, high = None):
+        """Initialize range.
+
+        Args:
+            name (str): name of the property
+            low: lowest value (default = None, no lower bound)
+            high: highest value (default = None, no upper bound)
+        """
+        self.name = name
+        self.low = low
+        self.high = high
+
+    def compile(self):
+        name, low, high = self.name, self.low, self.high
+        if low is None and high is None:
+            return lambda entry: entry[name] is not None
+        if high is None:
+            return lambda entry: entry[name] is not None and entry[name] >= low
+        if low is None:
+            return lambda entry: entry[name] is not None and entry[name] <= high
+        return lambda entry: entry[name] is not None and low <= entry[name] <= high
+
+    def to_filter(self):
+        conditions = []
+        for operator, bound in (('ge', self.low), ('le', self.high)):
+            if bound is not None:
+                literal = format_literal(bound)
+                if literal is None:
+                    return None
+                conditions.append('{0} {1} {2}'.format(self.name, operator, literal))
+        if len(conditions) == 0:
+            return '{0} ne null'.format(self.name)
+        return ' and '.join(conditions)
+
+    def property_names(self):
+        return [self.name]
+
+    def __repr__(self):
+        return 'Range({0!r}, {1!r}, {2!r})'.format(self.name, self.low, self.high)
+
+class Prefix(Predicate):
+    """String property starts with a prefix."""
+
+    def __init__(self, name, prefix):
+        self.name = name
+        self.prefix = prefix
+
+    def compile(self):
+        name, prefix = self.name, self.prefix
+        return lambda entry: entry[name] is not None and entry[name].startswith(prefix)
+
+    def to_filter(self):
+        if not isinstance(self.prefix, basestring):
+            return None
+        return 'startswith({0},{1})'.format(self.name, format_literal(self.prefix))
+
+    def property_names(self):
+        return [self.name]
+
+    def __repr__(self):
+        return 'Prefix({0!r}, {1!r})'.format(self.name, self.prefix)
+
+class And(Predicate):
+    """All predicates hold."""
+
+    def __init__(self, *predicates):
+        self.predicates = list(predicates)
+
+    def compile(self):
+        tests = [predicate.compile() for predicate in self.predicates]
+        if len(tests) == 1:
+            return tests[0]
+        def test(entry):
+            for check in tests:
+                if not check(entry):
+                    return False
+            return True
+        return test
+
+    def candidates(self, resource):
+        candidates = [predicate.candidates(resource) for predicate in self.predicates]
+        candidates = [positions for positions in candidates if positions is not None]
+        if len(candidates) == 0:
+            return None
+        return min(candidates, key = len)
+
+    def to_filter(self):
+        filters = [predicate.to_filter() for predicate in self.predicates]
+        if len(filters) == 0 or None in filters:
+            return None
+        return ' and '.join(['({0})'.format(expression) for expression in filters])
+
+    def property_names(self):
+        return unique_names(self.predicates)
+
+    def __repr__(self):
+        return 'And({0})'.format(', '.join([repr(predicate) for predicate in self.predicates]))
+
+class Or(Predicate):
+    """Any predicate holds."""
+
+    def __init__(self, *predicates):
+        self.predicates = list(predicates)
+
+    def compile(self):
+        tests = [predicate.compile() for predicate in self.predicates]
+        def test(entry):
+            for check in tests:
+                if check(entry):
+                    return True
+            return False
+        return test
+
+    def candidates(self, resource):
+        positions = set()
+        for predicate in self.predicates:
+            candidates = predicate.candidates(resource)
+            if candidates is None:
+                return None
+            positions.update(candidates)
+        return sorted(positions)
+
+    def to_filter(self):
+        filters = [predicate.to_filter() for predicate in self.predicates]
+        if len(filters) == 0 or None in filters:
+            return None
+        return ' or '.join(['({0})'.format(expression) for expression in filters])
+
+    def property_names(self):
+        return unique_names(self.predicates)
+
+    def __repr__(self):
+        return 'Or({0})'.format(', '.join([repr(predicate) for predicate in self.predicates]))
+
+def unique_names(predicates):
+    names = []
+    for predicate in predicates:
+        names += [name for name in predicate.property_names() if name not in names]
+    return names
+
+def as_predicate(search_properties):
+    """Turn search properties into a predicate.
+
+    Args:
+        search_properties (Predicate or {property_name:property_value}): predicate, or name:value pairs that must all match
+
+    Returns:
+        Predicate, None if anything matches
+    """
+    if search_properties is None or isinstance(search_properties, Predicate):
+        return search_properties
+    if len(search_properties) == 0:
+        return None
+    if len(search_properties) == 1:
+        return Eq(*search_properties.items()[0])
+    return And(*[Eq(name, value) for name, value in search_properties.items()])
+
+def split_filter(predicate):
+    """Split a predicate into a part evaluated by the service and a part evaluated client-side.
+
+    The conditions of an And that can be expressed in OData are pushed down
+    separately; any other predicate is pushed down entirely or not at all.
+
+    Args:
+        predicate (Predicate): predicate, None if anything matches
+
+    Returns:
+        (OData $filter expression or None, client-side predicate or None) pair
+    """
+    if predicate is None:
+        return None, None
+    expression = predicate.to_filter()
+    if expression is not None:
+        return expression, None
+    if not isinstance(predicate, And):
+        return None, predicate
+    filters = []
+    client = []
+    for child in predicate.predicates:
+        expression, remainder = split_filter(child)
+        if expression is not None:
+            filters.append(expression)
+        if remainder is not None:
+            client.append(remainder)
+    expression = ' and '.join(['({0})'.format(expression) for expression in filters]) if len(filters) > 0 else None
+    if len(client) == 0:
+        return expression, None
+    return expression, client[0] if len(client) == 1 else And(*client)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+class Row(tuple):
+    """Compact, read-only entry: a tuple of property values with dictionary-like access by property name.
+
+    The property names are stored once per row type (schema), shared by all rows
+    holding the same properties in the same order.
+    """
+    __slots__ = ()
+    fields = ()
+    positions = {}
+
+    def __getitem__(self, key):
+        return tuple.__getitem__(self, self.positions[key])
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def __eq__(self, other):
+        if isinstance(other, Row):
+            return self.fields == other.fields and tuple.__eq__(self, other)
+        if isinstance(other, dict):
+            return dict(self.items()) == other
+        return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = tuple.__hash__
+
+    def __repr__(self):
+        return 'Row({0})'.format(', '.join(['{0!r}: {1!r}'.format(name, value) for name, value in self.items()]))
+
+    def __reduce__(self):
+        return (make_row, (self.fields, tuple(tuple.__iter__(self))))
+
+    def get(self, key, default = None):
+        position = self.positions.get(key)
+        if position is None:
+            return default
+        return tuple.__getitem__(self, position)
+
+    def keys(self):
+        return list(self.fields)
+
+    def values(self):
+        return list(tuple.__iter__(self))
+
+    def items(self):
+        return zip(self.fields, tuple.__iter__(self))
+
+    def iterkeys(self):
+        return iter(self.fields)
+
+    def itervalues(self):
+        return tuple.__iter__(self)
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def has_key(self, key):
+        return key in self.positions
+
+row_types = {}
+row_types_lock = threading.Lock()
+
+def get_row_type(fields):
+    """Get the row type (schema) for a sequence of property names.
+
+    Args:
+        fields ((str)): property names
+
+    Returns:
+        Row subclass shared by all rows with these property names
+    """
+    fields = tuple(fields)
+    row_type = row_types.get(fields)
+    if row_type is None:
+        with row_types_lock:
+            row_type = row_types.get(fields)
+            if row_type is None:
+                positions = dict((name, position) for position, name in enumerate(fields))
+                row_type = type('Row', (Row,), {'__slots__':(), 'fields':fields, 'positions':positions})
+                row_types[fields] = row_type
+    return row_type
+
+def make_row(fields, values):
+    """Make a row.
+
+    Args:
+        fields ((str)): property names
+        values ((value)): property values
+
+    Returns:
+        Row
+    """
+    return get_row_type(fields)(values)
+
+class RowFactory(object):
+    """JSON object_pairs_hook turning every object into a Row, interning short repeated strings.
+
+    Attributes:
+        intern_length (int): strings up to this length are interned (0 = none)
+        strings {str: str}: interned strings
+    """
+
+    def __init__(self, intern_length = 32):
+        """Initialize row factory.
+
+        Args:
+            intern_length (int): strings up to this length are interned (default = 32, 0 = none)
+        """
+        self.intern_length = intern_length
+        self.strings = {}
+        self.row_types = {}
+
+    def __call__(self, pairs):
+        fields = tuple([name for name, value in pairs])
+        row_type = self.row_types.get(fields)
+        if row_type is None:
+            row_type = self.row_types[fields] = get_row_type(fields)
+        if self.intern_length > 0:
+            strings = self.strings
+            limit = self.intern_length
+            return row_type([strings.setdefault(value, value) if isinstance(value, basestring) and len(value) <= limit else value for name, value in pairs])
+        return row_type([value for name, value in pairs])
@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from transport import HTTPError
+from collections import OrderedDict
+import threading
+import time
+
+THROTTLE_STATUSES = (429, 503)
+
+class RateBudget(object):
+    """Token bucket limiting the number of requests per second.
+
+    Attributes:
+        rate (float): requests per second (None = unlimited)
+        burst (int): maximum number of requests sent at once after an idle period
+    """
+
+    def __init__(self, rate = None, burst = 1):
+        """Initialize rate budget.
+
+        Args:
+            rate (float): requests per second (default = None, unlimited)
+            burst (int): maximum number of requests sent at once after an idle period (default = 1)
+        """
+        self.lock = threading.Lock()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate, burst = 1):
+        """Change the rate.
+
+        Args:
+            rate (float): requests per second (None = unlimited)
+            burst (int): maximum number of requests sent at once after an idle period (default = 1)
+        """
+        with self.lock:
+            self.rate = rate
+            self.burst = burst
+            self.tokens = float(burst)
+            self.updated = time.time()
+
+    def take(self):
+        """Wait until the budget allows a request and spend it."""
+        while True:
+            with self.lock:
+                if self.rate is None:
+                    return
+                now = time.time()
+                self.tokens = min(float(self.burst), self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                delay = (1.0 - self.tokens) / self.rate
+            time.sleep(delay)
+
+# request-rate budget shared by every scheduler of the process, unless a scheduler is given its own
+GLOBAL_BUDGET = RateBudget()
+
+class Scheduler(object):
+    """Adaptive scheduler of the requests of resources, limiting the requests in flight and sizing pages.
+
+    Every request waits for a free slot (at most concurrency requests in flight)
+    and for the rate budget. The limits adapt AIMD-style to the outcome of every
+    request (from sending it until its response is closed):
+
+    - a throttled request (429/503), a server error or a connection error
+      multiplies the concurrency and the page size by decrease; a Retry-After
+      header pauses all requests of the scheduler
+    - a request slower than target_latency multiplies the page size by decrease
+    - any other request adds increase to the concurrency (spread over the
+      requests in flight, so about increase per round of requests) and
+      min_page_size to the page size
+
+    Resources page by $skip/$top with the page size of the scheduler instead of
+    following odata.nextLink, unless page_size is None or their query options
+    hold $top or $skip.
+
+    Partitioned resources read up to max_concurrency partitions at once, leaving
+    the number of requests in flight to the scheduler. The request-rate budget
+    is GLOBAL_BUDGET unless given, so every scheduler of the process shares it:
+
+        >>> scheduler.GLOBAL_BUDGET.set_rate(10)
+
+    Attributes:
+        concurrency (float): current limit of requests in flight
+        min_concurrency (int): lowest limit of requests in flight
+        max_concurrency (int): highest limit of requests in flight
+        page_size (int): current page size (None = page size of the service)
+        min_page_size (int): lowest page size
+        max_page_size (int): highest page size
+        target_latency (float): seconds a request may take before pages are made smaller
+        increase (float): additive increase of the concurrency per round of requests
+        decrease (float): multiplicative decrease of the concurrency and page size
+        budget (RateBudget): request-rate budget
+    """
+
+    def __init__(self, concurrency = 2, min_concurrency = 1, max_concurrency = 8, page_size = None, min_page_size = 1000,
+                 max_page_size = 10000, target_latency = 5.0, increase = 1.0, decrease = 0.5, budget = None):
+        """Initialize scheduler.
+
+        Args:
+            concurrency (int): initial limit of requests in flight (default = 2)
+            min_concurrency (int): lowest limit of requests in flight (default = 1)
+            max_concurrency (int): highest limit of requests in flight (default = 8)
+            page_size (int): initial page size (default = None, page size of the service, not adapted)
+            min_page_size (int): lowest page size (default = 1000)
+            max_page_size (int): highest page size (default = 10000, the maximum of CBS)
+            target_latency (float): seconds a request may take before pages are made smaller (default = 5.0)
+            increase (float): additive increase of the concurrency per round of requests (default = 1.0)
+            decrease (float): multiplicative decrease of the concurrency and page size (default = 0.5)
+            budget (RateBudget): request-rate budget (default = None, GLOBAL_BUDGET shared by the process)
+        """
+        self.concurrency = float(concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.page_size = page_size
+        self.min_page_size = min_page_size
+        self.max_page_size = max_page_size
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease = decrease
+        self.budget = budget if budget is not None else GLOBAL_BUDGET
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.latency = None
+        self.throughput = None
+
+    def acquire(self):
+        """Wait for a free slot and the rate budget before sending a request.
+
+        Returns:
+            Time the request starts, to pass to release
+        """
+        with self.condition:
+            while True:
+                pause = self.paused_until - time.time()
+                if pause > 0:
+                    self.condition.wait(pause)
+                elif self.in_flight >= max(1, int(self.concurrency)):
+                    self.condition.wait()
+                else:
+                    break
+            self.in_flight += 1
+        try:
+            self.budget.take()
+        except:
+            self.release(time.time())
+            raise
+        return time.time()
+
+    def release(self, started, size = 0, error = None):
+        """Free the slot of a finished request and adapt the limits to its outcome.
+
+        Args:
+            started (float): time the request started, returned by acquire
+            size (int): number of bytes received (default = 0)
+            error (Exception): error of a failed request (default = None, succeeded)
+        """
+        seconds = time.time() - started
+        with self.condition:
+            self.in_flight -= 1
+            self.requests += 1
+            status = getattr(error, 'status', None)
+            if error is not None and status is not None and status < 500 and status not in THROTTLE_STATUSES:
+                # a client error says nothing about the load of the service
+                self.errors += 1
+            elif error is not None:
+                if status in THROTTLE_STATUSES:
+                    self.throttled += 1
+                else:
+                    self.errors += 1
+                self.concurrency = max(float(self.min_concurrency), self.concurrency * self.decrease)
+                self.resize(self.decrease)
+                retry_after = getattr(error, 'headers', {}).get('retry-after') if isinstance(error, HTTPError) else None
+                if retry_after is not None and retry_after.isdigit():
+                    self.paused_until = max(self.paused_until, time.time() + float(retry_after))
+            else:
+                self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+                if seconds > 0 and size > 0:
+                    rate = size / seconds
+                    self.throughput = rate if self.throughput is None else 0.8 * self.throughput + 0.2 * rate
+                if seconds > self.target_latency:
+                    self.resize(self.decrease)
+                else:
+                    self.concurrency = min(float(self.max_concurrency), self.concurrency + self.increase / max(1.0, self.concurrency))
+                    if self.page_size is not None:
+                        self.page_size = min(self.max_page_size, self.page_size + self.min_page_size)
+            self.condition.notify_all()
+
+    def resize(self, factor):
+        if self.page_size is not None:
+            self.page_size = max(self.min_page_size, int(self.page_size * factor))
+
+    def open(self, transport, url, hold = True):
+        """Request a url through a transport once a slot is free.
+
+        Args:
+            transport (Transport): transport sending the request
+            url (str): url to request
+            hold (bool): hold the slot until the response is closed; a response read at the pace of
+                its consumer (a stream) releases it when the headers arrive instead (default = True)
+
+        Returns:
+            Response, releasing the slot when closed
+        """
+        started = self.acquire()
+        try:
+            response = transport.open(url)
+        except Exception as e:
+            self.release(started, error = e)
+            raise
+        if not hold:
+            self.release(started)
+            return response
+        return ScheduledResponse(response, self, started)
+
+    def state(self):
+        """Get the current state of the scheduler.
+
+        Returns:
+            Ordered dictionary {concurrency, in_flight, page_size, rate, requests, throttled, errors,
+            latency (seconds, moving average), throughput (bytes per second, moving average), paused (seconds)}
+        """
+        with self.condition:
+            return OrderedDict([('concurrency', int(self.concurrency)), ('in_flight', self.in_flight), ('page_size', self.page_size),
+                                ('rate', self.budget.rate), ('requests', self.requests), ('throttled', self.throttled),
+                                ('errors', self.errors), ('latency', self.latency), ('throughput', self.throughput),
+                                ('paused', max(0.0, self.paused_until - time.time()))])
+
+class ScheduledResponse(object):
+    """File-like response counting the bytes read, releasing its scheduler slot on close.
+
+    A request whose body fails to be read, or is marked failed by its reader
+    (e.g. a truncated body that cannot be parsed), is released as failed.
+
+    Attributes:
+        response (Response): response read
+        bytes (int): number of bytes read
+        error (Exception): error reading or parsing the body (None if none occurred)
+    """
+
+    def __init__(self, response, scheduler, started):
+        self.response = response
+        self.scheduler = scheduler
+        self.started = started
+        self.bytes = 0
+        self.error = None
+        self.closed = False
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    def read(self, size = -1):
+        """Read (at most size bytes of) the response body."""
+        try:
+            data = self.response.read(size)
+        except Exception as e:
+            self.fail(e)
+            raise
+        self.bytes += len(data)
+        return data
+
+    def fail(self, error):
+        """Mark the request as failed, e.g. when its body could not be parsed.
+
+        Args:
+            error (Exception): error, the first one is kept
+        """
+        if self.error is None:
+            self.error = error
+
+    def close(self):
+        """Close the response and release the slot of the request."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.response.close()
+        finally:
+            self.scheduler.release(self.started, self.bytes, self.error)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from bisect import bisect_left
+from collections import OrderedDict
+import hashlib
+import json
+import math
+import os
+import re
+import tempfile
+import unicodedata
+
+# weight of a term per field it occurs in
+FIELDS = {'Tables': OrderedDict([('Title', 3.0), ('ShortTitle', 3.0), ('ShortDescription', 2.0), ('Summary', 1.0)]),
+          'Themes': OrderedDict([('Title', 3.0)])}
+# primary key per collection
+KEYS = {'Tables': 'Identifier', 'Themes': 'ID'}
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+def tokenize(text):
+    """Split a text into lowercase tokens without accents.
+
+    Args:
+        text (str): text
+
+    Returns:
+        List of tokens
+    """
+    if not text:
+        return []
+    if not isinstance(text, unicode):
+        text = text.decode('utf-8')
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = u''.join([character for character in text if not unicodedata.combining(character)])
+    return TOKEN.findall(text)
+
+class SearchIndex(object):
+    """Inverted index over the titles, short descriptions and summaries of catalog tables and themes.
+
+    Documents are ranked with BM25 over the field weighted term frequencies.
+    The last term of a query matches every indexed term it is a prefix of, so
+    queries can be answered while they are typed.
+
+    Attributes:
+        documents {document key: document}: indexed documents ('collection/language/key'), each holding collection,
+            key (Identifier of a table, ID of a theme), title, language, length, signature and terms
+        postings {term: {document key: weight}}: field weighted frequency of a term per document
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self.documents = OrderedDict()
+        self.postings = {}
+        self.terms = None
+        self.total_length = 0.0
+
+    def document_key(self, collection, entry):
+        return u'{0}/{1}/{2}'.format(collection, entry.get('Language') or u'', entry[KEYS[collection]])
+
+    def signature(self, collection, entry):
+        fields = [entry.get(name) or u'' for name in FIELDS[collection]] + [entry.get('Modified') or u'', entry.get('Language') or u'']
+        text = u'\x00'.join([field if isinstance(field, unicode) else unicode(field) for field in fields])
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def add(self, collection, entry):
+        """Add or replace the document of a catalog entry, unless it did not change.
+
+        Args:
+            collection (str): 'Tables' or 'Themes'
+            entry ({property: value}): catalog entry
+
+        Returns:
+            True if the document was (re)indexed
+        """
+        document_key = self.document_key(collection, entry)
+        signature = self.signature(collection, entry)
+        document = self.documents.get(document_key)
+        if document is not None:
+            if document['signature'] == signature:
+                return False
+            self.remove(document_key)
+        weights = {}
+        for field, weight in FIELDS[collection].items():
+            for token in tokenize(entry.get(field)):
+                weights[token] = weights.get(token, 0.0) + weight
+        for term, weight in weights.items():
+            if term not in self.postings:
+                self.postings[term] = {}
+                self.terms = None
+            self.postings[term][document_key] = weight
+        length = sum(weights.values())
+        self.documents[document_key] = OrderedDict([('collection', collection), ('key', entry[KEYS[collection]]), ('title', entry.get('Title')),
+                                                    ('language', entry.get('Language')), ('length', length),
+                                                    ('signature', signature), ('terms', sorted(weights))])
+        self.total_length += length
+        return True
+
+    def remove(self, document_key):
+        """Remove a document.
+
+        Args:
+            document_key (str): key of the document ('collection/language/key')
+        """
+        document = self.documents.pop(document_key, None)
+        if document is None:
+            return
+        for term in document['terms']:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(document_key, None)
+                if len(postings) == 0:
+                    del self.postings[term]
+                    self.terms = None
+        self.total_length -= document['length']
+
+    def update(self, catalog):
+        """Bring the index up to date with a catalog, reindexing only new and changed entries.
+
+        Entries no longer in the catalog are removed.
+
+        Args:
+            catalog (Catalog): catalog (or CatalogTree) exposing Tables and/or Themes
+
+        Returns:
+            (number of documents (re)indexed, number of documents removed) pair
+        """
+        indexed = 0
+        seen = set()
+        collections = [collection for collection in ('Tables', 'Themes') if collection in catalog.collections]
+        for collection in collections:
+            for entry in catalog.iter_entries(collection):
+                seen.add(self.document_key(collection, entry))
+                if self.add(collection, entry):
+                    indexed += 1
+        removed = [document_key for document_key, document in self.documents.items()
+                   if document['collection'] in collections and document_key not in seen]
+        for document_key in removed:
+            self.remove(document_key)
+        return indexed, len(removed)
+
+    def expand(self, token, prefix):
+        """Get the indexed terms matching a query token.
+
+        Args:
+            token (str): query token
+            prefix (bool): match the terms starting with the token
+
+        Returns:
+            List of terms
+        """
+        if not prefix:
+            return [token] if token in self.postings else []
+        if self.terms is None:
+            self.terms = sorted(self.postings)
+        terms = []
+        position = bisect_left(self.terms, token)
+        while position < len(self.terms) and self.terms[position].startswith(token):
+            terms.append(self.terms[position])
+            position += 1
+        return terms
+
+    def search(self, query, collection = None, language = None, limit = 10, prefix = True):
+        """Search documents holding every term of a query.
+
+        Args:
+            query (str): query text
+            collection (str): only search 'Tables' or 'Themes' (default = None, both)
+            language (str): only search documents in a language, e.g. 'nl' or 'en' (default = None, all)
+            limit (int): maximum number of results (default = 10, None = all)
+            prefix (bool): the last query term matches the terms it is a prefix of (default = True)
+
+        Returns:
+            List of results {collection, key, title, language, score}, best first
+        """
+        tokens = tokenize(query)
+        if len(tokens) == 0 or len(self.documents) == 0:
+            return []
+        average_length = self.total_length / len(self.documents)
+        scores = None
+        for position, token in enumerate(tokens):
+            token_scores = {}
+            for term in self.expand(token, prefix and position == len(tokens) - 1):
+                postings = self.postings[term]
+                idf = math.log(1.0 + (len(self.documents) - len(postings) + 0.5) / (len(postings) + 0.5))
+                for document_key, weight in postings.items():
+                    length = self.documents[document_key]['length']
+                    score = idf * weight * (self.k1 + 1) / (weight + self.k1 * (1 - self.b + self.b * length / average_length))
+                    # a prefix matching several terms of a document counts its best match
+                    if score > token_scores.get(document_key, 0.0):
+                        token_scores[document_key] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = dict((document_key, score + token_scores[document_key]) for document_key, score in scores.items()
+                              if document_key in token_scores)
+            if len(scores) == 0:
+                return []
+        results = []
+        for document_key, score in scores.items():
+            document = self.documents[document_key]
+            if collection is not None and document['collection'] != collection:
+                continue
+            if language is not None and document['language'] != language:
+                continue
+            results.append((score, document_key))
+        results.sort(key = lambda result: (-result[0], result[1]))
+        if limit is not None:
+            results = results[:limit]
+        return [OrderedDict([('collection', self.documents[document_key]['collection']), ('key', self.documents[document_key]['key']),
+                             ('title', self.documents[document_key]['title']), ('language', self.documents[document_key]['language']),
+                             ('score', score)]) for score, document_key in results]
+
+    def save(self, path):
+        """Write the index to a file atomically.
+
+        Args:
+            path (str): path of the index file
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        handle, tmp_path = tempfile.mkstemp(dir = directory, suffix = '.tmp')
+        try:
+            with os.fdopen(handle, 'w') as f:
+                json.dump({'documents': self.documents, 'postings': self.postings}, f)
+            os.rename(tmp_path, path)
+        except:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by save.
+
+        Args:
+            path (str): path of the index file
+
+        Returns:
+            SearchIndex
+        """
+        with open(path) as f:
+            data = json.load(f, object_pairs_hook = OrderedDict)
+        index = cls()
+        index.documents = data['documents']
+        index.postings = dict((term, dict(postings)) for term, postings in data['postings'].items())
+        index.total_length = sum([document['length'] for document in index.documents.values()])
+        return index
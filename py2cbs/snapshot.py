@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from columnar import ColumnarDataset, require_numpy, numpy
+from collections import OrderedDict
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+# layout: magic, header length (little-endian uint64), JSON header, column data aligned to ALIGNMENT bytes
+# (column offsets in the header are relative to the aligned end of the header)
+MAGIC = 'PY2CBSS1'
+ALIGNMENT = 64
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def write_snapshot(path, dataset, metadata = {}):
+    """Write a columnar dataset to a snapshot file, atomically replacing an existing file.
+
+    Numeric and dimension columns and missing-value masks are stored as raw
+    little-endian arrays, other columns as JSON.
+
+    Args:
+        path (str): path of the snapshot file
+        dataset (ColumnarDataset): dataset to write
+        metadata ({name: value}): JSON serializable metadata stored with the dataset
+    """
+    require_numpy()
+    blocks = []
+    columns = []
+    arrays = dataset.columns.items() + [(name, missing) for name, missing in dataset.masks.items()]
+    for position, (name, column) in enumerate(arrays):
+        if column.dtype == object:
+            data = json.dumps(column.tolist())
+            columns.append(OrderedDict([('name', name), ('dtype', 'json'), ('length', len(data))]))
+        else:
+            column = numpy.ascontiguousarray(column, dtype = column.dtype.newbyteorder('<'))
+            data = column.tobytes()
+            columns.append(OrderedDict([('name', name), ('dtype', column.dtype.str), ('length', len(column))]))
+        if position >= len(dataset.columns):
+            columns[-1]['mask'] = True
+        blocks.append(data)
+    offset = 0
+    for column, data in zip(columns, blocks):
+        column['offset'] = offset
+        offset = align(offset + len(data))
+    header = OrderedDict([('rows', len(dataset)), ('columns', columns), ('types', dataset.types),
+                          ('categories', dataset.categories), ('labels', dataset.labels), ('metadata', metadata)])
+    encoded = json.dumps(header)
+    start = align(len(MAGIC) + 8 + len(encoded))
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, tmp_path = tempfile.mkstemp(dir = directory, suffix = '.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(encoded)))
+            f.write(encoded)
+            for column, data in zip(columns, blocks):
+                f.write('\0' * (start + column['offset'] - f.tell()))
+                f.write(data)
+            f.write('\0' * (start + offset - f.tell()))
+        os.rename(tmp_path, path)
+    except:
+        os.remove(tmp_path)
+        raise
+
+class Snapshot(object):
+    """Columnar dataset read from a snapshot file through a read-only memory map.
+
+    The numeric and dimension columns are NumPy arrays backed by the mapped
+    file: opening does not copy the data, and processes opening the same
+    snapshot share its pages in the operating system's page cache. The file
+    stays mapped as long as any of these arrays is referenced.
+
+    Attributes:
+        path (str): path of the snapshot file
+        dataset (ColumnarDataset): dataset held by the snapshot
+        metadata {name: value}: metadata stored with the dataset
+    """
+
+    def __init__(self, path):
+        """Open a snapshot.
+
+        Args:
+            path (str): path of the snapshot file
+        """
+        require_numpy()
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError('Not a py2cbs snapshot: {0}'.format(path))
+            length, = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(length), object_pairs_hook = OrderedDict)
+            self.map = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        start = align(len(MAGIC) + 8 + length)
+        columns = OrderedDict()
+        masks = OrderedDict()
+        for column in header['columns']:
+            offset = start + column['offset']
+            if column['dtype'] == 'json':
+                values = json.loads(self.map[offset:offset + column['length']])
+                columns[column['name']] = numpy.empty(len(values), dtype = object)
+                columns[column['name']][:] = values
+            else:
+                arrays = masks if column.get('mask') else columns
+                arrays[column['name']] = numpy.frombuffer(self.map, dtype = numpy.dtype(str(column['dtype'])),
+                                                          count = column['length'], offset = offset)
+        self.dataset = ColumnarDataset(columns, header['types'], header['categories'], header['labels'], masks)
+        self.metadata = header['metadata']
+
+    def close(self):
+        """Release the dataset and the memory map held by the snapshot.
+
+        The map is not closed explicitly: every array backed by it references
+        it, so the file is unmapped once the last of those arrays is garbage
+        collected, and arrays taken from the dataset stay valid after closing.
+        """
+        self.dataset = None
+        self.map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from cbs import Catalog, Table
+from concurrency import map_threaded
+from collections import OrderedDict
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+NEW = 'new'
+MODIFIED = 'modified'
+UNCHANGED = 'unchanged'
+REMOVED = 'removed'
+
+class SyncError(Exception):
+    """Raised when one or more tables could not be synchronized.
+
+    Attributes:
+        errors {identifier: exception}: error per table that failed to synchronize
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        message = ', '.join(['{0} ({1!r})'.format(identifier, error) for identifier, error in errors.items()])
+        super(SyncError, self).__init__('Failed to synchronize tables: ' + message)
+
+class Sync(object):
+    """Local store of CBS Open Data tables, refreshing only the tables modified according to the catalog.
+
+    The store holds a directory per table with a JSON lines file per collection,
+    and a manifest recording the catalog metadata (Modified, RecordCount) of
+    every stored table. A table is downloaded again only when its metadata in the
+    catalog differs from the manifest.
+
+    Attributes:
+        directory (str): directory holding the store
+        identifiers ([str]): identifiers of the tracked tables (None = all tables in the catalog)
+        collections ([str]): collections stored per table ([] = all collections)
+        catalog (Catalog): catalog providing the metadata of the tables
+        workers (int): number of tables downloaded concurrently
+        manifest {identifier: {property: value}}: catalog metadata and time of synchronization of the stored tables
+        table_kwargs: keyword arguments passed on to Table
+    """
+
+    def __init__(self, directory, identifiers = None, collections = [], catalog = None, workers = 1, **kwargs):
+        """Initialize sync.
+
+        Args:
+            directory (str): directory holding the store, created when missing
+            identifiers (optional [str]): identifiers of the tracked tables (default = None, all tables in the catalog)
+            collections (optional [str]): collections stored per table (default = [], all collections)
+            catalog (Catalog): catalog providing the metadata of the tables (default = None, Catalog sharing the transport)
+            workers (int): number of tables downloaded concurrently (default = 1)
+            kwargs: keyword arguments passed on to Table, tables are streamed unless stream is given; with
+                checkpoints, a table that failed resumes its downloads on the next sync
+        """
+        self.directory = directory
+        self.identifiers = identifiers
+        self.collections = collections
+        self.workers = workers
+        kwargs.setdefault('stream', True)
+        self.table_kwargs = kwargs
+        if catalog is None:
+            catalog = Catalog(collections = ['Tables'], transport = kwargs.get('transport'))
+        self.catalog = catalog
+        self.lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.manifest = self.read_manifest()
+
+    def manifest_path(self):
+        return os.path.join(self.directory, 'manifest.json')
+
+    def read_manifest(self):
+        """Read the manifest of the store.
+
+        Returns:
+            Manifest {identifier: {property: value}}, empty for a new store
+        """
+        try:
+            with open(self.manifest_path()) as f:
+                return json.load(f, object_pairs_hook = OrderedDict)
+        except (IOError, OSError):
+            return OrderedDict()
+
+    def write_manifest(self):
+        """Write the manifest of the store atomically."""
+        with self.lock:
+            handle, tmp_path = tempfile.mkstemp(dir = self.directory, suffix = '.tmp')
+            with os.fdopen(handle, 'w') as f:
+                json.dump(self.manifest, f, indent = 1)
+            os.rename(tmp_path, self.manifest_path())
+
+    def get_catalog_tables(self):
+        """Get the current metadata of the tracked tables from the catalog.
+
+        Only Identifier, Modified and RecordCount are requested.
+
+        Returns:
+            Ordered dictionary {identifier: {'Modified': modified, 'RecordCount': record count}}
+        """
+        tables = OrderedDict()
+        for entry in self.catalog.query('Tables', return_property_names = ['Identifier', 'Modified', 'RecordCount']):
+            if self.identifiers is None or entry['Identifier'] in self.identifiers:
+                tables[entry['Identifier']] = OrderedDict([('Modified', entry['Modified']), ('RecordCount', entry['RecordCount'])])
+        return tables
+
+    def plan(self, tables = None):
+        """Compare the manifest with the catalog.
+
+        Args:
+            tables (optional {identifier: metadata}): catalog metadata (default = None, get_catalog_tables)
+
+        Returns:
+            Ordered dictionary {identifier: status}, status is NEW, MODIFIED, UNCHANGED or REMOVED
+            (in the manifest, no longer in the catalog)
+        """
+        if tables is None:
+            tables = self.get_catalog_tables()
+        plan = OrderedDict()
+        for identifier, metadata in tables.items():
+            stored = self.manifest.get(identifier)
+            if stored is None or not os.path.isdir(self.table_path(identifier)):
+                plan[identifier] = NEW
+            elif stored['Modified'] != metadata['Modified'] or stored['RecordCount'] != metadata['RecordCount']:
+                plan[identifier] = MODIFIED
+            else:
+                plan[identifier] = UNCHANGED
+        for identifier in self.manifest:
+            if identifier not in tables and (self.identifiers is None or identifier in self.identifiers):
+                plan[identifier] = REMOVED
+        return plan
+
+    def report(self, plan):
+        """Describe a plan, one line per new, modified or removed table followed by a count per status.
+
+        Args:
+            plan ({identifier: status}): plan returned by plan or sync
+
+        Returns:
+            Report (str)
+        """
+        lines = ['{0:<10} {1}'.format(status, identifier) for identifier, status in plan.items() if status != UNCHANGED]
+        counts = [(status, plan.values().count(status)) for status in (NEW, MODIFIED, UNCHANGED, REMOVED)]
+        lines.append(', '.join(['{0} {1}'.format(count, status) for status, count in counts]))
+        return '\n'.join(lines)
+
+    def sync(self, dry_run = False, prune = False):
+        """Download the new and modified tables into the store.
+
+        The manifest is written after every table, so an interrupted sync
+        only downloads the remaining tables when it is run again.
+
+        Args:
+            dry_run (bool): only return the plan, without downloading (default = False)
+            prune (bool): remove the tables that are no longer in the catalog from the store (default = False)
+
+        Returns:
+            Plan {identifier: status}
+
+        Raises:
+            SyncError: one or more tables failed, the other tables are synchronized
+        """
+        tables = self.get_catalog_tables()
+        plan = self.plan(tables)
+        if dry_run:
+            return plan
+        identifiers = [identifier for identifier, status in plan.items() if status in (NEW, MODIFIED)]
+        fetch = lambda identifier: self.fetch_table(identifier, tables[identifier])
+        errors = OrderedDict()
+        for identifier, (result, error) in zip(identifiers, map_threaded(fetch, identifiers, self.workers)):
+            if error is not None:
+                errors[identifier] = error
+        if prune:
+            for identifier, status in plan.items():
+                if status == REMOVED:
+                    self.remove_table(identifier)
+        if len(errors) > 0:
+            raise SyncError(errors)
+        return plan
+
+    def open_table(self, identifier):
+        """Create the data service of a table.
+
+        Args:
+            identifier (str): identifier of the table
+
+        Returns:
+            Table
+        """
+        return Table(identifier, collections = self.collections, **self.table_kwargs)
+
+    def table_path(self, identifier):
+        return os.path.join(self.directory, identifier)
+
+    def fetch_table(self, identifier, metadata):
+        """Download all collections of a table and replace the stored table.
+
+        Args:
+            identifier (str): identifier of the table
+            metadata ({property: value}): catalog metadata of the table, recorded in the manifest
+        """
+        table = self.open_table(identifier)
+        tmp_path = tempfile.mkdtemp(dir = self.directory, suffix = '.tmp')
+        try:
+            for collection in table.collections:
+                with open(os.path.join(tmp_path, collection + '.jsonl'), 'w') as f:
+                    for entry in table.iter_entries(collection):
+                        f.write(json.dumps(OrderedDict(entry.items())))
+                        f.write('\n')
+            path = self.table_path(identifier)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            os.rename(tmp_path, path)
+        except:
+            shutil.rmtree(tmp_path, ignore_errors = True)
+            raise
+        with self.lock:
+            self.manifest[identifier] = OrderedDict(metadata.items() + [('Synced', time.strftime('%Y-%m-%dT%H:%M:%S'))])
+        self.write_manifest()
+
+    def remove_table(self, identifier):
+        """Remove a table from the store and the manifest.
+
+        Args:
+            identifier (str): identifier of the table
+        """
+        path = self.table_path(identifier)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        with self.lock:
+            self.manifest.pop(identifier, None)
+        self.write_manifest()
+
+    def get_collections(self, identifier):
+        """Get the names of the stored collections of a table.
+
+        Args:
+            identifier (str): identifier of the table
+
+        Returns:
+            List of collection names
+        """
+        return sorted([name[:-len('.jsonl')] for name in os.listdir(self.table_path(identifier)) if name.endswith('.jsonl')])
+
+    def iter_entries(self, identifier, collection):
+        """Iterate over the stored entries of a collection of a table.
+
+        Args:
+            identifier (str): identifier of the table
+            collection (str): name of the collection
+
+        Yields:
+            Entry, an ordered dictionary of (property name, property value) pairs
+        """
+        with open(os.path.join(self.table_path(identifier), collection + '.jsonl')) as f:
+            for line in f:
+                yield json.loads(line, object_pairs_hook = OrderedDict)
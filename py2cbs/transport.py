@@ -0,0 +1,424 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import httplib
+import random
+import socket
+import threading
+import time
+import urllib
+import urllib2
+import urlparse
+import zlib
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+CHUNK_SIZE = 64 * 1024
+
+def quote_url(url):
+    """Quote the characters of a url that may not be sent as is (the way urllib.urlopen does).
+
+    Args:
+        url (str): url, possibly containing spaces or non-ascii characters
+
+    Returns:
+        Quoted url
+    """
+    if isinstance(url, unicode):
+        url = url.encode('utf-8')
+    return urllib.quote(url, safe = "%/:=&?~#+!$,;'@()*[]|")
+
+class HTTPError(IOError):
+    """Raised when a server answers with an HTTP error status.
+
+    Attributes:
+        url (str): url of the request
+        status (int): HTTP status code
+        headers {name: value}: response headers (lowercase names)
+    """
+
+    def __init__(self, url, status, headers = {}):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        super(HTTPError, self).__init__('HTTP {0} for {1}'.format(status, url))
+
+class Retry(object):
+    """Policy retrying failed requests with exponential backoff.
+
+    Connection errors, truncated responses and HTTP statuses in statuses are
+    retried; a Retry-After header of the server is respected.
+
+    Attributes:
+        attempts (int): maximum number of attempts per request
+        backoff (float): delay in seconds before the first retry, doubled for every next retry
+        max_backoff (float): maximum delay in seconds
+        statuses ((int)): HTTP statuses that are retried
+    """
+
+    def __init__(self, attempts = 5, backoff = 1.0, max_backoff = 60.0, statuses = RETRY_STATUSES):
+        """Initialize retry policy.
+
+        Args:
+            attempts (int): maximum number of attempts per request (default = 5)
+            backoff (float): delay in seconds before the first retry (default = 1.0)
+            max_backoff (float): maximum delay in seconds (default = 60.0)
+            statuses ((int)): HTTP statuses that are retried (default = 408, 429 and 5xx gateway/server errors)
+        """
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+
+    def should_retry(self, error, attempt):
+        """Check whether a failed attempt is retried.
+
+        Args:
+            error (Exception): error of the failed attempt
+            attempt (int): number of the failed attempt (0 = first)
+
+        Returns:
+            Boolean
+        """
+        if attempt + 1 >= self.attempts or not getattr(error, 'retryable', True):
+            return False
+        if isinstance(error, HTTPError):
+            return error.status in self.statuses
+        return isinstance(error, (IOError, socket.error, httplib.HTTPException, ValueError))
+
+    def get_delay(self, error, attempt):
+        """Get the delay before retrying a failed attempt.
+
+        Args:
+            error (Exception): error of the failed attempt
+            attempt (int): number of the failed attempt (0 = first)
+
+        Returns:
+            Delay in seconds
+        """
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+        retry_after = getattr(error, 'headers', {}).get('retry-after')
+        if retry_after is not None and retry_after.isdigit():
+            delay = max(delay, min(self.max_backoff, float(retry_after)))
+        return delay
+
+    def call(self, function, *args, **kwargs):
+        """Call a function, retrying it on failure.
+
+        Args:
+            function (callable): function to call
+            args, kwargs: arguments of the function
+
+        Returns:
+            Result of the function
+        """
+        attempt = 0
+        while True:
+            try:
+                return function(*args, **kwargs)
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                time.sleep(self.get_delay(e, attempt))
+                attempt += 1
+
+class Response(object):
+    """File-like HTTP response returned by a transport.
+
+    Attributes:
+        url (str): url of the response (after redirects)
+        status (int): HTTP status code
+        headers {name: value}: response headers (lowercase names)
+        connect (float): seconds spent setting up new connections for the request
+    """
+
+    def __init__(self, url, status, headers, body, release = None, connect = 0.0):
+        """Initialize a response.
+
+        Args:
+            url (str): url of the response
+            status (int): HTTP status code
+            headers {name: value}: response headers (lowercase names)
+            body: file-like object holding the response body
+            release (callable): called once when the response is closed
+            connect (float): seconds spent setting up new connections (default = 0.0)
+        """
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.release = release
+        self.connect = connect
+
+    def read(self, size = -1):
+        """Read (at most size bytes of) the response body."""
+        return self.body.read(size)
+
+    def close(self):
+        """Close the response and hand its connection back to the transport."""
+        if self.release is not None:
+            release, self.release = self.release, None
+            release()
+        else:
+            self.body.close()
+
+class Transport(object):
+    """Default transport, opening a new connection for every request (urllib2).
+
+    Attributes:
+        timeout (float): socket timeout in seconds (None = global default)
+    """
+
+    def __init__(self, timeout = None):
+        """Initialize transport.
+
+        Args:
+            timeout (float): socket timeout in seconds (default = None, global default)
+        """
+        self.timeout = timeout
+
+    def open(self, url, headers = {}):
+        """Request a url.
+
+        Args:
+            url (str): url to request
+            headers ({name: value}): additional request headers
+
+        Returns:
+            Response
+        """
+        request = urllib2.Request(quote_url(url), headers = headers)
+        try:
+            if self.timeout is None:
+                response = urllib2.urlopen(request)
+            else:
+                response = urllib2.urlopen(request, timeout = self.timeout)
+        except urllib2.HTTPError as e:
+            response_headers = dict((name.lower(), value) for name, value in e.info().items())
+            if e.code == 304:
+                return Response(url, 304, response_headers, e)
+            raise HTTPError(url, e.code, response_headers)
+        response_headers = dict((name.lower(), value) for name, value in response.info().items())
+        return Response(response.geturl(), response.getcode(), response_headers, response)
+
+    def close(self):
+        """Close the transport."""
+        pass
+
+class HTTPTransport(Transport):
+    """Transport keeping persistent (keep-alive) connections per host and requesting compressed responses.
+
+    The transport is thread-safe and meant to be shared by all feeds of a data service.
+
+    Attributes:
+        timeout (float): socket timeout in seconds
+        pool_size (int): maximum number of idle connections kept per host
+        compress (bool): request gzip/deflate encoded responses
+        max_redirects (int): maximum number of redirects followed per request
+    """
+
+    def __init__(self, timeout = 60, pool_size = 4, compress = True, max_redirects = 5):
+        """Initialize transport.
+
+        Args:
+            timeout (float): socket timeout in seconds (default = 60)
+            pool_size (int): maximum number of idle connections kept per host (default = 4)
+            compress (bool): request gzip/deflate encoded responses (default = True)
+            max_redirects (int): maximum number of redirects followed per request (default = 5)
+        """
+        super(HTTPTransport, self).__init__(timeout = timeout)
+        self.pool_size = pool_size
+        self.compress = compress
+        self.max_redirects = max_redirects
+        self.pools = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, host):
+        """Take an idle connection to a host from the pool or create a new one.
+
+        Args:
+            host ((scheme, netloc)): host to connect to
+
+        Returns:
+            (connection, reused) pair
+        """
+        with self.lock:
+            pool = self.pools.get(host)
+            if pool:
+                return pool.pop(), True
+        scheme, netloc = host
+        if scheme == 'https':
+            connection = httplib.HTTPSConnection(netloc, timeout = self.timeout)
+        else:
+            connection = httplib.HTTPConnection(netloc, timeout = self.timeout)
+        return connection, False
+
+    def release(self, host, connection, response):
+        """Return a connection to the pool if its response has been read completely.
+
+        Args:
+            host ((scheme, netloc)): host of the connection
+            connection: connection to return
+            response: last response read from the connection
+        """
+        if response.isclosed() and not response.will_close:
+            with self.lock:
+                pool = self.pools.setdefault(host, [])
+                if len(pool) < self.pool_size:
+                    pool.append(connection)
+                    return
+        response.close()
+        connection.close()
+
+    def open(self, url, headers = {}):
+        """Request a url over a pooled connection, following redirects.
+
+        Args:
+            url (str): url to request
+            headers ({name: value}): additional request headers
+
+        Returns:
+            Response, decompressed transparently
+        """
+        request_headers = {'Accept': 'application/json'}
+        if self.compress:
+            request_headers['Accept-Encoding'] = 'gzip, deflate'
+        request_headers.update(headers)
+        connect = 0.0
+        for _ in range(self.max_redirects + 1):
+            parts = urlparse.urlsplit(quote_url(url))
+            host = (parts.scheme, parts.netloc)
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+            connection, response, connect_time = self.request(host, path, request_headers)
+            connect += connect_time
+            response_headers = dict((name.lower(), value) for name, value in response.getheaders())
+            if response.status in REDIRECT_STATUSES and 'location' in response_headers:
+                response.read()
+                self.release(host, connection, response)
+                url = urlparse.urljoin(url, response_headers['location'])
+                continue
+            if response.status >= 400:
+                response.read()
+                self.release(host, connection, response)
+                raise HTTPError(url, response.status, response_headers)
+            body = response
+            encoding = response_headers.get('content-encoding', '').lower()
+            if encoding in ('gzip', 'deflate'):
+                body = DecompressingReader(response, encoding)
+            release = lambda host = host, connection = connection, response = response: self.release(host, connection, response)
+            return Response(url, response.status, response_headers, body, release, connect)
+        raise HTTPError(url, response.status, response_headers)
+
+    def request(self, host, path, headers):
+        """Send a GET request, retrying once on a fresh connection when a pooled connection went stale.
+
+        Args:
+            host ((scheme, netloc)): host to connect to
+            path (str): path and query of the request
+            headers ({name: value}): request headers
+
+        Returns:
+            (connection, response, seconds spent connecting) tuple
+        """
+        while True:
+            connection, reused = self.acquire(host)
+            try:
+                connect = 0.0
+                if not reused:
+                    started = time.time()
+                    connection.connect()
+                    connect = time.time() - started
+                connection.request('GET', path, headers = headers)
+                return connection, connection.getresponse(), connect
+            except (httplib.HTTPException, socket.error):
+                connection.close()
+                if not reused:
+                    raise
+
+    def close(self):
+        """Close all pooled connections."""
+        with self.lock:
+            pools, self.pools = self.pools, {}
+        for pool in pools.values():
+            for connection in pool:
+                connection.close()
+
+class DecompressingReader(object):
+    """File-like object decompressing a gzip or deflate encoded stream while it is read."""
+
+    def __init__(self, raw, encoding):
+        """Initialize reader.
+
+        Args:
+            raw: file-like object holding the encoded stream
+            encoding (str): content encoding ('gzip' or 'deflate')
+        """
+        self.raw = raw
+        self.encoding = encoding
+        if encoding == 'gzip':
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            self.decompressor = zlib.decompressobj(zlib.MAX_WBITS)
+        self.started = False
+        # decompressed data not read yet, joined on read
+        self.chunks = []
+        self.length = 0
+        self.eof = False
+
+    def decompress(self, chunk):
+        if not self.started and self.encoding == 'deflate':
+            self.started = True
+            try:
+                return self.decompressor.decompress(chunk)
+            except zlib.error:
+                # raw deflate stream without zlib header
+                self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        self.started = True
+        return self.decompressor.decompress(chunk)
+
+    def fill(self):
+        chunk = self.raw.read(CHUNK_SIZE)
+        if chunk:
+            data = self.decompress(chunk)
+        else:
+            data = self.decompressor.flush()
+            self.eof = True
+        if data:
+            self.chunks.append(data)
+            self.length += len(data)
+
+    def read(self, size = -1):
+        """Read (at most size bytes of) the decompressed stream."""
+        if size is None or size < 0:
+            while not self.eof:
+                self.fill()
+        else:
+            while self.length < size and not self.eof:
+                self.fill()
+        data = ''.join(self.chunks)
+        if size is None or size < 0 or size >= len(data):
+            self.chunks = []
+            self.length = 0
+            return data
+        self.chunks = [data[size:]]
+        self.length = len(data) - size
+        return data[:size]
+
+    def close(self):
+        self.raw.close()
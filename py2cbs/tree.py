@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import OrderedDict
+
+class Tree(object):
+    """Class representing a forest of nodes, materialized once for fast ancestry and subtree queries.
+
+    The nodes are numbered in depth-first preorder, so the descendants of a node
+    form a contiguous slice of that order. An Euler tour with a sparse table of
+    minimum depths answers lowest common ancestor queries in constant time.
+
+    Attributes:
+        parents {node: parent}: parent per node (None for a root)
+        children {node: [node]}: direct children per node
+        roots ([node]): nodes without (known) parent
+        order ([node]): nodes in depth-first preorder
+        start {node: int}: position of a node in order
+        end {node: int}: position after the last descendant of a node in order
+        depth {node: int}: depth of a node (0 for a root)
+    """
+
+    def __init__(self, parents):
+        """Initialize tree.
+
+        Args:
+            parents ({node: parent}): parent per node (None for a root), children keep the order of the mapping
+
+        Raises:
+            ValueError: if the parents form a cycle (a node being its own parent is a root)
+        """
+        self.parents = OrderedDict(parents)
+        self.children = OrderedDict((node, []) for node in self.parents)
+        self.roots = []
+        for node, parent in self.parents.items():
+            if parent is None or parent not in self.children or parent == node:
+                self.parents[node] = None
+                self.roots.append(node)
+            else:
+                self.children[parent].append(node)
+        self.set_order()
+        if len(self.order) < len(self.parents):
+            # nodes not reached from a root are on, or below, a cycle of parents
+            unreachable = [node for node in self.parents if node not in self.start]
+            raise ValueError('Cycle in parents of nodes {0}'.format(', '.join(map(repr, unreachable))))
+        self.set_lca_table()
+
+    def set_order(self):
+        """Set preorder, subtree boundaries, depths and Euler tour."""
+        self.order = []
+        self.start = {}
+        self.end = {}
+        self.depth = {}
+        self.root = {}
+        self.euler = []
+        self.euler_first = {}
+        for root in self.roots:
+            self.depth[root] = 0
+            stack = [(root, iter(self.children[root]))]
+            self.visit(root, root)
+            while stack:
+                node, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    stack.pop()
+                    self.end[node] = len(self.order)
+                    if stack:
+                        self.euler.append(stack[-1][0])
+                elif child not in self.start:
+                    self.depth[child] = self.depth[node] + 1
+                    self.visit(child, root)
+                    stack.append((child, iter(self.children[child])))
+
+    def visit(self, node, root):
+        self.start[node] = len(self.order)
+        self.order.append(node)
+        self.root[node] = root
+        self.euler_first[node] = len(self.euler)
+        self.euler.append(node)
+
+    def set_lca_table(self):
+        """Set sparse table holding the shallowest node of every power-of-two range of the Euler tour."""
+        depth = self.depth
+        level = list(self.euler)
+        self.sparse = [level]
+        width = 1
+        while 2 * width <= len(self.euler):
+            previous = level
+            level = []
+            for i in range(len(self.euler) - 2 * width + 1):
+                a, b = previous[i], previous[i + width]
+                level.append(a if depth[a] <= depth[b] else b)
+            self.sparse.append(level)
+            width *= 2
+
+    def __contains__(self, node):
+        return node in self.start
+
+    def __len__(self):
+        return len(self.order)
+
+    def get_path(self, node):
+        """Get the path from the root to a node.
+
+        Args:
+            node: node in the tree
+
+        Returns:
+            List of nodes, starting with the root and ending with the node
+        """
+        path = [node]
+        parent = self.parents.get(node)
+        while parent is not None:
+            path.append(parent)
+            parent = self.parents[parent]
+        path.reverse()
+        return path
+
+    def get_ancestors(self, node):
+        """Get the ancestors of a node, nearest first.
+
+        Args:
+            node: node in the tree
+
+        Returns:
+            List of nodes
+        """
+        return self.get_path(node)[-2::-1]
+
+    def get_descendants(self, node):
+        """Get the descendants of a node in depth-first preorder.
+
+        Args:
+            node: node in the tree
+
+        Returns:
+            List of nodes (excluding the node itself)
+        """
+        return self.order[self.start[node] + 1:self.end[node]]
+
+    def get_subtree(self, node):
+        """Get a node and its descendants in depth-first preorder.
+
+        Args:
+            node: node in the tree
+
+        Returns:
+            List of nodes
+        """
+        return self.order[self.start[node]:self.end[node]]
+
+    def is_ancestor(self, ancestor, node):
+        """Check whether a node is an ancestor of (or equal to) another node.
+
+        Args:
+            ancestor: candidate ancestor
+            node: node in the tree
+
+        Returns:
+            Boolean
+        """
+        return self.start[ancestor] <= self.start[node] < self.end[ancestor]
+
+    def get_lowest_common_ancestor(self, a, b):
+        """Get the deepest node that is an ancestor of (or equal to) two nodes.
+
+        Args:
+            a: node in the tree
+            b: node in the tree
+
+        Returns:
+            Node (None if the nodes are in different trees)
+        """
+        if self.root[a] != self.root[b]:
+            return None
+        i, j = sorted([self.euler_first[a], self.euler_first[b]])
+        k = (j - i + 1).bit_length() - 1
+        x, y = self.sparse[k][i], self.sparse[k][j - (1 << k) + 1]
+        if self.depth[x] <= self.depth[y]:
+            return x
+        return y
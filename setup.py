@@ -7,6 +7,7 @@ setup(
     description = 'Python client library for CBS (Netherlands Statistics) Open Data',
     long_description = 'Py2cbs is a small client library for working with CBS (Netherlands Statistics) Open Data from within Python applications and from the command line.',
     packages = [__package__],
+    scripts = ['scripts/py2cbs'],
     author = __author__,
     author_email = __email__,
     license=__license__,
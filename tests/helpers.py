@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Shared fixtures of the tests: the synthetic server of the benchmarks and a stub transport."""
+
+from py2cbs.transport import Transport, Response, HTTPError
+import atexit
+import io
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+import server
+
+servers = {}
+lock = threading.Lock()
+
+def get_server(rows = 2000, page_size = 500, tables = 3, themes = 10):
+    """Get a synthetic CBS Open Data server running in the background, one per configuration.
+
+    Returns:
+        server.SyntheticServer, see its feed_root and catalog_url
+    """
+    key = (rows, page_size, tables, themes)
+    with lock:
+        if key not in servers:
+            servers[key] = server.start(tables = tables, rows = rows, themes = themes, page_size = page_size)
+            # stop serving before the interpreter tears down the serving thread
+            atexit.register(servers[key].shutdown)
+        return servers[key]
+
+class TruncatedReader(object):
+    """File-like object failing with an IOError once size bytes have been read."""
+
+    def __init__(self, f, size):
+        self.f = f
+        self.size = size
+
+    def read(self, size = -1):
+        if self.size <= 0:
+            raise IOError('Connection reset')
+        if size is None or size < 0 or size > self.size:
+            size = self.size
+        data = self.f.read(size)
+        self.size -= len(data)
+        return data
+
+    def close(self):
+        self.f.close()
+
+class FailingTransport(Transport):
+    """Transport failing chosen requests of another transport, recording the requests.
+
+    Attributes:
+        urls ([str]): urls requested
+    """
+
+    def __init__(self, transport, fail):
+        """Initialize failing transport.
+
+        Args:
+            transport (Transport): transport answering the requests
+            fail (callable): function (request number, url) -> None to answer the request, 0 to fail it,
+                or the number of bytes of the body read before the response fails
+        """
+        Transport.__init__(self)
+        self.transport = transport
+        self.fail = fail
+        self.urls = []
+
+    def open(self, url, headers = {}):
+        number = len(self.urls)
+        self.urls.append(url)
+        size = self.fail(number, url)
+        if size == 0:
+            raise IOError('Connection refused')
+        response = self.transport.open(url, headers)
+        if size is not None:
+            response.body = TruncatedReader(response.body, size)
+        return response
+
+class StubTransport(Transport):
+    """Transport answering from a function of the url, recording the requests.
+
+    Attributes:
+        urls ([str]): urls requested
+        headers ([{name: value}]): request headers per request
+    """
+
+    def __init__(self, respond):
+        """Initialize stub transport.
+
+        Args:
+            respond (callable): function (url, headers) -> (status, headers, body bytes), or raising an exception
+        """
+        Transport.__init__(self)
+        self.respond = respond
+        self.urls = []
+        self.headers = []
+
+    def open(self, url, headers = {}):
+        self.urls.append(url)
+        self.headers.append(dict(headers))
+        status, response_headers, body = self.respond(url, headers)
+        if status >= 400:
+            raise HTTPError(url, status, response_headers)
+        return Response(url, status, response_headers, io.BytesIO(body))
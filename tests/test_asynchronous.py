@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from py2cbs.asynchronous import AsyncTable
+from py2cbs.cbs import Table
+from py2cbs.concurrency import Executor
+from helpers import get_server
+import unittest
+
+class AsyncTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = get_server()
+        self.executor = Executor(workers = 2)
+        self.table = AsyncTable('00000syn', root = self.server.feed_root, executor = self.executor)
+        self.expected = Table('00000syn', root = self.server.feed_root).get_entries('TypedDataSet')
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_iter_pages_streams(self):
+        """Pages of a feed not loaded are streamed, without loading the feed."""
+        pages = [page.result(10) for page in self.table.iter_pages('TypedDataSet')]
+        self.assertEqual([len(page) for page in pages], [500, 500, 500, 500])
+        self.assertEqual(list(self.table.iter_entries('TypedDataSet')), self.expected)
+        self.assertNotIn('TypedDataSet', self.table.feeds)
+        self.table.load(['TypedDataSet']).result(10)
+        self.assertEqual([len(page.result(10)) for page in self.table.iter_pages('TypedDataSet')], [2000])
+
+if __name__ == '__main__':
+    unittest.main()
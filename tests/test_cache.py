@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from py2cbs.cache import ResponseCache, CachingTransport, CacheMiss
+from helpers import StubTransport
+import os
+import shutil
+import tempfile
+import unittest
+
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.bodies = {'http://a': 'a' * 10, 'http://b': 'b' * 10, 'http://c': 'c' * 10}
+        self.transport = StubTransport(self.respond)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def respond(self, url, headers):
+        if headers.get('If-None-Match') == '"' + url + '"':
+            return 304, {}, ''
+        return 200, {'etag': '"' + url + '"', 'content-type': 'application/json'}, self.bodies[url]
+
+    def get(self, transport, url):
+        response = transport.open(url)
+        try:
+            return response.read()
+        finally:
+            response.close()
+
+    def test_ttl(self):
+        cache = ResponseCache(self.directory, ttl = 3600)
+        transport = CachingTransport(cache, self.transport)
+        self.assertEqual(self.get(transport, 'http://a'), 'a' * 10)
+        self.assertEqual(self.get(transport, 'http://a'), 'a' * 10)
+        self.assertEqual(self.transport.urls, ['http://a'])
+        # expired: revalidated with the server
+        cache.ttl = 0
+        self.assertEqual(self.get(transport, 'http://a'), 'a' * 10)
+        self.assertEqual(self.transport.urls, ['http://a', 'http://a'])
+
+    def test_revalidation(self):
+        """A 304 answer serves the cached body and refreshes it."""
+        cache = ResponseCache(self.directory)
+        transport = CachingTransport(cache, self.transport)
+        self.get(transport, 'http://a')
+        stored = cache.lookup('http://a')['stored']
+        self.bodies['http://a'] = 'changed'
+        self.assertEqual(self.get(transport, 'http://a'), 'a' * 10)
+        self.assertEqual(self.transport.headers[-1].get('If-None-Match'), '"http://a"')
+        self.assertTrue(cache.lookup('http://a')['stored'] >= stored)
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(self.directory, ttl = 3600, max_size = 25)
+        transport = CachingTransport(cache, self.transport)
+        self.get(transport, 'http://a')
+        self.get(transport, 'http://b')
+        os.utime(cache.paths('http://a')[0], (2000, 2000))
+        os.utime(cache.paths('http://b')[0], (1000, 1000))
+        self.get(transport, 'http://c')
+        self.assertIsNotNone(cache.lookup('http://a'))
+        self.assertIsNone(cache.lookup('http://b'))
+        self.assertIsNotNone(cache.lookup('http://c'))
+        self.assertEqual(cache.size(), 20)
+
+    def test_offline(self):
+        transport = CachingTransport(ResponseCache(self.directory), self.transport)
+        self.get(transport, 'http://a')
+        offline = CachingTransport(ResponseCache(self.directory, offline = True), self.transport)
+        self.assertEqual(self.get(offline, 'http://a'), 'a' * 10)
+        self.assertRaises(CacheMiss, offline.open, 'http://b')
+        self.assertEqual(self.transport.urls, ['http://a'])
+
+    def test_partial_read_not_stored(self):
+        cache = ResponseCache(self.directory)
+        transport = CachingTransport(cache, self.transport)
+        response = transport.open('http://a')
+        self.assertEqual(response.read(4), 'aaaa')
+        response.close()
+        self.assertIsNone(cache.lookup('http://a'))
+        self.assertEqual([name for name in os.listdir(self.directory) if name.endswith('.tmp')], [])
+        # read completely in parts
+        response = transport.open('http://a')
+        while response.read(4):
+            pass
+        response.close()
+        self.assertEqual(open(cache.paths('http://a')[0], 'rb').read(), 'a' * 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from py2cbs.cbs import Table
+from helpers import get_server
+from collections import Counter
+import threading
+import unittest
+
+class CountingTable(Table):
+
+    def __init__(self, *args, **kwargs):
+        self.loads = Counter()
+        Table.__init__(self, *args, **kwargs)
+
+    def load_feed(self, collection):
+        self.loads[collection] += 1
+        return Table.load_feed(self, collection)
+
+class DataServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = get_server()
+
+    def test_prefetch_while_accessed(self):
+        """Feeds accessed while they are prefetched are loaded once, and added in the order of the collections."""
+        table = CountingTable('00000syn', root = self.server.feed_root, workers = 4)
+        threads = [threading.Thread(target = table.get_entries, args = (collection,))
+                   for collection in reversed(table.collections) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        table.prefetch()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(set(table.feeds), set(table.collections))
+        self.assertEqual(max(table.loads.values()), 1)
+        self.assertEqual(table.feeds.loaded, {})
+        table = CountingTable('00000syn', root = self.server.feed_root, workers = 4)
+        table.prefetch()
+        self.assertEqual(list(table.feeds), table.collections)
+
+if __name__ == '__main__':
+    unittest.main()
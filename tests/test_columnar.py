@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from py2cbs.columnar import decode_values, UntypedColumnarBuilder, numpy
+from collections import OrderedDict
+import unittest
+
+@unittest.skipIf(numpy is None, 'requires numpy')
+class DecodeValuesTest(unittest.TestCase):
+
+    def test_placeholders(self):
+        """CBS placeholders, None and other symbols are masked."""
+        values = [u'    1234', u'       .', None, u'       x', u'      -', u'', u'  12.5', u'     €', u'   n.v.t.', u'-3']
+        decoded, missing = decode_values(values, 'd')
+        self.assertEqual(missing.tolist(), [False, True, True, True, True, True, False, True, True, False])
+        self.assertEqual(decoded[~missing].tolist(), [1234.0, 12.5, -3.0])
+        self.assertTrue(numpy.isnan(decoded[missing]).all())
+
+    def test_integers(self):
+        decoded, missing = decode_values([u'     12', u'      .', u'  -7'], 'l')
+        self.assertEqual(decoded.dtype, numpy.int64)
+        self.assertEqual(decoded.tolist(), [12, 0, -7])
+        self.assertEqual(missing.tolist(), [False, True, False])
+
+    def test_decimals_in_integer_column(self):
+        decoded, missing = decode_values([u'     12', u'   0.5', u'      .'], 'l')
+        self.assertEqual(decoded.dtype.kind, 'f')
+        self.assertEqual(decoded[:2].tolist(), [12.0, 0.5])
+        self.assertTrue(numpy.isnan(decoded[2]))
+
+    def test_builder_switches_to_float(self):
+        """A page with decimals turns an integer column into a float column, keeping the masks of the earlier pages."""
+        builder = UntypedColumnarBuilder(OrderedDict([('Bevolking_1', 'l')]), OrderedDict())
+        builder.add_page([OrderedDict([('ID', 0), ('Bevolking_1', u'     12')]), OrderedDict([('ID', 1), ('Bevolking_1', u'      .')])])
+        builder.add_page([OrderedDict([('ID', 2), ('Bevolking_1', u'    2.5')])])
+        builder.add_page([OrderedDict([('ID', 3), ('Bevolking_1', u'      3')])])
+        dataset = builder.build()
+        self.assertEqual(dataset.types['Bevolking_1'], 'd')
+        column = dataset.columns['Bevolking_1']
+        self.assertEqual(column.dtype.kind, 'f')
+        self.assertEqual(dataset.masks['Bevolking_1'].tolist(), [False, True, False, False])
+        self.assertEqual(column[~dataset.masks['Bevolking_1']].tolist(), [12.0, 2.5, 3.0])
+        self.assertTrue(numpy.isnan(column[1]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from py2cbs.concurrency import Executor, Future, gather
+import logging
+import unittest
+
+def fail(future):
+    raise ValueError('callback failed')
+
+class ExecutorTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.getLogger('py2cbs.concurrency').disabled = True
+        self.executor = Executor(workers = 2)
+
+    def tearDown(self):
+        logging.getLogger('py2cbs.concurrency').disabled = False
+        self.executor.shutdown()
+
+    def test_failing_callback(self):
+        """A callback raising does not keep the other callbacks from running, nor kill the worker."""
+        called = []
+        future = Future()
+        future.add_done_callback(fail)
+        future.add_done_callback(called.append)
+        future.set_result(1)
+        self.assertEqual(called, [future])
+        future.add_done_callback(fail)
+        for _ in range(5):
+            future = self.executor.submit(lambda: 1)
+            future.add_done_callback(fail)
+            self.assertEqual(future.result(5), 1)
+        self.assertEqual(sum(thread.is_alive() for thread in self.executor.threads), 2)
+        outcomes = gather([self.executor.submit(lambda i = i: i * i) for i in range(10)]).result(5)
+        self.assertEqual(outcomes, [(i * i, None) for i in range(10)])
+
+    def test_nested_wait(self):
+        """Calls waiting for calls on the same executor run the queued calls meanwhile."""
+        def outer(depth):
+            if depth == 0:
+                return 0
+            return self.executor.submit(outer, depth - 1).result(5) + 1
+        self.assertEqual(self.executor.submit(outer, 10).result(5), 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from py2cbs.columnar import ColumnarDataset, numpy
+from py2cbs.join import merge_join, hash_join, join_datasets
+from collections import OrderedDict
+import random
+import unittest
+
+def pairs(positions):
+    return sorted(zip(positions[0].tolist(), positions[1].tolist()))
+
+def naive_join(left, right, how):
+    result = []
+    for i, key in enumerate(left):
+        matches = [j for j, other in enumerate(right) if other == key]
+        if len(matches) == 0 and how == 'left':
+            matches = [-1]
+        result += [(i, j) for j in matches]
+    return sorted(result)
+
+def dataset(regions, periods, values, region_keys, period_keys):
+    columns = OrderedDict([('ID', numpy.arange(len(values))), ('RegioS', numpy.array(regions, dtype = numpy.intp)),
+                           ('Perioden', numpy.array(periods, dtype = numpy.intp)), ('Bevolking_1', numpy.array(values, dtype = float))])
+    types = OrderedDict([('ID', 'l'), ('RegioS', 'category'), ('Perioden', 'category'), ('Bevolking_1', 'd')])
+    return ColumnarDataset(columns, types, OrderedDict([('RegioS', region_keys), ('Perioden', period_keys)]),
+                           OrderedDict([('RegioS', region_keys), ('Perioden', period_keys)]))
+
+@unittest.skipIf(numpy is None, 'requires numpy')
+class JoinTest(unittest.TestCase):
+
+    def test_merge_and_hash_agree(self):
+        """Sort-merge and hash joins match the same rows as a nested loop, with duplicates and missing keys."""
+        generator = random.Random(2016)
+        for _ in range(200):
+            left = numpy.array([generator.randrange(8) for _ in range(generator.randrange(12))], dtype = numpy.int64)
+            right = numpy.array([generator.randrange(8) for _ in range(generator.randrange(12))], dtype = numpy.int64)
+            for how in ('inner', 'left'):
+                expected = naive_join(left.tolist(), right.tolist(), how)
+                self.assertEqual(pairs(merge_join(left, right, how)), expected)
+                self.assertEqual(pairs(hash_join(left, right, how)), expected)
+
+    def test_merge_join_keeps_left_order(self):
+        left_positions, right_positions = merge_join(numpy.array([3, 1, 2]), numpy.array([1, 2, 3, 1]))
+        self.assertEqual(left_positions.tolist(), [0, 1, 1, 2])
+        self.assertEqual(sorted(right_positions[1:3].tolist()), [0, 3])
+
+    def test_join_datasets(self):
+        """Datasets coding the same keys differently are joined on the keys."""
+        a = dataset([0, 0, 1, 1], [0, 1, 0, 1], [1, 2, 3, 4], [u'NL01  ', u'GM0363  '], [u'2015JJ00', u'2016JJ00'])
+        b = dataset([1, 0, 2], [0, 0, 0], [30, 10, 50], [u'NL01  ', u'GM0363  ', u'GM0599  '], [u'2015JJ00'])
+        for method in ('merge', 'hash'):
+            inner = join_datasets(OrderedDict([('a', a), ('b', b)]), ['RegioS', 'Perioden'], method = method)
+            self.assertEqual(list(inner.columns), ['RegioS', 'Perioden', 'a.Bevolking_1', 'b.Bevolking_1'])
+            rows = sorted(zip(inner.keys('RegioS'), inner.keys('Perioden'), inner.columns['a.Bevolking_1'].tolist(),
+                              inner.columns['b.Bevolking_1'].tolist()))
+            self.assertEqual(rows, [(u'GM0363  ', u'2015JJ00', 3.0, 30.0), (u'NL01  ', u'2015JJ00', 1.0, 10.0)])
+            left = join_datasets(OrderedDict([('a', a), ('b', b)]), ['RegioS', 'Perioden'], how = 'left', method = method)
+            self.assertEqual(len(left), 4)
+            self.assertEqual(numpy.isnan(left.columns['b.Bevolking_1']).sum(), 2)
+            self.assertEqual(left.masks['b.Bevolking_1'].tolist(), numpy.isnan(left.columns['b.Bevolking_1']).tolist())
+
+    def test_join_empty_dataset(self):
+        a = dataset([0], [0], [1], [u'NL01  '], [u'2015JJ00'])
+        empty = ColumnarDataset(OrderedDict(), OrderedDict(), OrderedDict([('RegioS', []), ('Perioden', [])]),
+                                OrderedDict([('RegioS', []), ('Perioden', [])]))
+        self.assertEqual(len(join_datasets(OrderedDict([('a', a), ('b', empty)]), ['RegioS', 'Perioden'])), 0)
+        self.assertEqual(len(join_datasets(OrderedDict([('a', a), ('b', empty)]), ['RegioS', 'Perioden'], how = 'left')), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from py2cbs.jsonstream import PageReader
+from collections import OrderedDict
+import io
+import json
+import random
+import unittest
+
+STRINGS = [u'', u'plain', u'quote " inside', u'back\\slash', u'new\nline\ttab', u'slash /', u'éè accents',
+           u'€ euro', u'\U0001f600 outside the BMP', u'control \x01', u'GM0363  ', u'2015JJ00', u'{"not": [json]}']
+NUMBERS = [0, 1, -1, 12345678901234567890, 0.5, -1.25e-10, 3.141592653589793, 1e+300, 10000]
+
+def random_value(generator, depth = 0):
+    kind = generator.randint(0, 6 if depth < 2 else 3)
+    if kind == 0:
+        return generator.choice(STRINGS)
+    if kind == 1:
+        return generator.choice(NUMBERS)
+    if kind == 2:
+        return generator.choice([True, False])
+    if kind == 3:
+        return None
+    if kind == 4:
+        return [random_value(generator, depth + 1) for _ in range(generator.randint(0, 3))]
+    return random_entry(generator, depth + 1)
+
+def random_entry(generator, depth = 0):
+    entry = OrderedDict()
+    for number in range(generator.randint(0, 5)):
+        entry[u'{0}_{1}'.format(generator.choice(STRINGS), number)] = random_value(generator, depth)
+    return entry
+
+def random_page(generator):
+    """Get a random OData page, with odata.nextLink before or after the value array or missing."""
+    members = [(u'odata.metadata', u'http://opendata.cbs.nl/ODataFeed/odata/37296ned/$metadata#Cbs.OData.WebAPI.TypedDataSet'),
+               (u'value', [random_entry(generator) for _ in range(generator.randint(0, 6))])]
+    placement = generator.randint(0, 2)
+    if placement < 2:
+        members.insert(placement * 2, (u'odata.nextLink', u"http://opendata.cbs.nl/ODataFeed/odata/37296ned/TypedDataSet?$skip=10000&$filter=Perioden eq '2015JJ00'"))
+    return OrderedDict(members)
+
+def encode(page, generator):
+    """Encode a page as JSON text with varying whitespace and escaping."""
+    style = generator.randint(0, 2)
+    if style == 0:
+        text = json.dumps(page)
+    elif style == 1:
+        text = json.dumps(page, indent = 2)
+    else:
+        text = json.dumps(page, ensure_ascii = False, separators = (',', ':'))
+    if isinstance(text, unicode):
+        text = text.encode('utf-8')
+    return text
+
+def read_page(text, chunk_size):
+    reader = PageReader(io.BytesIO(text), chunk_size = chunk_size)
+    entries = list(reader)
+    reader.close()
+    return entries, reader.properties
+
+class PageReaderTest(unittest.TestCase):
+
+    def test_chunk_sizes(self):
+        """Every chunk size yields the entries and properties of a complete parse."""
+        generator = random.Random(2016)
+        for _ in range(150):
+            text = encode(random_page(generator), generator)
+            expected = json.loads(text.decode('utf-8'), object_pairs_hook = OrderedDict)
+            value = expected.pop(u'value')
+            for chunk_size in range(1, 24) + [64, 1000, len(text)]:
+                entries, properties = read_page(text, chunk_size)
+                self.assertEqual(entries, value, 'chunk size {0}: {1!r}'.format(chunk_size, text))
+                self.assertEqual(properties, expected, 'chunk size {0}: {1!r}'.format(chunk_size, text))
+
+    def test_numbers_at_chunk_boundary(self):
+        """A number split over chunks is not cut off at the end of a chunk."""
+        text = b'{"value": [12345678, -0.125e-3, 7], "odata.nextLink": "next"}'
+        for chunk_size in range(1, len(text) + 1):
+            entries, properties = read_page(text, chunk_size)
+            self.assertEqual(entries, [12345678, -0.125e-3, 7])
+            self.assertEqual(properties, {u'odata.nextLink': u'next'})
+
+    def test_next_link_placement(self):
+        for text in [b'{"odata.nextLink": "next", "value": [{"ID": 0}]}', b'{"value": [{"ID": 0}], "odata.nextLink": "next"}']:
+            for chunk_size in [1, 3, 1000]:
+                entries, properties = read_page(text, chunk_size)
+                self.assertEqual(entries, [{u'ID': 0}])
+                self.assertEqual(properties[u'odata.nextLink'], u'next')
+
+    def test_empty(self):
+        self.assertEqual(read_page(b'{}', 1), ([], {}))
+        self.assertEqual(read_page(b'{"value": []}', 1), ([], {}))
+        self.assertEqual(read_page(b' { "value" : [ ] } ', 2), ([], {}))
+
+    def test_entries_keep_property_order(self):
+        text = b'{"value": [{"ID": 0, "RegioS": "NL01  ", "Perioden": "2015JJ00", "Bevolking_1": 17}]}'
+        entries, _ = read_page(text, 5)
+        self.assertEqual(entries[0].keys(), [u'ID', u'RegioS', u'Perioden', u'Bevolking_1'])
+
+    def test_truncated_page(self):
+        text = b'{"value": [{"ID": 0}, {"ID": 1}, {"ID"'
+        for chunk_size in [1, 7, 1000]:
+            reader = PageReader(io.BytesIO(text), chunk_size = chunk_size)
+            self.assertRaises(ValueError, list, reader)
+
+    def test_invalid_page(self):
+        for text in [b'[]', b'{"value": [1 2]}', b'{"value": [1], ']:
+            reader = PageReader(io.BytesIO(text), chunk_size = 4)
+            self.assertRaises(ValueError, list, reader)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from py2cbs.metrics import Metrics
+from py2cbs.odata import Resource
+from helpers import get_server
+import logging
+import unittest
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.service_root = get_server().feed_root + '/00000syn'
+
+    def test_feed_totals(self):
+        """Streamed and loaded pages count their rows once, loads are counted separately."""
+        for stream, incremental in ((True, False), (True, True), (False, False), (False, True)):
+            metrics = Metrics()
+            resource = Resource(self.service_root, 'TypedDataSet', stream = stream, incremental = incremental, metrics = metrics)
+            self.assertEqual(len(list(resource.iter_entries())), 2000)
+            totals = metrics.summary()['feeds'][resource.resource_url]
+            self.assertEqual((totals['pages'], totals['rows'], totals['loads']), (4, 2000, 0 if stream else 1))
+            self.assertTrue(totals['seconds'] > 0)
+            self.assertIsNotNone(totals['rows_per_second'])
+            self.assertEqual(metrics.summary()['requests']['count'], 4)
+            self.assertIn('2000 rows read', metrics.report())
+
+    def test_failing_callback(self):
+        def fail(event, data):
+            raise ValueError('callback failed')
+        metrics = Metrics([fail])
+        logging.getLogger('py2cbs.metrics').disabled = True
+        try:
+            resource = Resource(self.service_root, 'TypedDataSet', metrics = metrics)
+        finally:
+            logging.getLogger('py2cbs.metrics').disabled = False
+        self.assertEqual(len(resource.entries), 2000)
+        self.assertEqual(metrics.summary()['requests']['count'], 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from py2cbs.odata import Resource
+from py2cbs.cbs import Table
+from py2cbs.checkpoint import Checkpoint
+from py2cbs.transport import Transport, Retry
+from helpers import get_server, FailingTransport
+import os
+import shutil
+import tempfile
+import unittest
+import urlparse
+
+class ResourceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = get_server()
+        self.service_root = self.server.feed_root + '/00000syn'
+
+    def test_get_entry_returns_copy(self):
+        resource = Resource(self.service_root, 'TypedDataSet', indexes = ['ID'])
+        entry = resource.get_entry(3, 'ID')
+        self.assertEqual(entry['ID'], 3)
+        entry['Bevolking_1'] = 'changed'
+        self.assertNotEqual(resource.get_entry(3, 'ID')['Bevolking_1'], 'changed')
+        self.assertIsNone(resource.get_entry(-1, 'ID'))
+        table = Table('00000syn', root = self.server.feed_root)
+        entry = table.get_entry('TypedDataSet', 3, 'ID')
+        entry['Bevolking_1'] = 'changed'
+        self.assertNotEqual(table.get_entry('TypedDataSet', 3, 'ID')['Bevolking_1'], 'changed')
+
+class ResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = get_server()
+        self.service_root = self.server.feed_root + '/00000syn'
+        self.expected = Resource(self.service_root, 'TypedDataSet').entries
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def fail_third_page(self, number, url):
+        return 0 if number == 2 else None
+
+    def test_checkpoint_resumes_at_next_link(self):
+        """A feed failing at its third page resumes at the stored next link, for loading and for streaming."""
+        for stream in (False, True):
+            path = os.path.join(self.directory, 'stream' if stream else 'load')
+            transport = FailingTransport(Transport(), self.fail_third_page)
+            entries = []
+            with self.assertRaises(IOError):
+                resource = Resource(self.service_root, 'TypedDataSet', stream = stream, transport = transport,
+                                    checkpoint = Checkpoint(path))
+                entries.extend(resource.iter_entries())
+            self.assertEqual(len(transport.urls), 3)
+            if stream:
+                self.assertEqual(entries, self.expected[:1000])
+            transport = FailingTransport(Transport(), lambda number, url: None)
+            resource = Resource(self.service_root, 'TypedDataSet', stream = stream, transport = transport,
+                                checkpoint = Checkpoint(path))
+            self.assertEqual(list(resource.iter_entries()), self.expected)
+            # the stored pages are not requested again
+            self.assertEqual(urlparse.parse_qs(urlparse.urlsplit(transport.urls[0]).query)['$skip'], ['1000'])
+            self.assertEqual(len(transport.urls), 2)
+            self.assertFalse(os.path.exists(path))
+
+    def test_retried_page_skips_yielded_entries(self):
+        """A page failing halfway through is read again, the entries already yielded are not yielded twice."""
+        transport = FailingTransport(Transport(), lambda number, url: 20000 if number == 1 else None)
+        resource = Resource(self.service_root, 'TypedDataSet', stream = True, incremental = True, transport = transport,
+                            retry = Retry(attempts = 3, backoff = 0))
+        self.assertEqual(list(resource.iter_entries()), self.expected)
+        self.assertEqual(len(transport.urls), 5)
+        self.assertEqual(transport.urls[1], transport.urls[2])
+
+if __name__ == '__main__':
+    unittest.main()
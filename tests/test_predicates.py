@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from py2cbs.predicates import Eq, In, Range, Prefix, And, Or, split_filter
+from py2cbs.odata import Resource
+from py2cbs.cbs import Table
+from helpers import get_server
+import unittest
+
+class FilterTest(unittest.TestCase):
+
+    def test_to_filter(self):
+        self.assertEqual(Eq('RegioS', "GM'0363").to_filter(), "RegioS eq 'GM''0363'")
+        self.assertEqual(Eq('Bevolking_1', None).to_filter(), 'Bevolking_1 eq null')
+        self.assertEqual(In('ID', [1, 2]).to_filter(), '(ID eq 1 or ID eq 2)')
+        self.assertEqual(Range('ID', 1, 5).to_filter(), 'ID ge 1 and ID le 5')
+        self.assertEqual(Range('ID', high = 5).to_filter(), 'ID le 5')
+        self.assertEqual(Range('ID').to_filter(), 'ID ne null')
+        self.assertEqual(Prefix('RegioS', 'GM').to_filter(), "startswith(RegioS,'GM')")
+        self.assertIsNone(Prefix('ID', 1).to_filter())
+        self.assertIsNone(Eq('ID', [1]).to_filter())
+        self.assertIsNone(In('ID', []).to_filter())
+
+    def test_split_filter(self):
+        self.assertEqual(split_filter(None), (None, None))
+        expressible = And(Eq('ID', 1), Range('Bevolking_1', 10), Prefix('RegioS', 'GM'))
+        self.assertEqual(split_filter(expressible), ("(ID eq 1) and (Bevolking_1 ge 10) and (startswith(RegioS,'GM'))", None))
+        client = Prefix('ID', 1)
+        # the conditions of an And are pushed down separately
+        self.assertEqual(split_filter(And(Eq('ID', 1), client)), ('(ID eq 1)', client))
+        expression, remainder = split_filter(And(In('ID', [1, 2]), client, Eq('ID', [1])))
+        self.assertEqual(expression, '((ID eq 1 or ID eq 2))')
+        self.assertEqual(repr(remainder), repr(And(client, Eq('ID', [1]))))
+        self.assertEqual(split_filter(And(And(Range('ID', 1, 2), client))), ('((ID ge 1 and ID le 2))', client))
+        # an Or is pushed down entirely or not at all
+        either = Or(Eq('ID', 1), client)
+        self.assertEqual(split_filter(either), (None, either))
+        self.assertEqual(split_filter(Or(Eq('ID', 1), Eq('ID', 2))), ('(ID eq 1) or (ID eq 2)', None))
+
+class QueryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = get_server()
+
+    def test_index_candidates(self):
+        resource = Resource(self.server.feed_root + '/00000syn', 'TypedDataSet', indexes = ['RegioS', 'Perioden'])
+        self.assertEqual(Eq('RegioS', 'GM0001  ').candidates(resource), range(30, 60))
+        self.assertEqual(In('RegioS', ['GM0001  ', 'GM0000  ', 'GM0001  ']).candidates(resource), range(60))
+        self.assertIsNone(Range('ID', 1, 2).candidates(resource))
+        both = And(Eq('RegioS', 'GM0001  '), Eq('Perioden', '1990JJ00'), Range('ID', 1, 40))
+        # the most selective index narrows down the entries tested
+        self.assertEqual(both.candidates(resource), range(30, 60))
+        self.assertEqual(Or(Eq('RegioS', 'GM0000  '), Eq('Perioden', '1990JJ00')).candidates(resource),
+                         sorted(set(range(30)) | set(range(0, 2000, 30))))
+        self.assertIsNone(Or(Eq('RegioS', 'GM0000  '), Range('ID', 1, 2)).candidates(resource))
+        self.assertEqual(resource.query(both), [resource.entries[30]])
+
+    def test_remote_and_local_results(self):
+        """Queries pushed down to the service return the entries of queries on the loaded feed."""
+        remote = Table('00000syn', root = self.server.feed_root)
+        local = Table('00000syn', root = self.server.feed_root, indexes = {'TypedDataSet': ['RegioS']})
+        local.get_entries('TypedDataSet')
+        predicates = [{'RegioS': 'GM0003  '}, {'RegioS': 'GM0003  ', 'Perioden': '2000JJ00'}, Eq('Bevolking_1', None),
+                      In('Perioden', ['1990JJ00', '2019JJ00']), Range('Bevolking_1', 1000, 5000), Range('Dichtheid_4', high = 1.5),
+                      Range('Mannen_2'), Prefix('RegioS', 'GM001'), Range('ID', 100, 200) & Prefix('Perioden', '199'),
+                      Eq('RegioS', 'GM0002  ') | Range('Bevolking_1', 99000), And(Range('ID', 10, 40), Prefix('RegioS', ('GM0000', 'GM0003')) | Eq('ID', 12)),
+                      Prefix('Perioden', ('1990', '1991')) | Eq('ID', 1)]
+        for predicate in predicates:
+            for names in ([], ['ID', 'Bevolking_1']):
+                expected = local.query('TypedDataSet', predicate, names)
+                self.assertEqual(remote.query('TypedDataSet', predicate, names), expected, repr(predicate))
+                self.assertTrue(len(expected) > 0 or predicate == {}, repr(predicate))
+        self.assertNotIn('TypedDataSet', remote.feeds)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from py2cbs import scheduler
+from py2cbs.scheduler import Scheduler, RateBudget, GLOBAL_BUDGET
+from py2cbs.cbs import Table
+from py2cbs.odata import Resource
+from py2cbs.transport import Transport, HTTPError
+from helpers import get_server, FailingTransport, StubTransport
+import time
+import unittest
+import urlparse
+
+def query_options(url):
+    return urlparse.parse_qs(urlparse.urlsplit(url).query)
+
+class FakeClock(object):
+    """Stand-in for the time module of the scheduler, sleeping advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now += seconds
+
+class FakeClockTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        scheduler.time = self.clock
+
+    def tearDown(self):
+        scheduler.time = time
+
+class SchedulerTest(FakeClockTest):
+
+    def setUp(self):
+        FakeClockTest.setUp(self)
+        self.scheduler = Scheduler(concurrency = 2, max_concurrency = 4, page_size = 2000, min_page_size = 1000,
+                                   max_page_size = 4000, target_latency = 5.0, budget = RateBudget())
+
+    def request(self, seconds = 1.0, error = None):
+        started = self.scheduler.acquire()
+        self.clock.now += seconds
+        self.scheduler.release(started, 100, error)
+        return self.scheduler.state()
+
+    def test_additive_increase(self):
+        state = self.request()
+        self.assertEqual((self.scheduler.concurrency, state['page_size'], state['latency']), (2.5, 3000, 1.0))
+        for _ in range(10):
+            state = self.request()
+        self.assertEqual((state['concurrency'], state['page_size'], state['requests']), (4, 4000, 11))
+        self.assertEqual(state['throughput'], 100.0)
+
+    def test_multiplicative_decrease(self):
+        state = self.request(error = HTTPError('http://a', 503))
+        self.assertEqual((self.scheduler.concurrency, state['page_size'], state['throttled']), (1.0, 1000, 1))
+        state = self.request(error = IOError('Connection reset'))
+        self.assertEqual((self.scheduler.concurrency, state['page_size'], state['errors']), (1.0, 1000, 1))
+        # slow requests make pages smaller only
+        self.request()
+        state = self.request(seconds = 10.0)
+        self.assertEqual((self.scheduler.concurrency, state['page_size']), (2.0, 1000))
+
+    def test_client_error_keeps_limits(self):
+        state = self.request(error = HTTPError('http://a', 404))
+        self.assertEqual((self.scheduler.concurrency, state['page_size'], state['errors']), (2.0, 2000, 1))
+
+    def test_retry_after(self):
+        state = self.request(error = HTTPError('http://a', 429, {'retry-after': '30'}))
+        self.assertEqual(state['paused'], 30.0)
+        self.clock.now += 30.0
+        self.assertEqual(self.scheduler.state()['paused'], 0.0)
+
+    def test_failed_response(self):
+        """A response marked failed, or failing while it is read, is released as failed."""
+        transport = StubTransport(lambda url, headers: (200, {}, '{"value": ['))
+        response = self.scheduler.open(transport, 'http://a')
+        self.assertEqual(self.scheduler.state()['in_flight'], 1)
+        response.read()
+        response.fail(ValueError('Truncated JSON'))
+        response.close()
+        state = self.scheduler.state()
+        self.assertEqual((state['in_flight'], state['errors'], state['page_size']), (0, 1, 1000))
+        # a body that cannot be parsed fails the request of the resource
+        self.assertRaises(ValueError, Resource, 'http://a', 'TypedDataSet', transport = transport, scheduler = self.scheduler)
+        self.assertEqual(self.scheduler.state()['errors'], 2)
+
+class RateBudgetTest(FakeClockTest):
+
+    def test_rate(self):
+        budget = RateBudget(rate = 2)
+        for _ in range(5):
+            budget.take()
+        self.assertAlmostEqual(self.clock.slept, 2.0)
+
+    def test_burst(self):
+        budget = RateBudget(rate = 2, burst = 3)
+        for _ in range(3):
+            budget.take()
+        self.assertEqual(self.clock.slept, 0.0)
+        budget.take()
+        self.assertAlmostEqual(self.clock.slept, 0.5)
+        # idle: the bucket refills up to the burst
+        self.clock.now += 60.0
+        for _ in range(3):
+            budget.take()
+        self.assertAlmostEqual(self.clock.slept, 0.5)
+
+    def test_unlimited(self):
+        budget = RateBudget()
+        for _ in range(100):
+            budget.take()
+        self.assertEqual(self.clock.slept, 0.0)
+
+    def test_global_budget(self):
+        """Schedulers share the global budget unless given their own."""
+        self.assertIs(Scheduler().budget, GLOBAL_BUDGET)
+        GLOBAL_BUDGET.set_rate(1)
+        try:
+            first, second = Scheduler(), Scheduler()
+            first.release(first.acquire())
+            second.release(second.acquire())
+            self.assertAlmostEqual(self.clock.slept, 1.0)
+        finally:
+            GLOBAL_BUDGET.set_rate(None)
+
+class PagingTest(unittest.TestCase):
+
+    def test_service_document_not_paged(self):
+        """Feeds page by the page size of the scheduler, the service document is requested as it is."""
+        transport = FailingTransport(Transport(), lambda number, url: None)
+        table = Table('00000syn', root = get_server().feed_root, transport = transport,
+                      scheduler = Scheduler(page_size = 1000, min_page_size = 1000, budget = RateBudget()))
+        self.assertIn('TypedDataSet', table.collections)
+        self.assertNotIn('$skip', query_options(transport.urls[0]))
+        self.assertNotIn('$top', query_options(transport.urls[0]))
+        self.assertEqual(len(table.get_entries('TypedDataSet')), 2000)
+        # the synthetic server answers at most 500 entries per page
+        self.assertEqual([query_options(url)['$skip'] for url in transport.urls[1:]], [['0'], ['500'], ['1000'], ['1500']])
+        self.assertTrue(all('$top' in query_options(url) for url in transport.urls[1:]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of the synthetic server of the benchmarks, which the other tests query."""
+
+from py2cbs.transport import Transport, HTTPError
+from helpers import get_server, server
+import unittest
+
+ENTRIES = [{'ID': 0, 'RegioS': 'NL01  ', 'Bevolking_1': 10},
+           {'ID': 1, 'RegioS': 'GM0363  ', 'Bevolking_1': None},
+           {'ID': 2, 'RegioS': "GM'0599", 'Bevolking_1': 30}]
+
+def ids(expression):
+    return [entry['ID'] for entry in server.filter_entries(ENTRIES, expression)]
+
+class FilterTest(unittest.TestCase):
+
+    def test_comparisons(self):
+        self.assertEqual(ids("RegioS eq 'NL01  '"), [0])
+        self.assertEqual(ids("RegioS eq 'GM''0599'"), [2])
+        self.assertEqual(ids('Bevolking_1 ne null'), [0, 2])
+        self.assertEqual(ids('Bevolking_1 eq null'), [1])
+        self.assertEqual(ids('Bevolking_1 ge 10'), [0, 2])
+        self.assertEqual(ids('Bevolking_1 gt 10'), [2])
+        self.assertEqual(ids('Bevolking_1 le 30'), [0, 2])
+        self.assertEqual(ids('Bevolking_1 lt 30'), [0])
+        self.assertEqual(ids("startswith(RegioS,'GM')"), [1, 2])
+
+    def test_and_or(self):
+        self.assertEqual(ids("(startswith(RegioS,'GM')) and (Bevolking_1 ge 10 and Bevolking_1 le 30)"), [2])
+        self.assertEqual(ids("(ID eq 0 or ID eq 1) and (Bevolking_1 ne null)"), [0])
+        self.assertEqual(ids("(ID eq 0) or ((ID eq 1) and (RegioS eq 'GM0363  '))"), [0, 1])
+
+    def test_unsupported(self):
+        for expression in ["substringof('GM',RegioS)", 'ID has 1', '(ID eq 1', 'ID eq 1 ID', "ID eq NL01"]:
+            self.assertRaises(ValueError, server.filter_entries, ENTRIES, expression)
+        url = get_server().feed_root + "/00000syn/TypedDataSet?$format=json&$filter=ID%20has%201"
+        with self.assertRaises(HTTPError) as context:
+            Transport().open(url)
+        self.assertEqual(context.exception.status, 400)
+
+if __name__ == '__main__':
+    unittest.main()
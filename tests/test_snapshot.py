@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from py2cbs.columnar import ColumnarDataset, numpy
+from py2cbs.snapshot import Snapshot, write_snapshot
+from collections import OrderedDict
+import os
+import shutil
+import tempfile
+import unittest
+
+@unittest.skipIf(numpy is None, 'requires numpy')
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'table.snap')
+        columns = OrderedDict([('ID', numpy.arange(4)), ('RegioS', numpy.array([0, 1, 0, 1], dtype = numpy.intp)),
+                               ('Bevolking_1', numpy.array([1.5, numpy.nan, 3.0, 4.0])),
+                               ('Notes', numpy.array([u'a', None, u'c', u'd'], dtype = object))])
+        types = OrderedDict([('ID', 'l'), ('RegioS', 'category'), ('Bevolking_1', 'd'), ('Notes', 'text')])
+        masks = OrderedDict([('Bevolking_1', numpy.array([False, True, False, False]))])
+        self.dataset = ColumnarDataset(columns, types, OrderedDict([('RegioS', [u'NL01  ', u'GM0363  '])]),
+                                       OrderedDict([('RegioS', [u'Nederland', u'Amsterdam'])]), masks)
+        write_snapshot(self.path, self.dataset, {'identifier': '00000syn'})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        snapshot = Snapshot(self.path)
+        self.assertEqual(snapshot.metadata, {'identifier': '00000syn'})
+        self.assertEqual(snapshot.dataset.columns.keys(), self.dataset.columns.keys())
+        self.assertEqual(snapshot.dataset.columns['ID'].tolist(), [0, 1, 2, 3])
+        self.assertEqual(snapshot.dataset.columns['RegioS'].tolist(), [0, 1, 0, 1])
+        self.assertTrue(numpy.allclose(snapshot.dataset.columns['Bevolking_1'], [1.5, numpy.nan, 3.0, 4.0], equal_nan = True))
+        self.assertEqual(snapshot.dataset.columns['Notes'].tolist(), [u'a', None, u'c', u'd'])
+        self.assertEqual(snapshot.dataset.masks['Bevolking_1'].tolist(), [False, True, False, False])
+        self.assertEqual(snapshot.dataset.categories['RegioS'], [u'NL01  ', u'GM0363  '])
+
+    def test_arrays_outlive_close(self):
+        with Snapshot(self.path) as snapshot:
+            column = snapshot.dataset.columns['Bevolking_1']
+            mask = snapshot.dataset.masks['Bevolking_1']
+        snapshot.close()
+        self.assertEqual(numpy.nansum(column), 8.5)
+        self.assertEqual(mask.sum(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from py2cbs.transport import DecompressingReader, HTTPTransport, Transport
+from helpers import get_server
+import gzip
+import io
+import json
+import random
+import unittest
+import zlib
+
+def gzip_encode(data):
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj = buffer, mode = 'wb') as f:
+        f.write(data)
+    return buffer.getvalue()
+
+def raw_deflate_encode(data):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+ENCODERS = [('gzip', gzip_encode), ('deflate', zlib.compress), ('deflate', raw_deflate_encode)]
+
+class DecompressingReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        generator = random.Random(2016)
+        # compressible, larger than a few chunks of the reader
+        words = ['Perioden', 'RegioS', '2015JJ00', 'GM0363', 'Bevolking_1', '{', '}', ',']
+        self.data = ' '.join([generator.choice(words) + str(generator.randrange(1000)) for _ in range(100000)])
+
+    def test_read_all(self):
+        for encoding, encode in ENCODERS:
+            reader = DecompressingReader(io.BytesIO(encode(self.data)), encoding)
+            self.assertEqual(reader.read(), self.data, encoding)
+            self.assertEqual(reader.read(), '')
+
+    def test_read_sizes(self):
+        for encoding, encode in ENCODERS:
+            for size in [1, 7, 1000, 70000]:
+                reader = DecompressingReader(io.BytesIO(encode(self.data[:200000])), encoding)
+                parts = []
+                while True:
+                    part = reader.read(size)
+                    if not part:
+                        break
+                    self.assertTrue(len(part) <= size)
+                    parts.append(part)
+                self.assertEqual(''.join(parts), self.data[:200000], '{0} {1}'.format(encoding, size))
+
+    def test_empty(self):
+        for encoding, encode in ENCODERS:
+            self.assertEqual(DecompressingReader(io.BytesIO(encode('')), encoding).read(), '')
+
+class HTTPTransportTest(unittest.TestCase):
+
+    def test_gzip_response(self):
+        """The synthetic server gzips the body when asked to, the transport decodes it transparently."""
+        url = get_server().feed_root + '/00000syn/TypedDataSet?$format=json'
+        expected = json.load(Transport().open(url))
+        transport = HTTPTransport()
+        response = transport.open(url)
+        try:
+            self.assertEqual(response.headers.get('content-encoding'), 'gzip')
+            self.assertEqual(json.load(response), expected)
+        finally:
+            response.close()
+        transport.close()
+
+if __name__ == '__main__':
+    unittest.main()
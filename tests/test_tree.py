@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+# Copyright 2016, S. Declerck
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from py2cbs.tree import Tree
+from collections import OrderedDict
+import random
+import unittest
+
+def random_parents(generator, size):
+    """Get a random forest, listing every node after its parent or before it."""
+    parents = OrderedDict()
+    nodes = range(size)
+    for node in nodes:
+        if node == 0 or generator.random() < 0.1:
+            parents[node] = None
+        else:
+            parents[node] = generator.randrange(node)
+    items = parents.items()
+    generator.shuffle(items)
+    return OrderedDict(items)
+
+def naive_lca(parents, a, b):
+    ancestors = set()
+    while a is not None:
+        ancestors.add(a)
+        a = parents[a]
+    while b is not None:
+        if b in ancestors:
+            return b
+        b = parents[b]
+    return None
+
+class TreeTest(unittest.TestCase):
+
+    def setUp(self):
+        # 1 - 2 - 4
+        #   \ 3   5
+        # 6 - 7
+        self.tree = Tree(OrderedDict([(1, None), (2, 1), (3, 1), (4, 2), (5, 2), (6, None), (7, 6)]))
+
+    def test_order(self):
+        self.assertEqual(self.tree.roots, [1, 6])
+        self.assertEqual(self.tree.order, [1, 2, 4, 5, 3, 6, 7])
+        self.assertEqual(self.tree.get_subtree(2), [2, 4, 5])
+        self.assertEqual(self.tree.get_descendants(1), [2, 4, 5, 3])
+        self.assertEqual(self.tree.get_path(5), [1, 2, 5])
+        self.assertEqual(self.tree.get_ancestors(5), [2, 1])
+
+    def test_lowest_common_ancestor(self):
+        lca = self.tree.get_lowest_common_ancestor
+        self.assertEqual(lca(4, 5), 2)
+        self.assertEqual(lca(4, 3), 1)
+        self.assertEqual(lca(2, 4), 2)
+        self.assertEqual(lca(4, 4), 4)
+        self.assertEqual(lca(6, 7), 6)
+        self.assertEqual(lca(4, 7), None)
+
+    def test_unknown_parent_is_root(self):
+        tree = Tree(OrderedDict([(1, 99), (2, 1), (3, 3)]))
+        self.assertEqual(tree.roots, [1, 3])
+        self.assertEqual(tree.get_lowest_common_ancestor(2, 1), 1)
+
+    def test_cycle(self):
+        self.assertRaises(ValueError, Tree, OrderedDict([(1, None), (2, 3), (3, 4), (4, 2), (5, 4)]))
+        self.assertRaises(ValueError, Tree, OrderedDict([(1, 2), (2, 1)]))
+
+    def test_random_forests(self):
+        """Lowest common ancestors and ancestry match a walk up the parents."""
+        generator = random.Random(2016)
+        for size in [1, 2, 3, 10, 57, 200]:
+            parents = random_parents(generator, size)
+            tree = Tree(parents)
+            self.assertEqual(sorted(tree.order), sorted(parents))
+            for _ in range(300):
+                a, b = generator.randrange(size), generator.randrange(size)
+                expected = naive_lca(parents, a, b)
+                self.assertEqual(tree.get_lowest_common_ancestor(a, b), expected)
+                self.assertEqual(tree.is_ancestor(a, b), expected == a)
+
+if __name__ == '__main__':
+    unittest.main()